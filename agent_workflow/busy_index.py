@@ -0,0 +1,324 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, NamedTuple, Optional
+
+import pytz
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+timezone = pytz.timezone(config.get("configurable", "timezone"))
+
+# a synced window older than this is fetched again before answering
+STALENESS_SECONDS = float(
+    config.get("calendar", "busy-index-staleness-seconds", fallback=300)
+)
+
+
+class BusyBlock(NamedTuple):
+    start: datetime
+    end: datetime
+    event_id: str
+    summary: str = ""
+
+
+class IntervalIndex:
+    """Busy blocks sorted by start time.
+
+    Overlap queries bisect the blocks that start before the end of the
+    window and after its start minus the longest block, so a query costs
+    O(log n + k) for k candidates instead of a scan of every block.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._blocks = []
+        self._by_id = {}
+        self._longest = timedelta(0)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def add(self, block: BusyBlock):
+        self.remove(block.event_id)
+        position = bisect.bisect_right(self._starts, block.start)
+        self._starts.insert(position, block.start)
+        self._blocks.insert(position, block)
+        self._by_id[block.event_id] = block
+        self._longest = max(self._longest, block.end - block.start)
+
+    def remove(self, event_id: str) -> bool:
+        block = self._by_id.pop(event_id, None)
+        if block is None:
+            return False
+        position = bisect.bisect_left(self._starts, block.start)
+        while self._blocks[position].event_id != event_id:
+            position += 1
+        del self._starts[position]
+        del self._blocks[position]
+        return True
+
+    def overlapping(self, start: datetime, end: datetime) -> Iterator[BusyBlock]:
+        """The blocks that overlap `[start, end)`, in start order."""
+        first = bisect.bisect_left(self._starts, start - self._longest)
+        last = bisect.bisect_left(self._starts, end)
+        for block in self._blocks[first:last]:
+            if block.end > start:
+                yield block
+
+
+def parse_calendar_datetime(value) -> Optional[datetime]:
+    """Parse the datetimes used by Google Calendar and the Composio actions.
+
+    Accepts ISO 8601 strings, the `YYYY,MM,DD,hh,mm,ss` format of the find
+    actions and the `{"dateTime": ...}` / `{"date": ...}` event fields.
+    Naive values are in the configured timezone.
+    """
+    if isinstance(value, dict):
+        value = value.get("dateTime") or value.get("date")
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        if "," in value:
+            parsed = datetime(*[int(part) for part in value.split(",")])
+        else:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        return timezone.localize(parsed)
+    return parsed
+
+
+def _find_events(data) -> Iterator[dict]:
+    """The Google Calendar events nested anywhere in an action result."""
+    if isinstance(data, dict):
+        if "id" in data and "start" in data and "end" in data:
+            yield data
+            return
+        for value in data.values():
+            yield from _find_events(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _find_events(value)
+
+
+class _EntityIndex:
+    def __init__(self):
+        self.index = IntervalIndex()
+        # synced windows as (start, end, synced_at)
+        self.windows = []
+
+
+class BusyIndex:
+    """Local free/busy index of the calendar entities.
+
+    The index is fed by the results of the calendar tools of each worker:
+    FIND_EVENT results add busy blocks and mark their time window as synced,
+    created or updated events are upserted and deleted events are removed.
+    Conflict checks on a synced window are answered in-process.
+    """
+
+    def __init__(self, staleness_seconds: float = STALENESS_SECONDS, clock=time.time):
+        self.staleness_seconds = staleness_seconds
+        self.clock = clock
+        self._entities = {}
+        self._lock = threading.Lock()
+        self.local_queries = 0
+        self.synced_queries = 0
+
+    def _entity(self, entity_id: str) -> _EntityIndex:
+        return self._entities.setdefault(entity_id, _EntityIndex())
+
+    def ingest_events(
+        self,
+        entity_id: str,
+        events: list[dict],
+        window: Optional[tuple[datetime, datetime]] = None,
+    ):
+        """Upsert `events`, and mark `window` as synced when every event of it
+        was listed."""
+        with self._lock:
+            entity = self._entity(entity_id)
+            if window is not None:
+                # events of the window missing from the listing were deleted
+                for block in list(entity.index.overlapping(*window)):
+                    entity.index.remove(block.event_id)
+                entity.windows.append((*window, self.clock()))
+            for event in events:
+                self._upsert(entity, event)
+
+    def _upsert(self, entity: _EntityIndex, event: dict):
+        event_id = str(event.get("id"))
+        start = parse_calendar_datetime(event.get("start"))
+        end = parse_calendar_datetime(event.get("end"))
+        if (
+            event.get("status") == "cancelled"
+            or event.get("transparency") == "transparent"
+            or start is None
+            or end is None
+        ):
+            entity.index.remove(event_id)
+            return
+        entity.index.add(BusyBlock(start, end, event_id, event.get("summary", "")))
+
+    def remove_event(self, entity_id: str, event_id: str):
+        with self._lock:
+            self._entity(entity_id).index.remove(str(event_id))
+
+    def covers(self, entity_id: str, start: datetime, end: datetime) -> bool:
+        """Whether `[start, end)` lies in a fresh synced window."""
+        oldest = self.clock() - self.staleness_seconds
+        with self._lock:
+            entity = self._entity(entity_id)
+            entity.windows = [w for w in entity.windows if w[2] >= oldest]
+            return any(w[0] <= start and end <= w[1] for w in entity.windows)
+
+    def conflicts(self, entity_id: str, start: datetime, end: datetime) -> list:
+        with self._lock:
+            return list(self._entity(entity_id).index.overlapping(start, end))
+
+    def observe_tool(self, tool: StructuredTool, entity_id: str) -> StructuredTool:
+        """Feed the index with the results of a calendar tool, in place."""
+        action = tool.name
+        original_func = tool.func
+        if action not in (
+            "GOOGLECALENDAR_FIND_EVENT",
+            "GOOGLECALENDAR_CREATE_EVENT",
+            "GOOGLECALENDAR_UPDATE_EVENT",
+            "GOOGLECALENDAR_DELETE_EVENT",
+        ):
+            return tool
+
+        def observed_tool_function(**kwargs):
+            result = original_func(**kwargs)
+            try:
+                self._observe(entity_id, action, kwargs, result)
+            except Exception as e:
+                logger.warning(f"Busy index could not use {action} result: {e}")
+            return result
+
+        tool.func = observed_tool_function
+        return tool
+
+    def _observe(self, entity_id: str, action: str, kwargs: dict, result):
+        if not isinstance(result, dict) or result.get("error"):
+            return
+        if action == "GOOGLECALENDAR_DELETE_EVENT":
+            self.remove_event(entity_id, kwargs.get("event_id"))
+            return
+        events = list(_find_events(result.get("data")))
+        window = None
+        if action == "GOOGLECALENDAR_FIND_EVENT" and not kwargs.get("query"):
+            time_min = parse_calendar_datetime(kwargs.get("timeMin"))
+            time_max = parse_calendar_datetime(kwargs.get("timeMax"))
+            # a truncated listing does not prove the window is free
+            truncated = (result.get("data") or {}).get("nextPageToken")
+            if time_min and time_max and not truncated:
+                window = (time_min, time_max)
+        self.ingest_events(entity_id, events, window)
+
+    def conflict_tool(
+        self, entity_id: str, find_event_tool: StructuredTool
+    ) -> StructuredTool:
+        """A tool that checks conflicts on the local index of `entity_id`.
+
+        Windows that are not synced yet are listed once with `find_event_tool`,
+        which must be observed by the index; when the listing fails or is
+        truncated the tool answers an error instead of a guess.
+        """
+
+        def check_calendar_conflicts(start_datetime: str, end_datetime: str) -> dict:
+            start = parse_calendar_datetime(start_datetime)
+            end = parse_calendar_datetime(end_datetime)
+            if start is None or end is None or start >= end:
+                return {
+                    "successful": False,
+                    "error": "Invalid time range, use `YYYY-MM-DDTHH:MM:SS`.",
+                }
+            if self.covers(entity_id, start, end):
+                self.local_queries += 1
+            else:
+                self.synced_queries += 1
+                day_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+                day_end = end.replace(hour=0, minute=0, second=0, microsecond=0)
+                result = find_event_tool.func(
+                    timeMin=day_start.strftime("%Y,%m,%d,%H,%M,%S"),
+                    timeMax=(day_end + timedelta(days=1)).strftime("%Y,%m,%d,%H,%M,%S"),
+                    single_events=True,
+                    max_results=250,
+                )
+                # a failed or truncated listing does not prove the range is free
+                if not self.covers(entity_id, start, end):
+                    error = isinstance(result, dict) and result.get("error")
+                    return {
+                        "successful": False,
+                        "data": {},
+                        "error": (
+                            f"The events of the range could not all be listed"
+                            f"{f' ({error})' if error else ''}, use "
+                            "GOOGLECALENDAR_FIND_FREE_SLOTS to check it instead."
+                        ),
+                    }
+            conflicts = self.conflicts(entity_id, start, end)
+            return {
+                "successful": True,
+                "data": {
+                    "is_free": not conflicts,
+                    "conflicts": [
+                        {
+                            "summary": block.summary,
+                            "start": block.start.isoformat(),
+                            "end": block.end.isoformat(),
+                            "event_id": block.event_id,
+                        }
+                        for block in conflicts
+                    ],
+                },
+                "error": None,
+            }
+
+        class CheckCalendarConflictsRequest(BaseModel):
+            start_datetime: str = Field(
+                description="Start of the time range, `YYYY-MM-DDTHH:MM:SS`."
+            )
+            end_datetime: str = Field(
+                description="End of the time range, `YYYY-MM-DDTHH:MM:SS`."
+            )
+
+        return StructuredTool.from_function(
+            func=check_calendar_conflicts,
+            name="CHECK_CALENDAR_CONFLICTS",
+            description=(
+                "Instantly check if a time range is free in this calendar. Returns "
+                "`is_free` and the conflicting events. Use it as the conflict "
+                "check before creating an event or changing its time."
+            ),
+            args_schema=CheckCalendarConflictsRequest,
+        )
+
+    def clear(self):
+        """Forget every busy block and synced window."""
+        with self._lock:
+            self._entities.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entities": {
+                    entity_id: len(entity.index)
+                    for entity_id, entity in self._entities.items()
+                },
+                "local_queries": self.local_queries,
+                "synced_queries": self.synced_queries,
+            }
+
+
+busy_index = BusyIndex()
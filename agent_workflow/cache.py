@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class BoundedCache:
+    """Thread-safe LRU cache whose entries may expire at a given time.
+
+    Args:
+        max_size (int): Entries kept before the least recently used is evicted.
+        clock (Callable): Returns the current time as a POSIX timestamp.
+    """
+
+    def __init__(self, max_size: int, clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """Store `value`, it expires at the `expires_at` POSIX timestamp."""
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop the entries whose key matches `predicate`, returns how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def next_midnight(now: datetime) -> float:
+    """POSIX timestamp of the next day boundary in the timezone of `now`."""
+    tz = now.tzinfo
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    if hasattr(tz, "localize"):
+        return tz.localize(midnight).timestamp()
+    return midnight.replace(tzinfo=tz).timestamp()
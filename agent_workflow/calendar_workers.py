@@ -1,8 +1,7 @@
 import os
+from functools import partial
 from langchain_core.messages import BaseMessage, AnyMessage
 from pydantic import BaseModel
-from composio_langchain import ComposioToolSet
-from langchain_openai import ChatOpenAI
 from typing import Annotated, Any, Literal, Sequence
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
@@ -13,6 +12,14 @@ from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
 from datetime import datetime
 from config.config import Config
+from agent_workflow.worker_registry import WorkerRegistry
+from agent_workflow.tool_schemas import tool_schema_cache
+from agent_workflow.llm import build_llm
+from agent_workflow.tool_cache import tool_result_cache
+from agent_workflow.telemetry import instrument_tool
+from agent_workflow.tool_executor import tool_executor
+from agent_workflow.token_budget import token_budgeter
+from agent_workflow.busy_index import busy_index
 import pytz
 
 config = Config()
@@ -26,7 +33,7 @@ You excel at managing calendars and providing necessary information using the av
 ### **Time Formats**
 1. **FIND FREE SLOTS** and **FIND EVENTS** actions: Use the comma-separated format `YYYY,MM,DD,hh,mm,ss`. For example, `2025,10,27,12,58,00`.
 
-2. **CREATE EVENT** or **UPDATE EVENT** actions: Use the naive date/time format `YYYY-MM-DDTHH:MM:SS`, with **no offsets or "Z"**. For example, `2025-01-16T13:00:00`. 
+2. **CREATE EVENT**, **UPDATE EVENT** or **CHECK CALENDAR CONFLICTS** actions: Use the naive date/time format `YYYY-MM-DDTHH:MM:SS`, with **no offsets or "Z"**. For example, `2025-01-16T13:00:00`. 
 [Compulsory]Automatically covert in this format no matter what the user give you!
 3. **Final User Response Format**
    * When providing a response to the user, always format dates in the following way:
@@ -45,7 +52,7 @@ You excel at managing calendars and providing necessary information using the av
 
 ### **Creating Events**
 1. **Mandatory Conflict Check Before Creating**
-   * Always perform a **FIND FREE SLOTS** action to check for scheduling conflicts before creating an event.
+   * Always perform a **CHECK CALENDAR CONFLICTS** action on the requested time range to check for scheduling conflicts before creating an event. It answers instantly, use **FIND FREE SLOTS** only when the user asks for available slots or when **CHECK CALENDAR CONFLICTS** returns an error; never assume a range is free without one of them succeeding.
    * If conflicts are detected (overlapping events or busy slots in the requested time frame):
      - **Do not create the event.**
      - Inform the user about the conflict and provide details of the conflicting event(s), including:
@@ -77,7 +84,7 @@ You excel at managing calendars and providing necessary information using the av
    * If the update reduces the event duration, **skip the conflict check** and proceed with the update.
    * **Only perform a conflict check if the update involves modifying the start or end time.**
    * If no time change is requested (e.g., adding participants, updating descriptions, modifying locations), **skip the conflict check** and proceed with the update.
-   * If the update involves changing the time, perform a **FIND FREE SLOTS** action to check for scheduling conflicts.
+   * If the update involves changing the time, perform a **CHECK CALENDAR CONFLICTS** action on the new time range to check for scheduling conflicts, ignoring the event being updated.
      - If conflicts are detected:
        - **Do not update the event.**
        - Inform the user about the conflict and provide details of the conflicting event(s), including their **start and end times (formatted as Month day, year, 24-hour time)**.
@@ -128,11 +135,7 @@ def tools_condition_worker(
     return tools_condition(state, messages_key)
 
 
-composio_toolset = ComposioToolSet()
-
-llm = ChatOpenAI(model=config.get("configurable", "llm-model"),
-                              temperature=config.get("configurable", "llm-temperature"),
-                             base_url="https://api.aimlapi.com/v1")
+llm = build_llm()
 
 def build_calendar_react_agent(calendar_info, composio_entity_id):
     """Build a ReAct Agent that functions as a calendar worker with
@@ -142,9 +145,11 @@ def build_calendar_react_agent(calendar_info, composio_entity_id):
         - "GOOGLECALENDAR_FIND_EVENT",
         - "GOOGLECALENDAR_FIND_FREE_SLOTS",
         - "GOOGLECALENDAR_UPDATE_EVENT"
+        - "CHECK_CALENDAR_CONFLICTS" (local free/busy index)
     """
 
-    calendar_tools = composio_toolset.get_tools(
+    # loaded from the on-disk schema cache when possible
+    calendar_tools = tool_schema_cache.get_tools(
         actions=[
             "GOOGLECALENDAR_CREATE_EVENT",
             "GOOGLECALENDAR_DELETE_EVENT",
@@ -154,6 +159,22 @@ def build_calendar_react_agent(calendar_info, composio_entity_id):
         ],
         entity_id=composio_entity_id,
     )
+    # cache the reads, invalidated by the writes of the same calendar
+    calendar_tools = tool_result_cache.wrap_tools(calendar_tools, composio_entity_id)
+    # keep the local free/busy index in sync with what the tools return
+    calendar_tools = [
+        busy_index.observe_tool(tool, composio_entity_id) for tool in calendar_tools
+    ]
+    find_event_tool = next(
+        tool for tool in calendar_tools if tool.name == "GOOGLECALENDAR_FIND_EVENT"
+    )
+    calendar_tools.append(
+        busy_index.conflict_tool(composio_entity_id, find_event_tool)
+    )
+    # time the queue wait of the tool calls
+    calendar_tools = [instrument_tool(tool) for tool in calendar_tools]
+    # the tool calls of a step run concurrently on the tool threads
+    calendar_tools = tool_executor.wrap_tools(calendar_tools)
 
     calendar_worker_builder = StateGraph(WorkersState)
 
@@ -175,7 +196,12 @@ def build_calendar_react_agent(calendar_info, composio_entity_id):
                     )
                 ),
             )
-        response = await gpt_llm_with_calendar_tools.ainvoke(state["workers_messages"])
+        # tool results are shrunk, the tool calls and results stay paired
+        messages, budget_config = token_budgeter.fit(
+            "worker", state["workers_messages"], drop_history=False
+        )
+        response = await gpt_llm_with_calendar_tools.ainvoke(messages, config=budget_config)
+        token_budgeter.record_usage("worker", response)
         return {"workers_messages": [response]}
 
     calendar_worker_builder.add_node(
@@ -197,18 +223,21 @@ def build_calendar_react_agent(calendar_info, composio_entity_id):
     return calendar_worker_builder.compile()
 
 
-calendar_workers_dict = {
-    "personal_calendar": build_calendar_react_agent(
-        calendar_info="Personal Google Calendar",
-        composio_entity_id="personal",
-
-        
-    ),
-    "work_calendar": build_calendar_react_agent(
-        calendar_info="Work Google Calendar",
-        composio_entity_id="work",
-    ),
-}
+# the workers are built on first use, see `WorkerRegistry`
+calendar_workers_dict = WorkerRegistry(
+    {
+        "personal_calendar": partial(
+            build_calendar_react_agent,
+            calendar_info="Personal Google Calendar",
+            composio_entity_id="personal",
+        ),
+        "work_calendar": partial(
+            build_calendar_react_agent,
+            calendar_info="Work Google Calendar",
+            composio_entity_id="work",
+        ),
+    }
+)
 calendar_workers_info_dict = {
     "personal_calendar": "Manages all personal events and reminders.",
     "work_calendar": "Manages all work-related events, meetings, and tasks.",
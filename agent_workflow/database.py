@@ -1,88 +1,90 @@
-from typing import Any, Dict, Literal, Optional
-from langgraph.checkpoint.postgres import PostgresSaver
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.base import (
-    ChannelVersions,
-    Checkpoint,
-    CheckpointMetadata,
-    CheckpointTuple,
-)
-from collections.abc import AsyncIterator, Sequence
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
-from langgraph.types import Command
-
-
-# Postgres Saver (async wrapper)
-
-class PostgresSaverCustom(PostgresSaver):
-    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
-        return self.get_tuple(config)
-
-    async def alist(
-        self,
-        config: Optional[RunnableConfig],
-        *,
-        filter: Optional[Dict[str, Any]] = None,
-        before: Optional[RunnableConfig] = None,
-        limit: Optional[int] = None,
-    ) -> AsyncIterator[CheckpointTuple]:
-        for item in self.list(config, filter=filter, before=before, limit=limit):
-            yield item
-
-    async def aput(
-        self,
-        config: RunnableConfig,
-        checkpoint: Checkpoint,
-        metadata: CheckpointMetadata,
-        new_versions: ChannelVersions,
-    ) -> RunnableConfig:
-        return self.put(config, checkpoint, metadata, new_versions)
-
-    async def aput_writes(
-        self,
-        config: RunnableConfig,
-        writes: Sequence[tuple[str, Any]],
-        task_id: str,
-        task_path: str = "",
-    ) -> None:
-        return self.put_writes(config, writes, task_id, task_path)
-
-
-# SQLite Saver (async wrapper)
-
-class SqliteSaverCustom(SqliteSaver):
-    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
-        return self.get_tuple(config)
-
-    async def alist(
-        self,
-        config: Optional[RunnableConfig],
+from typing import Optional
+
+import aiosqlite
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langchain_core.messages import BaseMessage
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+
+# Postgres Saver (async)
+
+class PostgresSaverCustom(AsyncPostgresSaver):
+    """Postgres checkpointer backed by an `AsyncConnectionPool`.
+
+    Every checkpoint read and write is a native async psycopg round trip,
+    so graph super-steps never block the event loop.
+    """
+
+    @classmethod
+    async def from_conn_info(
+        cls,
+        conninfo: str,
         *,
-        filter: Optional[Dict[str, Any]] = None,
-        before: Optional[RunnableConfig] = None,
-        limit: Optional[int] = None,
-    ) -> AsyncIterator[CheckpointTuple]:
-        for item in self.list(config, filter=filter, before=before, limit=limit):
-            yield item
-
-    async def aput(
-        self,
-        config: RunnableConfig,
-        checkpoint: Checkpoint,
-        metadata: CheckpointMetadata,
-        new_versions: ChannelVersions,
-    ) -> RunnableConfig:
-        return self.put(config, checkpoint, metadata, new_versions)
-
-    async def aput_writes(
-        self,
-        config: RunnableConfig,
-        writes: Sequence[tuple[str, Any]],
-        task_id: str,
-        task_path: str = "",
-    ) -> None:
-        return self.put_writes(config, writes, task_id, task_path)
+        min_size: int = 1,
+        max_size: int = 20,
+        statement_timeout_ms: Optional[int] = None,
+        pool_timeout: float = 30.0,
+    ) -> tuple["PostgresSaverCustom", AsyncConnectionPool]:
+        """Open an async connection pool and create the checkpointer on it.
+
+        Args:
+            conninfo (str): The Postgres connection string.
+            min_size (int): Connections kept open by the pool.
+            max_size (int): Maximum number of connections of the pool.
+            statement_timeout_ms (int, optional): Server-side timeout for
+                every statement, in milliseconds.
+            pool_timeout (float): Seconds to wait for a free connection.
+
+        Returns:
+            tuple: The checkpointer and the pool. The caller owns the pool.
+        """
+        connection_kwargs = {
+            "autocommit": True,
+            "prepare_threshold": 0,
+            "row_factory": dict_row,
+        }
+        if statement_timeout_ms:
+            connection_kwargs["options"] = (
+                f"-c statement_timeout={int(statement_timeout_ms)}"
+            )
+        pool = AsyncConnectionPool(
+            conninfo=conninfo,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=pool_timeout,
+            kwargs=connection_kwargs,
+            open=False,
+        )
+        await pool.open()
+        return cls(pool), pool
+
+
+# SQLite Saver (async)
+
+class SqliteSaverCustom(AsyncSqliteSaver):
+    """SQLite checkpointer on an `aiosqlite` connection.
+
+    Queries run on the aiosqlite worker thread, so they never block the
+    event loop, and a busy timeout makes concurrent writers wait instead of
+    failing with `database is locked`.
+    """
+
+    @classmethod
+    async def from_path(
+        cls, path: str, *, busy_timeout_ms: int = 5000
+    ) -> tuple["SqliteSaverCustom", aiosqlite.Connection]:
+        """Open the SQLite database and create the checkpointer on it.
+
+        Returns:
+            tuple: The checkpointer and the connection. The caller owns the
+            connection.
+        """
+        conn = await aiosqlite.connect(path, timeout=busy_timeout_ms / 1000)
+        await conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        return cls(conn), conn
 
 
 # -----------------------------
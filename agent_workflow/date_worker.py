@@ -1,11 +1,15 @@
-from langchain_openai import ChatOpenAI
 from langchain.schema import SystemMessage, HumanMessage
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import pytz
 import os
+import re
+from typing import Optional
 from dotenv import load_dotenv
 from config.config import Config
+from agent_workflow.llm import build_llm
+from agent_workflow.cache import BoundedCache, next_midnight
+from agent_workflow.temporal_parser import normalize_expression, parse_date_range
 load_dotenv()
 
 config = Config()
@@ -13,10 +17,25 @@ config = Config()
 
 timezone = pytz.timezone(config.get("configurable", "timezone"))
 
+# results of the local parser below this confidence are resolved by the LLM
+PARSER_MIN_CONFIDENCE = float(
+    config.get("date-worker", "parser-min-confidence", fallback=0.8)
+)
 
-llm = ChatOpenAI(model=config.get("configurable", "llm-model"),
-                              temperature=config.get("configurable", "llm-temperature"),
-                             base_url="https://api.aimlapi.com/v1")
+# the prompt and the resolved ranges only change with the day and the clock,
+# both caches are keyed by the day and a time bucket of this size
+CACHE_BUCKET_MINUTES = int(
+    config.get("date-worker", "cache-bucket-minutes", fallback=5)
+)
+prompt_cache = BoundedCache(
+    max_size=int(config.get("date-worker", "prompt-cache-size", fallback=4))
+)
+result_cache = BoundedCache(
+    max_size=int(config.get("date-worker", "result-cache-size", fallback=256))
+)
+
+
+llm = build_llm()
 DATE_WORKER_SYSTEM_PROMPT = """
 You are an expert assistant specialized in recognizing and extracting temporal expressions from natural language input. 
 The current date is: {current_date}.
@@ -517,25 +536,125 @@ def get_prompt_with_examples(current_date: datetime) -> str:
     )
 
 
+def extract_user_request(text: str) -> str:
+    """Extract the request from a `MANAGER_TEMPLATE` message.
+
+    The task context of the template holds previous manager answers, which
+    contain dates that must not be parsed as part of the request.
+    """
+    match = re.search(
+        r"### The user's request is:\s*(.*?)\s*(?:\n---|$)", text, re.DOTALL
+    )
+    return match.group(1) if match else text
+
+
+def resolve_date_locally(
+    user_input: str, now: datetime
+) -> Optional[DateExtractionResult]:
+    """Resolve common temporal expressions without an LLM call.
+
+    Returns:
+        DateExtractionResult: The result, None when the local parser found no
+        temporal expression or is not confident enough.
+    """
+    parsed = parse_date_range(extract_user_request(user_input), now)
+    if parsed is None or parsed.confidence < PARSER_MIN_CONFIDENCE:
+        return None
+    if parsed.description:
+        return DateExtractionResult(
+            start_datetime="", end_datetime="", description=parsed.description
+        )
+    return DateExtractionResult(
+        start_datetime=parsed.start_datetime.isoformat(),
+        end_datetime=parsed.end_datetime.isoformat(),
+    )
+
+
+def format_date_result(response: DateExtractionResult) -> str:
+    """Render a date extraction result as the date manager answer."""
+    if response.description.startswith("Error:"):
+        return response.description
+
+    return (
+        f"The requested date range is from {response.start_datetime} "
+        f"to {response.end_datetime} ('Europe/Paris' time zone)."
+    )
+
+
+def _time_bucket(now: datetime) -> tuple[int, datetime]:
+    """The time bucket of `now` and the datetime at which it starts."""
+    bucket = (now.hour * 60 + now.minute) // CACHE_BUCKET_MINUTES
+    bucket_minutes = bucket * CACHE_BUCKET_MINUTES
+    bucket_start = now.replace(
+        hour=bucket_minutes // 60, minute=bucket_minutes % 60, second=0, microsecond=0
+    )
+    return bucket, bucket_start
+
+
+def get_cached_prompt(now: datetime) -> str:
+    """`get_prompt_with_examples` for the time bucket of `now`."""
+    bucket, bucket_start = _time_bucket(now)
+    key = (now.date(), bucket)
+    prompt = prompt_cache.get(key)
+    if prompt is None:
+        prompt = get_prompt_with_examples(bucket_start)
+        prompt_cache.set(key, prompt, expires_at=next_midnight(now))
+    return prompt
+
+
+def _result_cache_key(user_input: str, now: datetime) -> tuple:
+    request = normalize_expression(extract_user_request(user_input))
+    return request, now.date(), _time_bucket(now)[0]
+
+
+def date_cache_stats() -> dict:
+    """Hit and miss counters of the date worker caches."""
+    return {"prompt": prompt_cache.stats(), "result": result_cache.stats()}
+
+
 def calculate_date(user_input: str) -> str:
     """Extract structured date information from natural language input."""
     try:
         now = datetime.now(timezone)
-        prompt = get_prompt_with_examples(now)
-        # print(prompt)
+        key = _result_cache_key(user_input, now)
+        response = result_cache.get(key)
+        if response is None:
+            response = resolve_date_locally(user_input, now)
+            if response is None:
+                response = llm.with_structured_output(
+                    DateExtractionResult, method="function_calling"
+                ).invoke(
+                    [
+                        SystemMessage(content=get_cached_prompt(now)),
+                        HumanMessage(content=user_input),
+                    ]
+                )
+            result_cache.set(key, response, expires_at=next_midnight(now))
+        return format_date_result(response)
 
-        response = llm.with_structured_output(
-            DateExtractionResult, method="function_calling"
-        ).invoke([SystemMessage(content=prompt), HumanMessage(content=user_input)])
-        # print(f"Respuesta del modelo: {response}")
+    except Exception as e:
+        return f"Error: Could not process the request. Details: {str(e)}"
 
-        if response.description.startswith("Error:"):
-            return response.description
 
-        return (
-            f"The requested date range is from {response.start_datetime} "
-            f"to {response.end_datetime} ('Europe/Paris' time zone)."
-        )
+async def acalculate_date(user_input: str) -> str:
+    """Async version of `calculate_date`, it does not block the event loop."""
+    try:
+        now = datetime.now(timezone)
+        key = _result_cache_key(user_input, now)
+        response = result_cache.get(key)
+        if response is None:
+            response = resolve_date_locally(user_input, now)
+            if response is None:
+                response = await llm.with_structured_output(
+                    DateExtractionResult, method="function_calling"
+                ).ainvoke(
+                    [
+                        SystemMessage(content=get_cached_prompt(now)),
+                        HumanMessage(content=user_input),
+                    ]
+                )
+            result_cache.set(key, response, expires_at=next_midnight(now))
+        return format_date_result(response)
 
     except Exception as e:
-        return f"Error: Could not process the request. Details: {str(e)}"
\ No newline at end of file
+        return f"Error: Could not process the request. Details: {str(e)}"
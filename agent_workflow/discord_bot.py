@@ -5,8 +5,14 @@ import asyncio
 import logging
 import time
 from dotenv import load_dotenv
-from agent_workflow.orchestrator import init_orchestrator
+from config.config import Config
+from agent_workflow.mailbox import ConversationMailbox, coalesce_messages
+from agent_workflow.runtime import OrchestratorRuntime
+from agent_workflow.streaming import ProgressiveReply, stream_graph_answer
+from agent_workflow.telemetry import telemetry_callbacks
 from agent_workflow.calendar_workers import calendar_worker_summary_list
+from agent_workflow.fast_path import FAST_PATH_ENABLED, fast_path
+from agent_workflow.job_queue import JOB_QUEUE_ENABLED, ResultDispatcher, queue_from_config
 
 # -------------------- Logging --------------------
 logging.basicConfig(
@@ -16,6 +22,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+config = Config()
+STREAMING = config.get("discord", "streaming", fallback="true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+STREAM_EDIT_INTERVAL = float(
+    config.get("discord", "stream-edit-interval-seconds", fallback=1.2)
+)
+SHUTDOWN_TIMEOUT = float(
+    config.get("discord", "shutdown-timeout-seconds", fallback=30)
+)
+GATEWAY_ID = config.get("job-queue", "gateway-id", fallback="discord")
+ANSWER_TIMEOUT = float(config.get("job-queue", "answer-timeout-seconds", fallback=300))
+
 # -------------------- Discord Client --------------------
 intents = discord.Intents.default()
 intents.messages = True
@@ -23,6 +45,12 @@ intents.message_content = True  # Required to read message content
 
 bot = discord.Client(intents=intents)
 
+# -------------------- Orchestrator Runtime --------------------
+# created once and shared by every message, see `on_ready`
+runtime = OrchestratorRuntime()
+# set in `on_ready` when the executors run the graph, see `job_queue`
+dispatcher = None
+
 # -------------------- Markdown Helpers --------------------
 def apply_markdown_replacements(text):
     replacements = {
@@ -80,6 +108,32 @@ async def send_typing_action(channel):
 @bot.event
 async def on_ready():
     logger.info(f"Bot logged in as {bot.user}")
+    await runtime.start()
+    if JOB_QUEUE_ENABLED:
+        await start_dispatcher()
+    else:
+        await runtime.warm()
+    logger.info(f"Orchestrator runtime health: {await runtime.health()}")
+
+
+async def start_dispatcher():
+    """Hand the requests to the executor processes through the job queue."""
+    global dispatcher
+    if dispatcher is not None:
+        return
+    if runtime.pool is None:
+        logger.error("The job queue needs Postgres, requests run in this process")
+        return
+    queue = queue_from_config(runtime.pool)
+    await queue.setup()
+    dispatcher = ResultDispatcher(
+        queue,
+        GATEWAY_ID,
+        deliver_result,
+        keep_finished_seconds=3600
+        * float(config.get("job-queue", "keep-finished-hours", fallback=24)),
+    )
+    dispatcher.start()
 
 @bot.event
 async def on_message(message):
@@ -95,32 +149,164 @@ async def on_message(message):
         await message.channel.send(help_message)
         return
 
-    # Handle normal messages
+    # Handle normal messages, runs are serialized per user and bursts of
+    # messages are answered as a single request
+    thread_id = message.author.name or str(message.author.id) or "unknown_user"
+    mailbox.submit(thread_id, message)
+
+
+def render_answer(text):
+    return escape_special_characters(apply_markdown_replacements(text))
+
+
+async def stream_messages(thread_id, messages):
+    """Answer with a placeholder edited as the final answer streams in."""
+    message = messages[-1]
+    reply = ProgressiveReply(
+        message.channel,
+        min_edit_interval=STREAM_EDIT_INTERVAL,
+        render=render_answer,
+    )
+    try:
+        await reply.start()
+        await runtime.start()
+        response = await stream_graph_answer(
+            runtime.graph,
+            {"user_input": coalesce_messages([m.content for m in messages])},
+            {
+                "configurable": {"thread_id": thread_id},
+                "callbacks": telemetry_callbacks(),
+            },
+            reply,
+        )
+        text = response["messages"][-1].content if response else reply.text
+        await reply.finish(text)
+        logger.debug(
+            f"Response streamed: first token after {reply.time_to_first_token}s, "
+            f"{reply.edits} edits, {time.perf_counter() - reply.started_at:.4f}s"
+        )
+    except Exception as e:
+        logger.error(f"Error processing message: {e}", exc_info=True)
+        error = f"Sorry, I couldn't process your request right now.\nError: {e}"
+        if reply.message is None:
+            await message.channel.send(error)
+        else:
+            await reply.finish(error)
+
+
+async def send_answer(channel, text):
+    try:
+        await channel.send(render_answer(text))
+    except Exception as parse_exc:
+        logger.warning(f"Failed to send escaped message: {parse_exc}")
+        await channel.send(text)
+
+
+async def answer_fast_path(thread_id, messages) -> bool:
+    """Answer greetings, thanks and help without the orchestrator."""
+    try:
+        await runtime.start()
+        answer = await fast_path.try_answer(
+            runtime.graph,
+            coalesce_messages([m.content for m in messages]),
+            {"configurable": {"thread_id": thread_id}},
+        )
+    except Exception as e:
+        logger.warning(f"Fast path failed, falling back to the orchestrator: {e}")
+        return False
+    if answer is None:
+        return False
+    await send_answer(messages[-1].channel, answer)
+    return True
+
+
+async def send_result(channel, result):
+    if result.status == "done":
+        await send_answer(channel, result.answer)
+    else:
+        await channel.send(
+            f"Sorry, I couldn't process your request right now.\nError: {result.error}"
+        )
+
+
+async def deliver_result(result):
+    """Answer a request enqueued before the gateway restarted."""
+    channel_id = result.reply_to["channel_id"]
+    channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+    await send_result(channel, result)
+
+
+async def enqueue_messages(thread_id, messages):
+    """Answer with the result of an executor process."""
+    message = messages[-1]
+    typing_task = asyncio.create_task(send_typing_action(message.channel))
+    job_id = None
+    try:
+        init_time = time.time()
+        job_id = await dispatcher.submit(
+            thread_id,
+            coalesce_messages([m.content for m in messages]),
+            {"channel_id": message.channel.id, "message_id": message.id},
+        )
+        result = await dispatcher.wait(job_id, ANSWER_TIMEOUT or None)
+        logger.debug(f"Job {job_id} {result.status} in {time.time() - init_time:.4f}s")
+        await send_result(message.channel, result)
+    except asyncio.TimeoutError as e:
+        if job_id is None:
+            # the request never reached the queue
+            logger.error(f"Error enqueuing message: {e!r}", exc_info=True)
+            await message.channel.send(
+                "Sorry, I couldn't process your request right now.\nError: timed out"
+            )
+            return
+        logger.warning(f"No answer to job {job_id} after {ANSWER_TIMEOUT}s")
+        await message.channel.send(
+            "Sorry, your request is taking longer than expected. "
+            "I'll post the answer here once it is ready."
+        )
+    except Exception as e:
+        logger.error(f"Error processing message: {e}", exc_info=True)
+        await message.channel.send(
+            f"Sorry, I couldn't process your request right now.\nError: {e}"
+        )
+    finally:
+        typing_task.cancel()
+
+
+async def process_messages(thread_id, messages):
+    # the executors answer the fast path too, in the order of the thread
+    if dispatcher is not None:
+        await enqueue_messages(thread_id, messages)
+        return
+    if FAST_PATH_ENABLED and await answer_fast_path(thread_id, messages):
+        return
+    if STREAMING:
+        await stream_messages(thread_id, messages)
+        return
+    message = messages[-1]
     typing_task = asyncio.create_task(send_typing_action(message.channel))
     try:
         config = {
             "configurable": {
-                "thread_id": message.author.name or str(message.author.id) or "unknown_user"
-            }
+                "thread_id": thread_id
+            },
+            "callbacks": telemetry_callbacks(),
         }
-        logger.debug(f"Invoking orchestrator_graph with config: {config}")
+        logger.debug(
+            f"Invoking orchestrator_graph with config: {config} "
+            f"({len(messages)} messages)"
+        )
         init_time = time.time()
-        orchestrator_graph = await init_orchestrator()
-        response = await orchestrator_graph.ainvoke(
-            {"user_input": message.content},
+        await runtime.start()
+        response = await runtime.graph.ainvoke(
+            {"user_input": coalesce_messages([m.content for m in messages])},
             config,
         )
         text =  response["messages"][-1].content
         duration = time.time() - init_time
         logger.debug(f"Response generated successfully: {duration:.4f}")
 
-        try:
-            await message.channel.send(
-                escape_special_characters(apply_markdown_replacements(text))
-            )
-        except Exception as parse_exc:
-            logger.warning(f"Failed to send escaped message: {parse_exc}")
-            await message.channel.send(text)
+        await send_answer(message.channel, text)
 
     except Exception as e:
         logger.error(f"Error processing message: {e}", exc_info=True)
@@ -130,7 +316,33 @@ async def on_message(message):
     finally:
         typing_task.cancel()
 
+
+mailbox = ConversationMailbox(
+    process_messages,
+    debounce_seconds=float(config.get("discord", "debounce-seconds", fallback=1.5)),
+    max_wait_seconds=float(config.get("discord", "max-debounce-seconds", fallback=5)),
+)
+
 # -------------------- Run Bot --------------------
+async def main(token):
+    try:
+        async with bot:
+            try:
+                await bot.start(token)
+            finally:
+                # answer the messages already received while the bot can still send
+                try:
+                    await asyncio.wait_for(mailbox.drain(), SHUTDOWN_TIMEOUT or None)
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        f"Messages still unanswered after {SHUTDOWN_TIMEOUT}s at shutdown"
+                    )
+    finally:
+        if dispatcher is not None:
+            await dispatcher.stop()
+        await runtime.shutdown()
+
+
 if __name__ == "__main__":
     load_dotenv()
     DISCORD_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
@@ -138,4 +350,7 @@ if __name__ == "__main__":
     if not DISCORD_TOKEN:
         logger.error("DISCORD_BOT_TOKEN environment variable not found.")
     else:
-        bot.run(DISCORD_TOKEN)
+        try:
+            asyncio.run(main(DISCORD_TOKEN))
+        except KeyboardInterrupt:
+            logger.info("Bot stopped")
@@ -0,0 +1,301 @@
+import base64
+import json
+import logging
+import re
+import threading
+from html import unescape
+from html.parser import HTMLParser
+from typing import Callable, Optional, Sequence
+
+from langchain_core.tools import StructuredTool
+
+from agent_workflow.token_budget import token_budgeter
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+# the message fields the email workers need, Composio and Gmail API names
+DEFAULT_FIELDS = (
+    "messageId", "threadId", "id", "historyId", "messageTimestamp", "date", "labelIds",
+    "sender", "to", "cc", "subject", "messageText", "snippet", "attachmentList",
+)
+
+BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "ul", "ol", "table", "h1", "h2", "h3", "h4",
+    "h5", "h6", "blockquote", "hr", "section", "article", "header", "footer",
+}
+HIDDEN_TAGS = {"script", "style", "head", "title"}
+HTML_PATTERN = re.compile(r"<(html|body|div|p|br|table|span|a|td)\b", re.IGNORECASE)
+
+# first line of a quoted reply chain
+QUOTE_HEADER = re.compile(
+    r"^(On [^\n]{0,200}?(\n[^\n]{0,200}?)?wrote:"
+    r"|-{2,}\s*Original Message\s*-{2,}"
+    r"|_{10,}"
+    r"|From: .+\n(Sent|Date): )",
+    re.MULTILINE,
+)
+
+
+class _TextExtractor(HTMLParser):
+    """Text of an HTML body, without the quoted replies Gmail marks up."""
+
+    def __init__(self, strip_quotes: bool):
+        super().__init__(convert_charrefs=True)
+        self.strip_quotes = strip_quotes
+        self.parts = []
+        # depth inside tags whose text is dropped
+        self._skip = 0
+        self._stack = []
+
+    def _skipped(self, tag: str, attrs) -> bool:
+        if tag in HIDDEN_TAGS:
+            return True
+        if not self.strip_quotes:
+            return False
+        classes = dict(attrs).get("class") or ""
+        return tag == "blockquote" or "gmail_quote" in classes
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        if tag in ("br", "hr", "img", "meta", "link", "input"):
+            return
+        skipped = self._skip > 0 or self._skipped(tag, attrs)
+        self._stack.append((tag, skipped))
+        self._skip += skipped
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        # tolerate unclosed tags, as mail clients leave many
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                self._skip -= sum(skipped for _, skipped in self._stack[i:])
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str, strip_quotes: bool = True) -> str:
+    parser = _TextExtractor(strip_quotes)
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def strip_quoted_text(text: str) -> str:
+    """`text` without the replies it quotes, keeps it if it is all quotes."""
+    match = QUOTE_HEADER.search(text)
+    stripped = text[: match.start()] if match else text
+    stripped = "\n".join(
+        line for line in stripped.splitlines() if not line.lstrip().startswith(">")
+    ).rstrip()
+    return stripped if stripped else text
+
+
+def truncate_bytes(text: str, max_bytes: int) -> str:
+    """`text` cut to `max_bytes` of UTF-8, with a marker of what was cut."""
+    encoded = text.encode("utf-8")
+    if max_bytes <= 0 or len(encoded) <= max_bytes:
+        return text
+    kept = encoded[:max_bytes].decode("utf-8", errors="ignore")
+    return f"{kept}\n[... {len(encoded) - max_bytes} more bytes]"
+
+
+def _decode(data: str) -> str:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode(
+        "utf-8", errors="replace"
+    )
+
+
+def payload_body(payload: dict) -> Optional[str]:
+    """The body of a Gmail API message payload, the plain text part first."""
+    bodies = {}
+
+    def walk(part: dict):
+        mime_type = part.get("mimeType", "")
+        data = (part.get("body") or {}).get("data")
+        if data and mime_type in ("text/plain", "text/html"):
+            bodies.setdefault(mime_type, data)
+        for child in part.get("parts") or []:
+            walk(child)
+
+    walk(payload)
+    data = bodies.get("text/plain") or bodies.get("text/html")
+    try:
+        return _decode(data) if data else None
+    except ValueError:
+        return None
+
+
+class EmailProjection:
+    """Compact view of the Gmail tool results the email workers read.
+
+    Composio returns every message with its raw payload, headers and
+    HTML body, and all of it would be sent to the LLM at every step of the
+    worker. The messages are reduced to the whitelisted `fields`, their
+    bodies converted from HTML to text, stripped of the replies they quote
+    and cut to `body_bytes`. The sizes before and after are kept per
+    action, in bytes and in tokens.
+
+    Args:
+        fields (Sequence[str]): The message fields kept.
+        body_bytes (int): UTF-8 bytes kept of each body, 0 for all.
+        strip_quotes (bool): Drop the quoted reply chains of the bodies.
+        count_tokens (Callable): Counts the tokens of a text.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str] = DEFAULT_FIELDS,
+        body_bytes: int = 2000,
+        strip_quotes: bool = True,
+        count_tokens: Callable[[str], int] = token_budgeter.encoder,
+    ):
+        self.fields = set(fields)
+        self.body_bytes = body_bytes
+        self.strip_quotes = strip_quotes
+        self.count_tokens = count_tokens
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def compact_body(self, text: str) -> str:
+        if HTML_PATTERN.search(text):
+            text = html_to_text(text, self.strip_quotes)
+        else:
+            text = unescape(text)
+        if self.strip_quotes:
+            text = strip_quoted_text(text)
+        text = re.sub(r"[^\S\n]+", " ", text)
+        text = re.sub(r"\s*\n\s*", "\n", text).strip()
+        return truncate_bytes(text, self.body_bytes)
+
+    def project_message(self, message: dict) -> dict:
+        """The whitelisted fields of a Composio or Gmail API message."""
+        message = dict(message)
+        payload = message.get("payload")
+        if isinstance(payload, dict):
+            headers = {
+                header.get("name", "").lower(): header.get("value")
+                for header in payload.get("headers") or []
+            }
+            for field, header in (
+                ("sender", "from"),
+                ("to", "to"),
+                ("cc", "cc"),
+                ("subject", "subject"),
+                ("date", "date"),
+            ):
+                if not message.get(field) and headers.get(header):
+                    message[field] = headers[header]
+            if not message.get("messageText"):
+                message["messageText"] = payload_body(payload)
+        if isinstance(message.get("messageText"), str):
+            message["messageText"] = self.compact_body(message["messageText"])
+        if isinstance(message.get("attachmentList"), list):
+            message["attachmentList"] = [
+                attachment.get("filename") if isinstance(attachment, dict) else attachment
+                for attachment in message["attachmentList"]
+            ]
+        return {
+            field: value
+            for field, value in message.items()
+            if field in self.fields and value not in (None, "", [])
+        }
+
+    def project_data(self, data):
+        """`data` of a Gmail action with its messages and threads projected."""
+        if not isinstance(data, dict):
+            return data
+        data = dict(data)
+        for key in ("messages", "threads"):
+            if isinstance(data.get(key), list):
+                data[key] = [
+                    item if not isinstance(item, dict)
+                    # a thread with its messages
+                    else self.project_data(item) if "messages" in item
+                    else self.project_message(item)
+                    for item in data[key]
+                ]
+        if isinstance(data.get("message"), dict):
+            data["message"] = self.project_message(data["message"])
+        return data
+
+    def _size(self, result) -> tuple[int, int]:
+        text = result if isinstance(result, str) else json.dumps(
+            result, ensure_ascii=False, default=str
+        )
+        return len(text.encode("utf-8")), self.count_tokens(text)
+
+    def project(self, action: str, result):
+        """The projected result of `action`, errors are left as they are."""
+        if not isinstance(result, dict) or not isinstance(result.get("data"), dict):
+            return result
+        projected = {**result, "data": self.project_data(result["data"])}
+
+        bytes_before, tokens_before = self._size(result)
+        bytes_after, tokens_after = self._size(projected)
+        with self._lock:
+            stats = self._stats.setdefault(
+                action,
+                {"calls": 0, "bytes_before": 0, "bytes_after": 0, "tokens_before": 0, "tokens_after": 0},
+            )
+            stats["calls"] += 1
+            stats["bytes_before"] += bytes_before
+            stats["bytes_after"] += bytes_after
+            stats["tokens_before"] += tokens_before
+            stats["tokens_after"] += tokens_after
+        logger.debug(
+            f"{action}: {bytes_before} -> {bytes_after} bytes, "
+            f"{tokens_before} -> {tokens_after} tokens"
+        )
+        return projected
+
+    def wrap_tool(self, tool: StructuredTool) -> StructuredTool:
+        """Project the results of `tool`, in place."""
+        original_func = tool.func
+        action = tool.name
+
+        def projected_tool_function(**kwargs):
+            return self.project(action, original_func(**kwargs))
+
+        tool.func = projected_tool_function
+        return tool
+
+    def wrap_tools(self, tools: list[StructuredTool]) -> list:
+        return [self.wrap_tool(tool) for tool in tools]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {action: dict(stats) for action, stats in self._stats.items()}
+
+
+PROJECTION_ENABLED = config.get("email-projection", "enabled", fallback="true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+email_projection = (
+    EmailProjection(
+        fields=[
+            field.strip()
+            for field in config.get(
+                "email-projection", "fields", fallback=",".join(DEFAULT_FIELDS)
+            ).split(",")
+            if field.strip()
+        ],
+        body_bytes=int(config.get("email-projection", "body-bytes", fallback=2000)),
+        strip_quotes=config.get("email-projection", "strip-quotes", fallback="true").lower()
+        in ("1", "true", "yes", "on"),
+    )
+    if PROJECTION_ENABLED
+    else None
+)
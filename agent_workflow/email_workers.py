@@ -1,9 +1,8 @@
 from langchain_core.tools import StructuredTool
 import os
+from functools import partial
 from langchain_core.messages import BaseMessage, AnyMessage
 from pydantic import BaseModel
-from langchain_openai import ChatOpenAI
-from composio_langchain import ComposioToolSet
 from typing import Annotated, Any, Literal, Sequence
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
@@ -12,7 +11,19 @@ from langchain_core.messages import SystemMessage
 from dotenv import load_dotenv, find_dotenv
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
-
+from config.config import Config
+from agent_workflow.worker_registry import WorkerRegistry
+from agent_workflow.tool_schemas import tool_schema_cache
+from agent_workflow.llm import build_llm
+from agent_workflow.tool_cache import tool_result_cache
+from agent_workflow.telemetry import instrument_tool
+from agent_workflow.tool_executor import tool_executor
+from agent_workflow.token_budget import token_budgeter
+from agent_workflow.mail_mirror import mail_mirror
+from agent_workflow.email_projection import email_projection
+from agent_workflow.thread_summaries import thread_summaries
+
+config = Config()
 _ = load_dotenv(find_dotenv())
 
 EMAIL_WORKER_TEMPLATE = """
@@ -93,6 +104,22 @@ You excel at managing emails efficiently using available tools while adhering to
 - It is manadatory to format all this properly format the message using good markdowns techniques. That would be readable and professional.
 """
 
+# appended to the worker prompt when the local Gmail mirror is enabled
+LOCAL_SEARCH_TEMPLATE = """
+### **Searching Emails (SEARCH_LOCAL_EMAILS)**
+- Prefer **SEARCH_LOCAL_EMAILS** to find emails by keywords, sender, label or date range. It answers instantly and supports the date filters that **GMAIL_FETCH_EMAILS** does not.
+- The mailbox may not be fully mirrored yet: when the result is not `complete`, emails before `mirrored_since` are missing from it, use **GMAIL_FETCH_EMAILS** for anything older.
+- Use the returned `thread_id` with **GMAIL_FETCH_MESSAGE_BY_THREAD_ID** when the full content of an email is needed.
+- Fall back to **GMAIL_FETCH_EMAILS** when the local search finds nothing relevant.
+"""
+
+# appended to the worker prompt when the thread summaries are enabled
+THREAD_SUMMARY_TEMPLATE = """
+### **Reading Threads (SUMMARIZE_EMAIL_THREAD)**
+- To answer what was said, asked or decided in a thread, use **SUMMARIZE_EMAIL_THREAD** with its `thread_id`. It answers from a summary kept up to date with the thread.
+- Use **GMAIL_FETCH_MESSAGE_BY_THREAD_ID** only when the exact wording of a message is needed, e.g. to quote it or reply to it.
+"""
+
 
 class WorkersState(TypedDict):
     """The state of the worker agents."""
@@ -110,11 +137,7 @@ def tools_condition_worker(
     return tools_condition(state, messages_key)
 
 
-composio_toolset = ComposioToolSet()
-
-llm = ChatOpenAI(model=config.get("configurable", "llm-model"),
-                              temperature=config.get("configurable", "llm-temperature"),
-                             base_url="https://api.aimlapi.com/v1")
+llm = build_llm()
 
 def wrapper_funct_fetch_emails(tool: StructuredTool):
     """
@@ -148,8 +171,13 @@ def build_email_react_agent(email_info, composio_entity_id):
     email_worker_system_prompt_template = EMAIL_WORKER_TEMPLATE.format(
         email_info=email_info
     )
+    if mail_mirror is not None:
+        email_worker_system_prompt_template += LOCAL_SEARCH_TEMPLATE
+    if thread_summaries is not None:
+        email_worker_system_prompt_template += THREAD_SUMMARY_TEMPLATE
 
-    email_tools = composio_toolset.get_tools(
+    # loaded from the on-disk schema cache when possible
+    email_tools = tool_schema_cache.get_tools(
         actions=[
             "GMAIL_SEND_EMAIL",
             "GMAIL_FETCH_EMAILS",
@@ -160,10 +188,39 @@ def build_email_react_agent(email_info, composio_entity_id):
         ],
         entity_id=composio_entity_id,
     )
-    # Wrap the fetch_emails tools to remove the 'payload' key from messages
-    for tool in email_tools:
-        if "FETCH_EMAILS" in tool.name:
-            tool.func = wrapper_funct_fetch_emails(tool)
+    if email_projection is not None:
+        # only the fields the worker needs, with compact text bodies
+        email_tools = email_projection.wrap_tools(email_tools)
+    else:
+        # Wrap the fetch_emails tools to remove the 'payload' key from messages
+        for tool in email_tools:
+            if "FETCH_EMAILS" in tool.name:
+                tool.func = wrapper_funct_fetch_emails(tool)
+    if mail_mirror is not None:
+        # the mirror syncs with the uncached fetch and learns from every fetch
+        fetch_emails = next(
+            tool.func for tool in email_tools if tool.name == "GMAIL_FETCH_EMAILS"
+        )
+        email_tools = [
+            mail_mirror.observe_tool(tool, composio_entity_id) for tool in email_tools
+        ]
+        email_tools.append(mail_mirror.search_tool(composio_entity_id, fetch_emails))
+    # cache the reads, invalidated by the writes of the same account
+    email_tools = tool_result_cache.wrap_tools(email_tools, composio_entity_id)
+    if thread_summaries is not None:
+        # summaries are checked against the cached fetch of the thread
+        fetch_thread = next(
+            tool.func
+            for tool in email_tools
+            if tool.name == "GMAIL_FETCH_MESSAGE_BY_THREAD_ID"
+        )
+        email_tools.append(
+            thread_summaries.summary_tool(composio_entity_id, fetch_thread, llm)
+        )
+    # time the queue wait of the tool calls
+    email_tools = [instrument_tool(tool) for tool in email_tools]
+    # the tool calls of a step run concurrently on the tool threads
+    email_tools = tool_executor.wrap_tools(email_tools)
 
     email_worker_builder = StateGraph(WorkersState)
     gpt_llm_with_email_tools = llm.bind_tools(email_tools)
@@ -173,7 +230,12 @@ def build_email_react_agent(email_info, composio_entity_id):
             state["workers_messages"].insert(
                 0, SystemMessage(content=email_worker_system_prompt_template)
             )
-        response = await gpt_llm_with_email_tools.ainvoke(state["workers_messages"])
+        # tool results are shrunk, the tool calls and results stay paired
+        messages, budget_config = token_budgeter.fit(
+            "worker", state["workers_messages"], drop_history=False
+        )
+        response = await gpt_llm_with_email_tools.ainvoke(messages, config=budget_config)
+        token_budgeter.record_usage("worker", response)
         return {"workers_messages": [response]}
 
     email_worker_builder.add_node("llm_with_email_tools", llm_with_email_tools)
@@ -191,16 +253,21 @@ def build_email_react_agent(email_info, composio_entity_id):
     return email_worker_builder.compile()
 
 
-email_workers_dict = {
-    "personal_email": build_email_react_agent(
-        email_info="Personal Gmail",
-        composio_entity_id="personal",
-    ),
-    "work_email": build_email_react_agent(
-        email_info="Work Gmail",
-        composio_entity_id="work",
-    ),
-}
+# the workers are built on first use, see `WorkerRegistry`
+email_workers_dict = WorkerRegistry(
+    {
+        "personal_email": partial(
+            build_email_react_agent,
+            email_info="Personal Gmail",
+            composio_entity_id="personal",
+        ),
+        "work_email": partial(
+            build_email_react_agent,
+            email_info="Work Gmail",
+            composio_entity_id="work",
+        ),
+    }
+)
 email_workers_info_dict = {
     "personal_email": "Manages all personal emails.",
     "work_email": "Manages all work-related emails.",
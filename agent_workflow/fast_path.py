@@ -0,0 +1,214 @@
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent_workflow.calendar_workers import calendar_worker_summary_list
+from agent_workflow.email_workers import email_worker_summary_list
+from agent_workflow.orchestrator import ENTRY_POINT_TEMPLATE
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+FAST_PATH_ENABLED = config.get("fast-path", "enabled", fallback="true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+# phrases of each intent, matched on whole words; bare acknowledgements
+# such as "ok", "great" or "later" are left out, they usually answer a
+# question of the assistant
+LEXICON = {
+    "greeting": [
+        "hi", "hello", "hey", "hiya", "howdy", "yo", "greetings", "hola", "salam",
+        "assalamualaikum", "good morning", "good afternoon", "good evening",
+        "how are you", "how is it going",
+    ],
+    "thanks": [
+        "thanks", "thank you", "thank u", "thx", "ty", "cheers", "appreciate it",
+        "much appreciated",
+    ],
+    "goodbye": ["bye", "goodbye", "good night", "see you", "see ya", "cya"],
+    "help": [
+        "help", "what can you do", "what do you do", "who are you", "what are you",
+        "how do you work", "what can i ask", "how can you help", "commands",
+        "what are your features", "features",
+    ],
+}
+
+# words that do not change the intent of a short message
+FILLERS = {
+    "there", "again", "all", "so", "much", "very", "a", "lot", "bot", "alloy",
+    "agent", "me", "please", "pls", "and", "you", "too", "for", "now", "then",
+    "the", "with", "oh", "well",
+}
+
+HELP_ANSWER = (
+    "I manage your calendars ({calendars}) and your mailboxes ({mailboxes}).\n\n"
+    "You can ask me, for example, to:\n"
+    "- **Schedule** a meeting: *Schedule a call with John next Friday at 3 PM*\n"
+    "- **Check** your agenda or conflicts: *What do I have tomorrow afternoon?*\n"
+    "- **Move or cancel** an event: *Move my client call to after lunch*\n"
+    "- **Summarize or search** emails: *Summarize my unread work emails*\n"
+    "- **Draft or reply** to emails: *Reply to Sara that I'll join the review*"
+)
+
+ANSWERS = {
+    "greeting": "Hello! How can I help you with your calendars or emails today?",
+    "thanks": "You're welcome! Let me know if there is anything else I can do.",
+    "goodbye": "Goodbye! I'll be here whenever you need me.",
+    "help": HELP_ANSWER.format(
+        calendars=", ".join(calendar_worker_summary_list),
+        mailboxes=", ".join(email_worker_summary_list),
+    ),
+}
+
+
+@dataclass
+class Intent:
+    name: Optional[str]
+    confidence: float
+
+
+class IntentClassifier:
+    """Lexicon-based intent of short conversational messages.
+
+    The confidence is the share of the words covered by the phrases of the
+    intent and by filler words, so "thanks a lot!" is a confident thanks
+    while "thanks, now book a room" is left to the orchestrator.
+
+    Args:
+        lexicon (dict): The phrases of each intent.
+        max_words (int): Longer messages never match.
+    """
+
+    def __init__(self, lexicon: dict[str, list[str]] = LEXICON, max_words: int = 8):
+        self.phrases = {
+            tuple(phrase.split()): intent
+            for intent, phrases in lexicon.items()
+            for phrase in phrases
+        }
+        self.longest = max(len(phrase) for phrase in self.phrases)
+        self.max_words = max_words
+
+    def classify(self, text: str) -> Intent:
+        words = re.sub(r"[^\w\s]", " ", text.casefold().replace("'", "")).split()
+        if not words or len(words) > self.max_words:
+            return Intent(None, 0.0)
+
+        matched = Counter()
+        covered = 0
+        i = 0
+        while i < len(words):
+            for size in range(min(self.longest, len(words) - i), 0, -1):
+                intent = self.phrases.get(tuple(words[i : i + size]))
+                if intent is not None:
+                    matched[intent] += size
+                    covered += size
+                    i += size
+                    break
+            else:
+                covered += words[i] in FILLERS
+                i += 1
+
+        if not matched:
+            return Intent(None, 0.0)
+        # help wins over the courtesy words around it
+        name = "help" if "help" in matched else matched.most_common(1)[0][0]
+        return Intent(name, covered / len(words))
+
+
+class FastPath:
+    """Answers greetings, thanks and help requests without the graph.
+
+    The exchange is still written to the checkpoint of the thread, as if the
+    graph had answered it, so the next requests see it in their history.
+    While the last answer of the thread is a question, e.g. a confirmation
+    asked by the orchestrator, the graph answers.
+
+    Args:
+        classifier (IntentClassifier): The intent of the requests.
+        min_confidence (float): Confidence under which the graph answers.
+    """
+
+    def __init__(self, classifier: IntentClassifier, min_confidence: float = 0.8):
+        self.classifier = classifier
+        self.min_confidence = min_confidence
+        self.requests = 0
+        self.answered = Counter()
+
+    def _intent(self, text: str) -> Optional[str]:
+        intent = self.classifier.classify(text)
+        if intent.name is None or intent.confidence < self.min_confidence:
+            return None
+        return intent.name
+
+    def answer(self, text: str, replies_to_question: bool = False) -> Optional[str]:
+        """The template answer of `text`, None when the graph must answer."""
+        self.requests += 1
+        intent = self._intent(text)
+        if intent is None or replies_to_question:
+            return None
+        self.answered[intent] += 1
+        return ANSWERS[intent]
+
+    @staticmethod
+    async def asked_question(graph, config: dict) -> bool:
+        """Whether the last answer in the thread of `config` is a question."""
+        state = await graph.aget_state(config)
+        for message in reversed(state.values.get("messages") or []):
+            if isinstance(message, AIMessage):
+                return str(message.content).rstrip(" \n*_`").endswith("?")
+        return False
+
+    async def try_answer(self, graph, text: str, config: dict) -> Optional[str]:
+        """Answer `text` and record the exchange in the thread of `config`."""
+        # the thread is only read for the messages the fast path would answer
+        replies_to_question = self._intent(text) is not None and await self.asked_question(
+            graph, config
+        )
+        answer = self.answer(text, replies_to_question)
+        if answer is None:
+            return None
+        await graph.aupdate_state(
+            config,
+            {
+                "user_input": text,
+                "messages": [
+                    HumanMessage(content=ENTRY_POINT_TEMPLATE.format(user_request=text)),
+                    AIMessage(content=answer),
+                ],
+                "manager_list": [],
+                "manager_response": [],
+            },
+            # the run ends after the output node, the thread is not left halfway
+            as_node="orchestrator_output",
+        )
+        logger.info(
+            f"Fast path answered {text!r}, {self.share:.1%} of {self.requests} requests"
+        )
+        return answer
+
+    @property
+    def share(self) -> float:
+        """The share of the requests answered without the graph."""
+        return sum(self.answered.values()) / self.requests if self.requests else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "answered": dict(self.answered),
+            "share": self.share,
+        }
+
+
+fast_path = FastPath(
+    IntentClassifier(),
+    min_confidence=float(config.get("fast-path", "min-confidence", fallback=0.8)),
+)
@@ -0,0 +1,578 @@
+import argparse
+import asyncio
+import logging
+import os
+import socket
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import psycopg
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+from agent_workflow.telemetry import telemetry_callbacks
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+JOB_QUEUE_ENABLED = config.get("job-queue", "enabled", fallback="false").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+# NOTIFY channels waking up the executors and the gateways
+JOBS_CHANNEL = "orchestrator_jobs"
+RESULTS_CHANNEL = "orchestrator_job_results"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orchestrator_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    user_input TEXT NOT NULL,
+    gateway TEXT NOT NULL,
+    reply_to JSONB NOT NULL DEFAULT '{}',
+    -- queued, running, done or failed
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    executor TEXT,
+    lease_until TIMESTAMPTZ,
+    answer TEXT,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    delivered_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS orchestrator_jobs_pending
+    ON orchestrator_jobs (thread_id, id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS orchestrator_jobs_results
+    ON orchestrator_jobs (gateway, id)
+    WHERE status IN ('done', 'failed') AND delivered_at IS NULL;
+"""
+
+PG_ENQUEUE = """
+INSERT INTO orchestrator_jobs (thread_id, user_input, gateway, reply_to)
+VALUES (%(thread_id)s, %(user_input)s, %(gateway)s, %(reply_to)s)
+RETURNING id
+"""
+
+# The oldest queued job whose thread has no earlier job queued or running,
+# so the requests of a user run one after the other, in order, whatever
+# the executor. An executor claiming the earlier job has not committed yet,
+# it still reads as queued for the others and blocks the later jobs.
+PG_CLAIM = """
+UPDATE orchestrator_jobs SET
+    status = 'running',
+    attempts = attempts + 1,
+    executor = %(executor)s,
+    started_at = now(),
+    lease_until = now() + make_interval(secs => %(lease_seconds)s)
+WHERE id = (
+    SELECT j.id FROM orchestrator_jobs j
+    WHERE j.status = 'queued'
+    AND NOT EXISTS (
+        SELECT 1 FROM orchestrator_jobs o
+        WHERE o.thread_id = j.thread_id AND o.id < j.id
+        AND o.status IN ('queued', 'running')
+    )
+    ORDER BY j.id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+)
+RETURNING id, thread_id, user_input, attempts
+"""
+
+PG_HEARTBEAT = """
+UPDATE orchestrator_jobs SET lease_until = now() + make_interval(secs => %(lease_seconds)s)
+WHERE id = ANY(%(ids)s) AND status = 'running' AND executor = %(executor)s
+"""
+
+PG_COMPLETE = """
+UPDATE orchestrator_jobs SET
+    status = 'done', answer = %(answer)s, finished_at = now(), lease_until = NULL
+WHERE id = %(id)s AND status = 'running' AND executor = %(executor)s
+RETURNING gateway
+"""
+
+# a run that raised may have sent emails or created events already, it is
+# not run again
+PG_FAIL = """
+UPDATE orchestrator_jobs SET
+    status = 'failed', error = %(error)s, finished_at = now(), lease_until = NULL
+WHERE id = %(id)s AND status = 'running' AND executor = %(executor)s
+RETURNING gateway
+"""
+
+# the jobs of executors that stopped renewing their lease, e.g. killed,
+# are the only ones run again
+PG_REQUEUE_EXPIRED = """
+UPDATE orchestrator_jobs SET
+    status = CASE WHEN attempts < %(max_attempts)s THEN 'queued' ELSE 'failed' END,
+    error = 'The executor running the request stopped.',
+    executor = NULL,
+    lease_until = NULL,
+    finished_at = CASE WHEN attempts < %(max_attempts)s THEN NULL ELSE now() END
+WHERE status = 'running' AND lease_until < now()
+RETURNING id, status
+"""
+
+PG_CLAIM_RESULTS = """
+UPDATE orchestrator_jobs SET delivered_at = now()
+WHERE id IN (
+    SELECT id FROM orchestrator_jobs
+    WHERE gateway = %(gateway)s AND status IN ('done', 'failed') AND delivered_at IS NULL
+    ORDER BY id
+    FOR UPDATE SKIP LOCKED
+    LIMIT %(limit)s
+)
+RETURNING id, thread_id, status, answer, error, reply_to
+"""
+
+PG_PRUNE = """
+DELETE FROM orchestrator_jobs
+WHERE delivered_at < now() - make_interval(secs => %(keep_seconds)s)
+"""
+
+PG_COUNTS = """
+SELECT status, count(*) AS count FROM orchestrator_jobs
+WHERE delivered_at IS NULL GROUP BY status
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    thread_id: str
+    user_input: str
+    attempts: int
+
+
+@dataclass
+class JobResult:
+    id: int
+    thread_id: str
+    status: str
+    answer: Optional[str]
+    error: Optional[str]
+    reply_to: dict
+
+
+class JobQueue:
+    """Orchestrator requests queued in Postgres for executor processes.
+
+    The gateway enqueues the requests and collects their answers, any
+    number of executor processes, on one machine or several, claim them
+    with `FOR UPDATE SKIP LOCKED` and run the graph against the shared
+    Postgres checkpointer. The jobs of a thread run one at a time and in
+    order. A running job holds a lease its executor renews; the jobs of an
+    executor that stopped are queued again, up to `max_attempts` runs. A
+    run that raised fails right away, its side effects may have happened.
+
+    NOTIFY wakes up the idle executors and gateways, which otherwise poll
+    every `poll_interval_seconds`.
+
+    Args:
+        pool (AsyncConnectionPool): The pool of the checkpointer, with
+            autocommit and dict rows.
+        conninfo (str, optional): Connection string of the LISTEN
+            connection, polling only without it.
+        lease_seconds (float): How long a job stays claimed without renewal.
+        max_attempts (int): Runs of a job losing its executor before it fails.
+        poll_interval_seconds (float): Longest wait between two polls.
+    """
+
+    def __init__(
+        self,
+        pool: AsyncConnectionPool,
+        conninfo: Optional[str] = None,
+        lease_seconds: float = 120,
+        max_attempts: int = 2,
+        poll_interval_seconds: float = 1.0,
+    ):
+        self.pool = pool
+        self.conninfo = conninfo
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval_seconds = poll_interval_seconds
+        self._listener: Optional[psycopg.AsyncConnection] = None
+        # the channels LISTENed on by `_listener`
+        self._channels: set[str] = set()
+
+    async def setup(self):
+        async with self.pool.connection() as conn:
+            await conn.execute(SCHEMA)
+
+    async def close(self):
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+            self._channels.clear()
+
+    async def enqueue(
+        self, thread_id: str, user_input: str, gateway: str, reply_to: dict
+    ) -> int:
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                cursor = await conn.execute(
+                    PG_ENQUEUE,
+                    {
+                        "thread_id": thread_id,
+                        "user_input": user_input,
+                        "gateway": gateway,
+                        "reply_to": Jsonb(reply_to),
+                    },
+                )
+                job_id = (await cursor.fetchone())["id"]
+                await conn.execute("SELECT pg_notify(%s, '')", (JOBS_CHANNEL,))
+        return job_id
+
+    async def claim(self, executor: str) -> Optional[Job]:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(
+                PG_CLAIM, {"executor": executor, "lease_seconds": self.lease_seconds}
+            )
+            row = await cursor.fetchone()
+        return Job(**row) if row else None
+
+    async def heartbeat(self, job_ids: list[int], executor: str):
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                PG_HEARTBEAT,
+                {"ids": job_ids, "executor": executor, "lease_seconds": self.lease_seconds},
+            )
+
+    async def _finish(self, query: str, params: dict) -> Optional[dict]:
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                row = await (await conn.execute(query, params)).fetchone()
+                if row is not None:
+                    await conn.execute("SELECT pg_notify(%s, %s)", (RESULTS_CHANNEL, row["gateway"]))
+                    # the next job of the thread may be claimed now
+                    await conn.execute("SELECT pg_notify(%s, '')", (JOBS_CHANNEL,))
+        return row
+
+    async def complete(self, job_id: int, executor: str, answer: str) -> bool:
+        """Store the answer, False if the job was taken from `executor`."""
+        row = await self._finish(
+            PG_COMPLETE, {"id": job_id, "executor": executor, "answer": answer}
+        )
+        return row is not None
+
+    async def fail(self, job_id: int, executor: str, error: str) -> bool:
+        """Store the error, False if the job was taken from `executor`."""
+        row = await self._finish(PG_FAIL, {"id": job_id, "executor": executor, "error": error})
+        return row is not None
+
+    async def requeue_expired(self) -> int:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(PG_REQUEUE_EXPIRED, {"max_attempts": self.max_attempts})
+            rows = await cursor.fetchall()
+            if rows:
+                await conn.execute("SELECT pg_notify(%s, '')", (JOBS_CHANNEL,))
+        for row in rows:
+            logger.warning(f"Job {row['id']} lost its executor, now {row['status']}")
+        return len(rows)
+
+    async def claim_results(self, gateway: str, limit: int = 50) -> list[JobResult]:
+        """The finished jobs of `gateway`, each returned once."""
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(PG_CLAIM_RESULTS, {"gateway": gateway, "limit": limit})
+            return [JobResult(**row) for row in await cursor.fetchall()]
+
+    async def prune(self, keep_seconds: float) -> int:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(PG_PRUNE, {"keep_seconds": keep_seconds})
+            return cursor.rowcount
+
+    async def counts(self) -> dict:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(PG_COUNTS)
+            return {row["status"]: row["count"] for row in await cursor.fetchall()}
+
+    async def wait(self, channel: str):
+        """Wait for a notification on `channel`, at most a poll interval.
+
+        A notification on another channel waited on before wakes it up too,
+        the caller polls again.
+        """
+        if self.conninfo is None:
+            await asyncio.sleep(self.poll_interval_seconds)
+            return
+        try:
+            if self._listener is None:
+                self._listener = await psycopg.AsyncConnection.connect(
+                    self.conninfo, autocommit=True
+                )
+            if channel not in self._channels:
+                await self._listener.execute(f"LISTEN {channel}")
+                self._channels.add(channel)
+            async for _ in self._listener.notifies(
+                timeout=self.poll_interval_seconds, stop_after=1
+            ):
+                pass
+        except psycopg.Error as e:
+            logger.warning(f"Listening on {channel} failed, polling: {e}")
+            await self.close()
+            await asyncio.sleep(self.poll_interval_seconds)
+
+
+class JobExecutor:
+    """Runs the queued jobs on the graph, `concurrency` at a time.
+
+    Args:
+        queue (JobQueue): Where the jobs come from.
+        graph: The compiled orchestrator graph.
+        concurrency (int): Jobs run at once by this executor.
+        name (str, optional): Identifies the executor in the jobs it claims.
+        fast_path (FastPath, optional): Answers the conversational jobs
+            without running the graph, in the order of the thread like the
+            other jobs.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        graph,
+        concurrency: int = 4,
+        name: Optional[str] = None,
+        fast_path=None,
+    ):
+        self.queue = queue
+        self.graph = graph
+        self.concurrency = concurrency
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.fast_path = fast_path
+        self.completed = 0
+        self.failed = 0
+        self._running: dict[int, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._stopping = asyncio.Event()
+
+    async def _fast_answer(self, job: Job) -> Optional[str]:
+        if self.fast_path is None:
+            return None
+        try:
+            return await self.fast_path.try_answer(
+                self.graph, job.user_input, {"configurable": {"thread_id": job.thread_id}}
+            )
+        except Exception as e:
+            logger.warning(f"Fast path failed on job {job.id}, running the graph: {e}")
+            return None
+
+    async def run_job(self, job: Job):
+        try:
+            answer = await self._fast_answer(job)
+            if answer is None:
+                response = await self.graph.ainvoke(
+                    {"user_input": job.user_input},
+                    {
+                        "configurable": {"thread_id": job.thread_id},
+                        "callbacks": telemetry_callbacks(),
+                    },
+                )
+                answer = response["messages"][-1].content
+            await self.queue.complete(job.id, self.name, answer)
+            self.completed += 1
+        except Exception as e:
+            logger.error(f"Job {job.id} of {job.thread_id} failed: {e}", exc_info=True)
+            self.failed += 1
+            await self.queue.fail(job.id, self.name, str(e))
+        finally:
+            self._running.pop(job.id, None)
+            self._slots.release()
+
+    async def _keep_leases(self):
+        """Renew the leases of the running jobs and requeue the expired ones."""
+        while not self._stopping.is_set():
+            try:
+                if self._running:
+                    await self.queue.heartbeat(list(self._running), self.name)
+                await self.queue.requeue_expired()
+            except Exception as e:
+                logger.warning(f"Renewing the job leases failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.queue.lease_seconds / 3)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Claim and run jobs until `stop` is called."""
+        leases = asyncio.create_task(self._keep_leases(), name="job-leases")
+        logger.info(f"Executor {self.name} running {self.concurrency} jobs at a time")
+        try:
+            while not self._stopping.is_set():
+                await self._slots.acquire()
+                try:
+                    job = await self.queue.claim(self.name)
+                except Exception as e:
+                    logger.warning(f"Claiming a job failed: {e}")
+                    job = None
+                if job is None:
+                    self._slots.release()
+                    await self.queue.wait(JOBS_CHANNEL)
+                    continue
+                self._running[job.id] = asyncio.create_task(
+                    self.run_job(job), name=f"job-{job.id}"
+                )
+        finally:
+            # the running jobs finish, their leases renewed meanwhile
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+            self._stopping.set()
+            await leases
+
+    def stop(self):
+        self._stopping.set()
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.name,
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+class ResultDispatcher:
+    """Enqueues the requests of a gateway and hands back their answers.
+
+    `wait` returns the result of a job enqueued by this process; results
+    nobody waits for, e.g. enqueued before a restart of the gateway, are
+    passed to `deliver`.
+
+    Args:
+        queue (JobQueue): Where the jobs go.
+        gateway (str): Identifies the gateway, each one collects its results.
+        deliver (Callable): Sends a result nobody waits for.
+        keep_finished_seconds (float): How long delivered jobs are kept.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        gateway: str,
+        deliver: Callable[[JobResult], Awaitable[None]],
+        keep_finished_seconds: float = 24 * 3600,
+    ):
+        self.queue = queue
+        self.gateway = gateway
+        self.deliver = deliver
+        self.keep_finished_seconds = keep_finished_seconds
+        self._waiting: dict[int, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, thread_id: str, user_input: str, reply_to: dict) -> int:
+        job_id = await self.queue.enqueue(thread_id, user_input, self.gateway, reply_to)
+        self._waiting[job_id] = asyncio.get_running_loop().create_future()
+        return job_id
+
+    async def wait(self, job_id: int, timeout: Optional[float] = None) -> JobResult:
+        """The result of `job_id`, raises `asyncio.TimeoutError` past `timeout`.
+
+        A result arriving after the timeout is passed to `deliver`.
+        """
+        try:
+            return await asyncio.wait_for(self._waiting[job_id], timeout)
+        finally:
+            self._waiting.pop(job_id, None)
+
+    async def dispatch_once(self) -> int:
+        results = await self.queue.claim_results(self.gateway)
+        for result in results:
+            waiting = self._waiting.get(result.id)
+            if waiting is not None and not waiting.done():
+                waiting.set_result(result)
+                continue
+            try:
+                await self.deliver(result)
+            except Exception as e:
+                logger.warning(f"Delivering the result of job {result.id} failed: {e}")
+        return len(results)
+
+    async def _run(self):
+        polls = 0
+        while True:
+            try:
+                if not await self.dispatch_once():
+                    await self.queue.wait(RESULTS_CHANNEL)
+                polls += 1
+                if polls % 3600 == 0:
+                    await self.queue.prune(self.keep_finished_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Collecting the job results failed: {e}")
+                await asyncio.sleep(self.queue.poll_interval_seconds)
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="job-results")
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.queue.close()
+
+
+def queue_from_config(pool: AsyncConnectionPool) -> JobQueue:
+    return JobQueue(
+        pool,
+        conninfo=os.getenv("POSTGRES_DB_URI"),
+        lease_seconds=float(config.get("job-queue", "lease-seconds", fallback=120)),
+        max_attempts=int(config.get("job-queue", "max-attempts", fallback=2)),
+        poll_interval_seconds=float(
+            config.get("job-queue", "poll-interval-seconds", fallback=1)
+        ),
+    )
+
+
+async def main(args):
+    """Run an executor process until interrupted."""
+    from agent_workflow.fast_path import FAST_PATH_ENABLED, fast_path
+    from agent_workflow.runtime import OrchestratorRuntime
+
+    runtime = OrchestratorRuntime()
+    await runtime.start()
+    if runtime.pool is None:
+        await runtime.shutdown()
+        raise SystemExit("The job queue needs Postgres, set POSTGRES_DB_URI")
+    queue = queue_from_config(runtime.pool)
+    await queue.setup()
+    await runtime.warm()
+    executor = JobExecutor(
+        queue,
+        runtime.graph,
+        concurrency=args.concurrency,
+        fast_path=fast_path if FAST_PATH_ENABLED else None,
+    )
+    try:
+        await executor.run()
+    finally:
+        await queue.close()
+        await runtime.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    parser = argparse.ArgumentParser(
+        description="Run queued orchestrator requests, see `[job-queue]` in config.ini."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(config.get("job-queue", "executor-concurrency", fallback=4)),
+        help="Jobs run at once by this process.",
+    )
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        logger.info("Executor stopped")
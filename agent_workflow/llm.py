@@ -0,0 +1,35 @@
+import os
+
+from dotenv import find_dotenv, load_dotenv
+from langchain_openai import ChatOpenAI
+
+from agent_workflow.llm_limiter import llm_limiter
+from config.config import Config
+
+config = Config()
+_ = load_dotenv(find_dotenv())
+
+# the LLM_BASE_URL environment variable overrides the configured endpoint,
+# e.g. to point the agents to a local OpenAI-compatible server
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or config.get(
+    "configurable", "llm-base-url", fallback="https://api.aimlapi.com/v1"
+)
+
+
+def build_llm() -> ChatOpenAI:
+    """The chat model of the agents, as configured in `[configurable]`.
+
+    The requests of every model built here share the `llm_limiter`.
+    """
+    clients = {}
+    if llm_limiter is not None:
+        clients = {
+            "http_client": llm_limiter.http_client(),
+            "http_async_client": llm_limiter.http_async_client(),
+        }
+    return ChatOpenAI(
+        model=config.get("configurable", "llm-model"),
+        temperature=config.get("configurable", "llm-temperature"),
+        base_url=LLM_BASE_URL,
+        **clients,
+    )
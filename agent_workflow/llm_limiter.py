@@ -0,0 +1,420 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+import openai
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+# a request waiting longer is logged
+SLOW_WAIT_SECONDS = 1.0
+# longest Retry-After honoured, the OpenAI client retries on its own too
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+
+class _TokenBucket:
+    """`per_minute` units refilled continuously, up to `burst_seconds` worth."""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def delay(self, cost: float, now: float) -> float:
+        """Seconds until `cost` units are available."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # a cost above the capacity waits for a full bucket, then goes in debt
+        missing = min(cost, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, cost: float):
+        self.level -= cost
+
+
+class _Waiter:
+    """A request waiting for its turn, woken up from any thread."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def notify(self):
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # its event loop is closed
+            pass
+
+
+class LLMLimiter:
+    """Paces the requests of every LLM client of the process.
+
+    The requests wait in a single FIFO queue for a concurrency slot and,
+    when configured, for the requests and prompt tokens per minute of the
+    provider, see `_TokenBucket`. The number of slots adapts AIMD style:
+    it grows by one every `limit` successful requests and is cut by
+    `decrease_factor` on a 429, a timeout or an answer slower than
+    `latency_target_seconds`, once per round of requests sent before the
+    previous cut. A Retry-After header holds every request until it passes.
+
+    The sync and async clients, on any thread and event loop, share it,
+    see `http_client` and `http_async_client`.
+
+    Args:
+        requests_per_minute (float): 0 for no limit.
+        tokens_per_minute (float): Prompt tokens, estimated from the size of
+            the requests, 0 for no limit.
+        burst_seconds (float): The buckets hold this many seconds of their rate.
+        initial_concurrency (int): Slots before any answer is seen.
+        min_concurrency (int): The slots are never cut below it.
+        max_concurrency (int): The slots never grow above it.
+        latency_target_seconds (float): Slower answers cut the slots, 0 to
+            adapt to the 429s only.
+        decrease_factor (float): Multiplies the slots when cut.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        burst_seconds: float = 10,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        latency_target_seconds: float = 0,
+        decrease_factor: float = 0.5,
+    ):
+        self._requests = (
+            _TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        )
+        self._tokens = (
+            _TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        )
+        self.min_concurrency = max(min_concurrency, 1)
+        self.max_concurrency = max(max_concurrency, self.min_concurrency)
+        self.limit = float(
+            min(max(initial_concurrency, self.min_concurrency), self.max_concurrency)
+        )
+        self.latency_target_seconds = latency_target_seconds
+        self.decrease_factor = decrease_factor
+        self._lock = threading.Lock()
+        self._waiters: deque[_Waiter] = deque()
+        self._last_decrease = -math.inf
+        self._blocked_until = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.throttled = 0
+        self.decreases = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _enqueue(self, waiter: _Waiter):
+        with self._lock:
+            self._waiters.append(waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+
+    def _abandon(self, waiter: _Waiter):
+        with self._lock:
+            if waiter in self._waiters:
+                was_first = self._waiters[0] is waiter
+                self._waiters.remove(waiter)
+                if was_first and self._waiters:
+                    self._waiters[0].notify()
+
+    def _admit(self, waiter: _Waiter, tokens: int, queued_at: float) -> Optional[float]:
+        """Admit `waiter`, or the seconds to wait before trying again, inf
+        for until another request finishes."""
+        with self._lock:
+            if self._waiters[0] is not waiter:
+                return math.inf
+            now = time.monotonic()
+            delay = max(
+                self._blocked_until - now,
+                self._requests.delay(1, now) if self._requests else 0.0,
+                self._tokens.delay(tokens, now) if self._tokens else 0.0,
+            )
+            if delay > 0:
+                return delay
+            if self.in_flight >= int(self.limit):
+                return math.inf
+            self._waiters.popleft()
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(tokens)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.requests += 1
+            waited = now - queued_at
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if self._waiters:
+                self._waiters[0].notify()
+        if waited > SLOW_WAIT_SECONDS:
+            logger.debug(f"LLM request waited {waited:.2f}s for the limiter")
+        return None
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Wait for the turn of a request, returns when it started."""
+        waiter = _Waiter()
+        queued_at = time.monotonic()
+        self._enqueue(waiter)
+        try:
+            while (delay := self._admit(waiter, tokens, queued_at)) is not None:
+                waiter.event.wait(None if delay == math.inf else delay)
+                waiter.event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return time.monotonic()
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        waiter = _Waiter(asyncio.get_running_loop())
+        queued_at = time.monotonic()
+        self._enqueue(waiter)
+        try:
+            while (delay := self._admit(waiter, tokens, queued_at)) is not None:
+                try:
+                    await asyncio.wait_for(
+                        waiter.event.wait(), None if delay == math.inf else delay
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return time.monotonic()
+
+    def release(
+        self,
+        started_at: float,
+        latency: Optional[float] = None,
+        throttled: bool = False,
+        retry_after: float = 0.0,
+    ):
+        """Free the slot of a request and adapt the slots to its outcome.
+
+        Args:
+            started_at (float): As returned by `acquire`.
+            latency (float, optional): Seconds until the response headers,
+                None when the request failed for another reason.
+            throttled (bool): The provider answered 429 or timed out.
+            retry_after (float): Seconds the provider asked to wait.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            slow = (
+                self.latency_target_seconds > 0
+                and latency is not None
+                and latency > self.latency_target_seconds
+            )
+            self.throttled += throttled
+            if throttled or slow:
+                # the answers to requests sent before the last cut do not
+                # cut again, they saw the previous load
+                if started_at > self._last_decrease:
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+                    logger.info(
+                        f"LLM {'throttled' if throttled else 'slow'}, "
+                        f"concurrency cut to {int(self.limit)}"
+                    )
+            elif latency is not None:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if retry_after > 0:
+                self._blocked_until = max(
+                    self._blocked_until, now + min(retry_after, MAX_RETRY_AFTER_SECONDS)
+                )
+            if self._waiters:
+                self._waiters[0].notify()
+
+    def http_client(self) -> httpx.Client:
+        """A client for the `http_client` of `ChatOpenAI`."""
+        return openai.DefaultHttpxClient(transport=LimitedTransport(self))
+
+    def http_async_client(self) -> httpx.AsyncClient:
+        """A client for the `http_async_client` of `ChatOpenAI`."""
+        return openai.DefaultAsyncHttpxClient(transport=AsyncLimitedTransport(self))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "concurrency": int(self.limit),
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": len(self._waiters),
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "decreases": self.decreases,
+                "mean_wait_seconds": self.wait_seconds / self.requests if self.requests else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """Prompt tokens of a request, from its size: about 4 bytes a token."""
+    try:
+        return len(request.content) // 4
+    except httpx.RequestNotRead:
+        return 0
+
+
+def retry_after(response: httpx.Response) -> float:
+    """The wait asked by the provider, in seconds, 0 if none."""
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return float(response.headers[header]) / scale
+        except (KeyError, ValueError):
+            continue
+    return 0.0
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """The body of a response, frees its slot once closed."""
+
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            release, self.release = self.release, None
+            if release is not None:
+                release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            release, self.release = self.release, None
+            if release is not None:
+                release()
+
+
+def _outcome(response: httpx.Response, started_at: float) -> dict:
+    return {
+        "started_at": started_at,
+        "latency": time.monotonic() - started_at,
+        "throttled": response.status_code == 429,
+        "retry_after": retry_after(response) if response.status_code in (429, 503) else 0.0,
+    }
+
+
+class LimitedTransport(httpx.BaseTransport):
+    """Sends the requests of a sync client through `limiter`.
+
+    A request holds its slot until its response is closed, streamed
+    answers included.
+    """
+
+    def __init__(self, limiter: LLMLimiter, transport: Optional[httpx.BaseTransport] = None):
+        self.limiter = limiter
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started_at = self.limiter.acquire(estimate_tokens(request))
+        try:
+            response = self.transport.handle_request(request)
+        except httpx.TimeoutException:
+            self.limiter.release(started_at, time.monotonic() - started_at, throttled=True)
+            raise
+        except BaseException:
+            self.limiter.release(started_at)
+            raise
+        outcome = _outcome(response, started_at)
+        response.stream = _ReleasingStream(
+            response.stream, lambda: self.limiter.release(**outcome)
+        )
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncLimitedTransport(httpx.AsyncBaseTransport):
+    """Sends the requests of an async client through `limiter`."""
+
+    def __init__(
+        self, limiter: LLMLimiter, transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.limiter = limiter
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started_at = await self.limiter.aacquire(estimate_tokens(request))
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TimeoutException:
+            self.limiter.release(started_at, time.monotonic() - started_at, throttled=True)
+            raise
+        except BaseException:
+            self.limiter.release(started_at)
+            raise
+        outcome = _outcome(response, started_at)
+        response.stream = _AsyncReleasingStream(
+            response.stream, lambda: self.limiter.release(**outcome)
+        )
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+LIMITER_ENABLED = config.get("llm-limiter", "enabled", fallback="true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+llm_limiter = (
+    LLMLimiter(
+        requests_per_minute=float(config.get("llm-limiter", "requests-per-minute", fallback=0)),
+        tokens_per_minute=float(config.get("llm-limiter", "tokens-per-minute", fallback=0)),
+        burst_seconds=float(config.get("llm-limiter", "burst-seconds", fallback=10)),
+        initial_concurrency=int(config.get("llm-limiter", "initial-concurrency", fallback=8)),
+        min_concurrency=int(config.get("llm-limiter", "min-concurrency", fallback=1)),
+        max_concurrency=int(config.get("llm-limiter", "max-concurrency", fallback=32)),
+        latency_target_seconds=float(
+            config.get("llm-limiter", "latency-target-seconds", fallback=0)
+        ),
+        decrease_factor=float(config.get("llm-limiter", "decrease-factor", fallback=0.5)),
+    )
+    if LIMITER_ENABLED
+    else None
+)
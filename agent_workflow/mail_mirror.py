@@ -0,0 +1,480 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import pytz
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+timezone = pytz.timezone(config.get("configurable", "timezone"))
+
+SNIPPET_LENGTH = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    entity_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    thread_id TEXT,
+    subject TEXT,
+    sender TEXT,
+    snippet TEXT,
+    labels TEXT,
+    date INTEGER,
+    UNIQUE (entity_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS messages_entity_date ON messages (entity_id, date);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, sender, snippet, labels,
+    content='messages', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, subject, sender, snippet, labels)
+    VALUES (new.rowid, new.subject, new.sender, new.snippet, new.labels);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, sender, snippet, labels)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.snippet, old.labels);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, sender, snippet, labels)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.snippet, old.labels);
+    INSERT INTO messages_fts (rowid, subject, sender, snippet, labels)
+    VALUES (new.rowid, new.subject, new.sender, new.snippet, new.labels);
+END;
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    entity_id TEXT PRIMARY KEY,
+    -- every message newer than oldest_date and older than newest_date is mirrored
+    newest_date INTEGER NOT NULL,
+    oldest_date INTEGER,
+    -- a forward pass capped by the sync budget, resumed by the next sync
+    forward_token TEXT,
+    forward_newest INTEGER,
+    -- the backfill lists the messages before backfill_before, newest first
+    backfill_before INTEGER NOT NULL,
+    backfill_token TEXT,
+    backfill_done INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+);
+"""
+
+CURSOR_COLUMNS = (
+    "entity_id",
+    "newest_date",
+    "oldest_date",
+    "forward_token",
+    "forward_newest",
+    "backfill_before",
+    "backfill_token",
+    "backfill_done",
+    "synced_at",
+)
+
+UPSERT = """
+INSERT INTO messages (entity_id, message_id, thread_id, subject, sender, snippet, labels, date)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (entity_id, message_id) DO UPDATE SET
+    thread_id = excluded.thread_id,
+    subject = excluded.subject,
+    sender = excluded.sender,
+    snippet = excluded.snippet,
+    labels = excluded.labels,
+    date = excluded.date
+"""
+
+
+def _timestamp(value) -> Optional[int]:
+    """POSIX timestamp of a Gmail message date (ISO string or epoch ms).
+
+    Naive values are in the configured timezone.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return int(value) // 1000
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = timezone.localize(parsed)
+    return int(parsed.timestamp())
+
+
+def message_row(entity_id: str, message: dict) -> Optional[tuple]:
+    """The mirrored columns of a Composio Gmail message, None if it has no id."""
+    message_id = message.get("messageId") or message.get("id")
+    if not message_id:
+        return None
+    preview = message.get("preview") or {}
+    snippet = (
+        message.get("snippet") or preview.get("body") or message.get("messageText") or ""
+    )
+    labels = message.get("labelIds") or []
+    return (
+        entity_id,
+        message_id,
+        message.get("threadId"),
+        message.get("subject") or preview.get("subject") or "",
+        message.get("sender") or "",
+        re.sub(r"\s+", " ", snippet).strip()[:SNIPPET_LENGTH],
+        " ".join(labels) if isinstance(labels, list) else str(labels),
+        _timestamp(message.get("messageTimestamp") or message.get("internalDate")),
+    )
+
+
+def fts_query(text: str) -> str:
+    """Match every word of `text`, FTS5 operators are not exposed.
+
+    Words are stemmed by the index, so "invoices" also finds "invoice".
+    """
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+class MailMirror:
+    """Local SQLite FTS5 mirror of the Gmail messages of each entity.
+
+    Messages are added when they pass through the Gmail fetch tools and by
+    syncs. A sync first lists the mail newer than the mirrored range, then
+    continues the backfill of the older mail, `sync_max_messages` at most
+    in all; a listing cut by that budget is resumed by the next sync, and
+    the mirrored range only grows over fully listed mail. The messages
+    seen by the fetch tools are stored but do not move the range, they may
+    skip older mail. Searches run on the local full-text index.
+
+    Args:
+        path (str): SQLite database file.
+        sync_interval_seconds (float): Minimum time between two syncs of an entity.
+        sync_max_messages (int): Messages fetched by one sync at most.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sync_interval_seconds: float = 300,
+        sync_max_messages: int = 500,
+    ):
+        self.path = path
+        self.sync_interval_seconds = sync_interval_seconds
+        self.sync_max_messages = sync_max_messages
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _store(self, entity_id: str, messages: list[dict]) -> list[tuple]:
+        rows = [row for row in (message_row(entity_id, m) for m in messages) if row]
+        if rows:
+            with self._lock, self._connection:
+                self._connection.executemany(UPSERT, rows)
+        return rows
+
+    def ingest(self, entity_id: str, messages: list[dict]) -> int:
+        """Upsert `messages`, returns how many were stored."""
+        return len(self._store(entity_id, messages))
+
+    def count(self, entity_id: str) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT count(*) FROM messages WHERE entity_id = ?", (entity_id,)
+            ).fetchone()[0]
+
+    def _cursor(self, entity_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {', '.join(CURSOR_COLUMNS)} FROM sync_cursors WHERE entity_id = ?",
+                (entity_id,),
+            ).fetchone()
+        return dict(zip(CURSOR_COLUMNS, row)) if row else None
+
+    def _save_cursor(self, cursor: dict):
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"""
+                INSERT OR REPLACE INTO sync_cursors ({', '.join(CURSOR_COLUMNS)})
+                VALUES ({', '.join('?' for _ in CURSOR_COLUMNS)})
+                """,
+                [cursor[column] for column in CURSOR_COLUMNS],
+            )
+
+    def _fetch_pages(
+        self, entity_id: str, fetch_emails, query: str, page_token: Optional[str], budget: int
+    ) -> tuple[int, list[int], Optional[str], bool]:
+        """Mirror the pages of `query` from `page_token`, `budget` messages at most.
+
+        Returns the messages stored, their dates, the token to resume the
+        listing from, None once it is complete, and False if a fetch failed.
+        """
+        fetched = 0
+        dates = []
+        while fetched < budget:
+            result = fetch_emails(
+                query=query,
+                max_results=min(100, budget - fetched),
+                page_token=page_token,
+            )
+            if not isinstance(result, dict) or result.get("error"):
+                logger.warning(f"Mail mirror sync of {entity_id} failed: {result}")
+                return fetched, dates, page_token, False
+            data = result.get("data") or {}
+            messages = data.get("messages") or []
+            rows = self._store(entity_id, messages)
+            fetched += len(rows)
+            dates.extend(row[7] for row in rows if row[7] is not None)
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                return fetched, dates, None, True
+            if not messages:
+                break
+        return fetched, dates, page_token, True
+
+    def sync(self, entity_id: str, fetch_emails, force: bool = False) -> int:
+        """Mirror the new messages, then continue the backfill.
+
+        `fetch_emails` is the function of the GMAIL_FETCH_EMAILS tool of the
+        entity. Returns the number of fetched messages.
+        """
+        cursor = self._cursor(entity_id)
+        if (
+            not force
+            and cursor is not None
+            and cursor["synced_at"] is not None
+            and time.time() - cursor["synced_at"] < self.sync_interval_seconds
+        ):
+            return 0
+        if cursor is None:
+            # the backfill lists the mail older than now, the syncs the newer
+            now = int(time.time())
+            cursor = dict.fromkeys(CURSOR_COLUMNS)
+            cursor.update(
+                entity_id=entity_id, newest_date=now, backfill_before=now, backfill_done=0
+            )
+
+        # the query stays the same until the listing is complete, for its page tokens
+        fetched, dates, token, ok = self._fetch_pages(
+            entity_id,
+            fetch_emails,
+            f"after:{cursor['newest_date']}",
+            cursor["forward_token"],
+            self.sync_max_messages,
+        )
+        newest = max(dates + [cursor["forward_newest"] or cursor["newest_date"]])
+        if ok and token is None:
+            cursor.update(newest_date=newest, forward_token=None, forward_newest=None)
+        else:
+            cursor.update(forward_token=token, forward_newest=newest)
+
+        if ok and not cursor["backfill_done"] and fetched < self.sync_max_messages:
+            backfilled, dates, token, ok = self._fetch_pages(
+                entity_id,
+                fetch_emails,
+                f"before:{cursor['backfill_before']}",
+                cursor["backfill_token"],
+                self.sync_max_messages - fetched,
+            )
+            fetched += backfilled
+            # pages come newest first, the mirrored range reaches the oldest
+            if dates:
+                cursor["oldest_date"] = min(dates + [cursor["oldest_date"] or dates[0]])
+            cursor.update(backfill_token=token, backfill_done=int(ok and token is None))
+
+        cursor["synced_at"] = time.time()
+        self._save_cursor(cursor)
+        return fetched
+
+    def coverage(self, entity_id: str) -> dict:
+        """Whether the whole mailbox is mirrored, else since when."""
+        cursor = self._cursor(entity_id)
+        if cursor is None:
+            return {"complete": False, "mirrored_since": None}
+        if cursor["backfill_done"]:
+            return {"complete": True, "mirrored_since": None}
+        since = cursor["oldest_date"] or cursor["backfill_before"]
+        return {
+            "complete": False,
+            "mirrored_since": datetime.fromtimestamp(since, timezone).isoformat(),
+        }
+
+    def search(
+        self,
+        entity_id: str,
+        query: str = "",
+        sender: Optional[str] = None,
+        label: Optional[str] = None,
+        after: Optional[int] = None,
+        before: Optional[int] = None,
+        limit: int = 10,
+    ) -> list[dict]:
+        """The newest messages matching every given filter."""
+        conditions = ["m.entity_id = ?"]
+        parameters = [entity_id]
+        match = fts_query(query)
+        if match:
+            conditions.append(
+                "m.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)"
+            )
+            parameters.append(match)
+        if sender:
+            conditions.append("m.sender LIKE ?")
+            parameters.append(f"%{sender}%")
+        if label:
+            conditions.append("(' ' || m.labels || ' ') LIKE ?")
+            parameters.append(f"% {label.upper()} %")
+        if after is not None:
+            conditions.append("m.date >= ?")
+            parameters.append(after)
+        if before is not None:
+            conditions.append("m.date < ?")
+            parameters.append(before)
+        parameters.append(limit)
+        with self._lock:
+            rows = self._connection.execute(
+                f"""
+                SELECT m.message_id, m.thread_id, m.date, m.sender, m.subject,
+                       m.snippet, m.labels
+                FROM messages m
+                WHERE {" AND ".join(conditions)}
+                ORDER BY m.date DESC
+                LIMIT ?
+                """,
+                parameters,
+            ).fetchall()
+        return [
+            {
+                "message_id": message_id,
+                "thread_id": thread_id,
+                "date": (
+                    datetime.fromtimestamp(date, timezone).isoformat()
+                    if date is not None
+                    else None
+                ),
+                "sender": sender,
+                "subject": subject,
+                "snippet": snippet,
+                "labels": labels.split(),
+            }
+            for message_id, thread_id, date, sender, subject, snippet, labels in rows
+        ]
+
+    def observe_tool(self, tool: StructuredTool, entity_id: str) -> StructuredTool:
+        """Mirror the messages returned by a Gmail fetch tool, in place."""
+        if tool.name != "GMAIL_FETCH_EMAILS":
+            return tool
+        original_func = tool.func
+
+        def mirrored_tool_function(**kwargs):
+            result = original_func(**kwargs)
+            try:
+                if isinstance(result, dict) and not result.get("error"):
+                    self.ingest(entity_id, (result.get("data") or {}).get("messages") or [])
+            except Exception as e:
+                logger.warning(f"Mail mirror could not store messages: {e}")
+            return result
+
+        tool.func = mirrored_tool_function
+        return tool
+
+    def search_tool(self, entity_id: str, fetch_emails) -> StructuredTool:
+        """A tool that searches the local mirror of `entity_id`.
+
+        The mirror is synced with `fetch_emails`, the function of the
+        GMAIL_FETCH_EMAILS tool, before searching, at most once per
+        `sync_interval_seconds`.
+        """
+
+        def search_local_emails(
+            query: str = "",
+            sender: Optional[str] = None,
+            label: Optional[str] = None,
+            after_date: Optional[str] = None,
+            before_date: Optional[str] = None,
+            limit: int = 10,
+        ) -> dict:
+            try:
+                self.sync(entity_id, fetch_emails)
+            except Exception as e:
+                logger.warning(f"Mail mirror sync of {entity_id} failed: {e}")
+            hits = self.search(
+                entity_id,
+                query=query,
+                sender=sender,
+                label=label,
+                after=_timestamp(after_date),
+                before=_timestamp(before_date),
+                limit=max(1, min(limit, 50)),
+            )
+            data = {"messages": hits, **self.coverage(entity_id)}
+            if not data["complete"]:
+                data["note"] = (
+                    f"Only the emails since {data['mirrored_since'] or 'now'} are "
+                    "mirrored yet, use GMAIL_FETCH_EMAILS for older emails."
+                )
+            return {"data": data, "error": None, "successful": True}
+
+        class SearchLocalEmailsRequest(BaseModel):
+            query: str = Field(
+                default="",
+                description="Words to find in the subject, sender, snippet or labels.",
+            )
+            sender: Optional[str] = Field(
+                default=None, description="Part of the sender name or address."
+            )
+            label: Optional[str] = Field(
+                default=None, description="A label id such as `INBOX` or `STARRED`."
+            )
+            after_date: Optional[str] = Field(
+                default=None,
+                description="Only messages on or after this `YYYY-MM-DDTHH:MM:SS`.",
+            )
+            before_date: Optional[str] = Field(
+                default=None,
+                description="Only messages before this `YYYY-MM-DDTHH:MM:SS`.",
+            )
+            limit: int = Field(default=10, description="Maximum number of hits, up to 50.")
+
+        return StructuredTool.from_function(
+            func=search_local_emails,
+            name="SEARCH_LOCAL_EMAILS",
+            description=(
+                "Instantly search the mirrored mailbox by words, sender, label "
+                "and date range. Returns the newest matching emails with their "
+                "`thread_id` and a short snippet, and since when the mailbox "
+                "is mirrored while older emails are still being copied."
+            ),
+            args_schema=SearchLocalEmailsRequest,
+        )
+
+
+MIRROR_ENABLED = config.get("gmail-mirror", "enabled", fallback="false").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+mail_mirror = (
+    MailMirror(
+        path=config.get("gmail-mirror", "path", fallback="mail_mirror.db"),
+        sync_interval_seconds=float(
+            config.get("gmail-mirror", "sync-interval-seconds", fallback=300)
+        ),
+        sync_max_messages=int(
+            config.get("gmail-mirror", "sync-max-messages", fallback=500)
+        ),
+    )
+    if MIRROR_ENABLED
+    else None
+)
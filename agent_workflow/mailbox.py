@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import re
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def coalesce_messages(texts: list[str]) -> str:
+    """Join a burst of messages into one request, dropping duplicates."""
+    seen = set()
+    lines = []
+    for text in texts:
+        key = re.sub(r"\s+", " ", text).strip().casefold()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        lines.append(text.strip())
+    return "\n".join(lines)
+
+
+class _Conversation:
+    def __init__(self):
+        self.pending = []
+        self.arrived = asyncio.Event()
+        self.task = None
+
+
+class ConversationMailbox:
+    """Serializes the runs of each conversation and coalesces bursts.
+
+    Messages of the same thread are queued and handed to `handler` in
+    batches: a batch is sent once no new message arrived for
+    `debounce_seconds`, or `max_wait_seconds` after its first message.
+    Only one batch per thread is handled at a time, so runs never race on
+    the same checkpoint. Different threads run concurrently.
+
+    Args:
+        handler (Callable): Coroutine function called as
+            `handler(thread_id, items)` with the queued items in order.
+        debounce_seconds (float): Quiet time that closes a batch.
+        max_wait_seconds (float): Maximum time a batch stays open.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, list[Any]], Awaitable[None]],
+        debounce_seconds: float = 1.5,
+        max_wait_seconds: float = 5.0,
+    ):
+        self.handler = handler
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._conversations = {}
+        self.received = 0
+        self.batches = 0
+
+    @property
+    def coalesced(self) -> int:
+        """Messages that did not need their own run."""
+        return self.received - self.batches
+
+    def submit(self, thread_id: str, item: Any):
+        """Queue `item` for its thread and start the thread runner if idle."""
+        self.received += 1
+        conversation = self._conversations.setdefault(thread_id, _Conversation())
+        conversation.pending.append(item)
+        conversation.arrived.set()
+        if conversation.task is None or conversation.task.done():
+            conversation.task = asyncio.create_task(
+                self._run(thread_id, conversation)
+            )
+
+    async def _debounce(self, conversation: _Conversation):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait_seconds
+        while True:
+            conversation.arrived.clear()
+            timeout = min(self.debounce_seconds, deadline - loop.time())
+            if timeout <= 0:
+                return
+            try:
+                await asyncio.wait_for(conversation.arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
+
+    async def _run(self, thread_id: str, conversation: _Conversation):
+        try:
+            while conversation.pending:
+                await self._debounce(conversation)
+                batch, conversation.pending = conversation.pending, []
+                self.batches += 1
+                if len(batch) > 1:
+                    logger.debug(f"Coalesced {len(batch)} messages of {thread_id}")
+                try:
+                    await self.handler(thread_id, batch)
+                except Exception as e:
+                    logger.error(
+                        f"Error handling messages of {thread_id}: {e}", exc_info=True
+                    )
+        finally:
+            if self._conversations.get(thread_id) is conversation:
+                del self._conversations[thread_id]
+
+    async def drain(self):
+        """Wait until every queued message is handled."""
+        while self._conversations:
+            await asyncio.gather(
+                *[c.task for c in list(self._conversations.values()) if c.task],
+                return_exceptions=True,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "batches": self.batches,
+            "coalesced": self.coalesced,
+            "active_threads": len(self._conversations),
+        }
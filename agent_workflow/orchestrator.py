@@ -1,32 +1,32 @@
 import asyncio
+import logging
 import os
-import sqlite3
+from collections import Counter
 from typing import Literal, Annotated, Sequence
 from typing_extensions import TypedDict
-from psycopg_pool import ConnectionPool
-from agent_workflow.database import PostgresSaverCustom
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-import aiosqlite
-from langgraph.checkpoint.sqlite import SqliteSaver
+from agent_workflow.database import PostgresSaverCustom, SqliteSaverCustom
 from langgraph.types import Command
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
+from langchain_core.callbacks import adispatch_custom_event
+from langchain_core.runnables import RunnableLambda, ensure_config
 from langchain_core.messages import (
     AIMessage,
     BaseMessage,
     HumanMessage,
     SystemMessage,
-    trim_messages,
 )
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv, find_dotenv
 from config.config import Config
+from agent_workflow.llm import build_llm
+from agent_workflow.token_budget import token_budgeter
 
-from agent_workflow.date_worker import calculate_date
+from agent_workflow.date_worker import acalculate_date
 from agent_workflow.calendar_workers import calendar_workers_dict
 from agent_workflow.email_workers import email_workers_dict
 from agent_workflow.prompts import (
     ENTRY_PROMPT_ORCHESTRATOR,
+    PLANNER_PROMPT_ORCHESTRATOR,
     RESPONSE_PROMPT_ORCHESTRATOR,
     feedback_email_manager_prompt_template,
     feedback_calendar_manager_prompt_template,
@@ -41,6 +41,7 @@ from agent_workflow.schemas import (
     CalendarRouterList,
     EmailRouterList,
     OrchestratorRouter,
+    OrchestratorPlan,
 )
 
 # Load env
@@ -70,8 +71,22 @@ MANAGER_TEMPLATE = """
 {manager_response_context}
 """
 
+logger = logging.getLogger(__name__)
+
 config = Config()
 
+# "router": the orchestrator routes the managers and every manager routes
+# its workers, "planner": the orchestrator plans the workers too
+ORCHESTRATOR_MODE = config.get("configurable", "orchestrator-mode", fallback="router")
+
+# pass a single worker answer through the feedback and output LLM calls,
+# see `feedback_pass_through` and `output_pass_through`
+PASS_THROUGH = config.get(
+    "configurable", "pass-through-single-answers", fallback="true"
+).lower() in ("1", "true", "yes", "on")
+# LLM calls skipped since the start of the process, by node
+skipped_hops = Counter()
+
 class GraphState(TypedDict):
     """The state of the supervisor agents."""
 
@@ -82,28 +97,16 @@ class GraphState(TypedDict):
     supervisors_messages: list[BaseMessage]
     manager_response: list[dict]
     manager_list: list[OrchestratorRouter]
+    # LLM calls the last request skipped, see `PASS_THROUGH`
+    skipped_hops: int
 
 
-llm_orchestrator =ChatOpenAI(model=config.get("configurable", "llm-model"),
-                              temperature=config.get("configurable", "llm-temperature"),
-                             base_url="https://api.aimlapi.com/v1")
-llm = ChatOpenAI(model=config.get("configurable", "llm-model"),
-                              temperature=config.get("configurable", "llm-temperature"),
-                             base_url="https://api.aimlapi.com/v1")
-
-trimmer = trim_messages(
-    max_tokens=7,  # to keep the last 3 interactions messages
-    strategy="last",
-    token_counter=len,
-    include_system=True,
-    start_on="human",
-    end_on=("human",),
-)
-
+llm_orchestrator = build_llm()
+llm = build_llm()
 
 async def orchestrator_input_node(
     state: GraphState,
-) -> Command[Literal["orchestrator"]]:
+) -> Command[Literal["orchestrator", "orchestrator_output"]]:
     """An orchestrator node. Entry point of the graph."""
 
     # we must create the user message
@@ -115,19 +118,39 @@ async def orchestrator_input_node(
                 )
             )
         )
-    messages = [SystemMessage(content=ENTRY_PROMPT_ORCHESTRATOR)] + trimmer.invoke(
-        state["messages"]
+    if ORCHESTRATOR_MODE == "planner":
+        prompt, schema = PLANNER_PROMPT_ORCHESTRATOR, OrchestratorPlan
+    else:
+        prompt, schema = ENTRY_PROMPT_ORCHESTRATOR, OrchestratorRouterList
+    # keep the latest interactions that fit in the token budget
+    messages, budget_config = token_budgeter.fit(
+        "orchestrator_input", [SystemMessage(content=prompt)] + state["messages"]
     )
 
-    response: OrchestratorRouterList = llm_orchestrator.with_structured_output(
-        OrchestratorRouterList
-    ).invoke(messages)
+    response: OrchestratorRouterList = await llm_orchestrator.with_structured_output(
+        schema
+    ).ainvoke(messages, config=budget_config)
     return Command(
-        goto="orchestrator",
+        # nothing to route, answer right away
+        goto="orchestrator" if response.managers else "orchestrator_output",
         update={"manager_list": response.managers, "manager_response": []},
     )
 
 
+def output_pass_through(manager_response: list[dict]):
+    """The answer of the request when it needs no rewriting, else None.
+
+    Rules: exactly one manager other than the date manager answered, and
+    its answer is the single worker answer it passed through, see
+    `feedback_pass_through`. The worker answer is already formatted for the
+    user; the date range only served to build its task.
+    """
+    answers = [r for r in manager_response if r["route_manager"] != "date_manage"]
+    if PASS_THROUGH and len(answers) == 1 and answers[0].get("passthrough"):
+        return answers[0]["answer"]
+    return None
+
+
 async def orchestrator_output_node(
     state: GraphState,
 ) -> Command[Literal[END]]:
@@ -143,64 +166,216 @@ async def orchestrator_output_node(
         )
     )
 
-    # timmer here, to use just the last 3 user interactions
-    messages = [SystemMessage(content=RESPONSE_PROMPT_ORCHESTRATOR)] + trimmer.invoke(
-        state["messages"]
-    )
-    ai_response = llm.invoke(messages)
+    manager_response = state.get("manager_response") or []
+    # the feedback calls the managers skipped
+    skipped = sum(1 for response in manager_response if response.get("passthrough"))
+    answer = output_pass_through(manager_response)
+    if answer is not None:
+        ai_response = AIMessage(content=answer)
+        skipped += 1
+        skipped_hops["orchestrator_output"] += 1
+    else:
+        # keep the latest interactions that fit in the token budget
+        messages, budget_config = token_budgeter.fit(
+            "orchestrator_output",
+            [SystemMessage(content=RESPONSE_PROMPT_ORCHESTRATOR)] + state["messages"],
+        )
+        ai_response = await llm.ainvoke(messages, config=budget_config)
+        token_budgeter.record_usage("orchestrator_output", ai_response)
+
+    if skipped:
+        logger.debug(f"Skipped {skipped} LLM calls, {dict(skipped_hops)} in total")
 
     return Command(
         goto=END,
         update={
             "messages": [ai_response],
+            "skipped_hops": skipped,
         },
     )
 
 
+# status lines shown to streaming clients while a manager runs
+MANAGER_STATUS = {
+    "date_manage": "Working out the dates",
+    "calendar_manage": "Checking the calendars",
+    "email_manage": "Checking the mailboxes",
+}
+
+
+async def report_status(status: str):
+    """Emit a `status` custom event for the clients of `astream_events`."""
+    try:
+        await adispatch_custom_event("status", {"status": status})
+    except RuntimeError:
+        # not running inside a graph run, nobody is listening
+        pass
+
+
+def manager_dependencies(manager_list: list[OrchestratorRouter], index: int) -> set:
+    """The positions of the managers that must answer before `index` runs.
+
+    Without an explicit `depends_on` a manager depends on every previous
+    manager, the date managers included, which keeps the sequential
+    semantics. An explicit list is followed as given, less the dependencies
+    on later managers, dropped to rule out cycles.
+    """
+    router = manager_list[index]
+    if router.depends_on is None:
+        return set(range(index))
+    return {i for i in router.depends_on if 0 <= i < index}
+
+
+def ready_managers(manager_list: list[OrchestratorRouter], done: set) -> list[int]:
+    """The positions of the pending managers whose dependencies answered."""
+    return [
+        i
+        for i in range(len(manager_list))
+        if i not in done and manager_dependencies(manager_list, i) <= done
+    ]
+
+
+def manager_entry(router: OrchestratorRouter, index: int) -> dict:
+    """The manager response of the manager in position `index` of the plan.
+
+    The worker tasks of a planned manager stay in `manager_list`.
+    """
+    return {**router.model_dump(include=set(OrchestratorRouter.model_fields)), "id": index}
+
+
+def planned_workers(state: GraphState, field: str, router_list):
+    """The planned worker tasks of the current manager, None if not planned.
+
+    The answers of the previous managers are added to the tasks, as the
+    manager would have done.
+    """
+    manager_response = state["manager_response"]
+    planned = getattr(state["manager_list"][manager_response[-1]["id"]], field, None)
+    if planned is None:
+        return None
+    context = "\n".join(
+        f"- {response['route_manager']}: {response['answer']}"
+        for response in manager_response[:-1]
+        if response.get("answer")
+    )
+    if context:
+        planned = [
+            worker.model_copy(
+                update={"task": f"{worker.task}\n\n### Task Context:\n{context}"}
+            )
+            for worker in planned
+        ]
+    return router_list(workers=planned)
+
+
+def manager_message(router: OrchestratorRouter, manager_response: list[dict]):
+    """The first supervisor message of a manager."""
+    return HumanMessage(
+        content=MANAGER_TEMPLATE.format(
+            user_request=router.query,
+            manager_response_context=manager_response or "NULL",
+        )
+    )
+
+
+async def run_manager_branch(
+    state: GraphState, index: int, manager_response: list[dict]
+) -> dict:
+    """Run a manager and its feedback synthesis outside of the graph routing.
+
+    The manager nodes run on a copy of the state, so independent managers
+    can run concurrently without sharing `supervisors_messages`.
+
+    Returns:
+        dict: The manager response with its answer.
+    """
+    router = state["manager_list"][index]
+    branch_state = {
+        **state,
+        "manager_response": manager_response + [manager_entry(router, index)],
+        "supervisors_messages": [manager_message(router, manager_response)],
+    }
+    node = router.route_manager
+    while node != "orchestrator":
+        # a named run, so the branch nodes show up like graph nodes in the events
+        metadata = {**ensure_config().get("metadata", {}), "branch_node": node}
+        command = await RunnableLambda(manager_nodes[node], name=node).ainvoke(
+            branch_state, config={"metadata": metadata}
+        )
+        branch_state.update(command.update)
+        node = command.goto
+    return branch_state["manager_response"][-1]
+
+
 async def orchestrator_node(
     state: GraphState,
-) -> Command[Literal[orchestrator_outputs_tuple + ("orchestrator_output",)]]:
-    """An orchestrator node. Entry and exit point of the graph."""
-
-    # no more managers to route
-    if state["manager_list"] == []:
-        return Command(goto="orchestrator_output")
-    manager_list = state.get("manager_list")
-    manager_response = state.get("manager_response", [])
+) -> Command[
+    Literal[orchestrator_outputs_tuple + ("orchestrator", "orchestrator_output")]
+]:
+    """An orchestrator node. Entry and exit point of the graph.
+
+    The managers whose dependencies already answered are routed together:
+    a single one goes through its graph node, several independent ones run
+    concurrently and their responses are merged in plan order.
+    """
+    manager_list = state.get("manager_list") or []
+    manager_response = sorted(
+        state.get("manager_response") or [], key=lambda response: response["id"]
+    )
 
     # if data_manager failed: return to make the user's answer
-    if (
-        len(manager_response) > 0
-        and "date_manage" in manager_response[-1].get("route_manager")
-        and "error" in manager_response[-1].get("answer").lower()
+    if any(
+        "date_manage" in response.get("route_manager")
+        and "error" in response.get("answer", "").lower()
+        for response in manager_response
     ):
         return Command(goto="orchestrator_output")
 
-    orchestrator_router = manager_list.pop(0)
+    done = {response["id"] for response in manager_response}
+    ready = ready_managers(manager_list, done)
+
+    # no more managers to route
+    if ready == []:
+        return Command(goto="orchestrator_output")
+
+    for index in ready:
+        await report_status(
+            MANAGER_STATUS.get(manager_list[index].route_manager, "Working on it")
+        )
+
+    if len(ready) == 1:
+        orchestrator_router = manager_list[ready[0]]
+        return Command(
+            goto=orchestrator_router.route_manager,
+            update={
+                "manager_response": manager_response
+                + [manager_entry(orchestrator_router, ready[0])],
+                # reset the supervisors messages
+                "supervisors_messages": [
+                    manager_message(orchestrator_router, manager_response)
+                ],
+            },
+        )
 
+    results = await asyncio.gather(
+        *[run_manager_branch(state, index, manager_response) for index in ready]
+    )
     return Command(
-        goto=orchestrator_router.route_manager,
+        goto="orchestrator",
         update={
-            "manager_list": manager_list,
-            "manager_response": manager_response + [dict(orchestrator_router)],
-            # reset the supervisors messages
-            "supervisors_messages": [
-                HumanMessage(
-                    content=MANAGER_TEMPLATE.format(
-                        user_request=orchestrator_router.query,
-                        manager_response_context=manager_response or "NULL",
-                    )
-                )
-            ],
+            "manager_response": sorted(
+                manager_response + results, key=lambda response: response["id"]
+            ),
+            "supervisors_messages": [],
         },
     )
 
 
-def date_manage_node(state: GraphState) -> Command[Literal["orchestrator"]]:
+async def date_manage_node(state: GraphState) -> Command[Literal["orchestrator"]]:
     """Date range extract in `Asia/Karachi` timezone"""
     manager_response = state["manager_response"]
 
-    date_range_str = calculate_date(state["supervisors_messages"][-1].content)
+    date_range_str = await acalculate_date(state["supervisors_messages"][-1].content)
     manager_response[-1]["answer"] = date_range_str
 
     return Command(
@@ -217,20 +392,28 @@ async def execute_workers(data: CalendarRouterList, workers_dict):
 
     Args:
         data (ManagerRouterList): An object containing a list of tasks for workers.
-        workers_dict (dict): A dictionary containing worker names as keys and worker objects as values.
+        workers_dict (WorkerRegistry): The workers by name, built on first use.
 
     Returns:
         list: A list of results from the executed calendar worker tasks.
     """
+    for worker in data.workers:
+        await report_status(f"Asking {worker.name.replace('_', ' ')}")
+    # the workers not built yet are built concurrently
+    workers = await asyncio.gather(
+        *(workers_dict.aget(worker.name) for worker in data.workers)
+    )
     tasks = [
-        workers_dict[worker.name].ainvoke(
+        workers[i].ainvoke(
             {
                 "workers_messages": HumanMessage(
                     content=worker.task,
                 )
-            }
+            },
+            # names the worker run in the graph events and telemetry spans
+            config={"run_name": worker.name, "metadata": {"worker": worker.name}},
         )
-        for worker in data.workers
+        for i, worker in enumerate(data.workers)
     ]
 
     results = await asyncio.gather(*tasks)
@@ -243,20 +426,29 @@ async def calendar_manage_node(
     """An LLM-based router."""
 
     supervisors_messages = state["supervisors_messages"]
-    messages = [
-        SystemMessage(content=CALENDAR_MANAGER_SYSTEM_PROMPT)
-    ] + supervisors_messages
-
-    response: CalendarRouterList = llm.with_structured_output(
-        CalendarRouterList
-    ).invoke(messages)
+    # in planner mode the orchestrator already routed the workers
+    response = planned_workers(state, "calendar_workers", CalendarRouterList)
+    if response is None:
+        # the task context may carry long answers of the previous managers
+        messages, budget_config = token_budgeter.fit(
+            "manager",
+            [SystemMessage(content=CALENDAR_MANAGER_SYSTEM_PROMPT)] + supervisors_messages,
+            drop_history=False,
+        )
+        response: CalendarRouterList = await llm.with_structured_output(
+            CalendarRouterList
+        ).ainvoke(messages, config=budget_config)
 
     # in this case the manager must elaborate an answer
     # to avoid go to the feedback synthesizer with an empty ai asnwers
     if response.workers == []:
-        ai_manager_answer = llm.invoke(
-            [SystemMessage(content=CALENDAR_MANAGER_END_PROMPT)] + supervisors_messages
+        messages, budget_config = token_budgeter.fit(
+            "manager",
+            [SystemMessage(content=CALENDAR_MANAGER_END_PROMPT)] + supervisors_messages,
+            drop_history=False,
         )
+        ai_manager_answer = await llm.ainvoke(messages, config=budget_config)
+        token_budgeter.record_usage("manager", ai_manager_answer)
         # ensure the ai answer is in the 3rd position
         supervisors_messages += supervisors_messages + [ai_manager_answer]
         return Command(
@@ -286,20 +478,29 @@ async def email_manage_node(
     """An LLM-based router."""
 
     supervisors_messages = state["supervisors_messages"]
-    messages = [
-        SystemMessage(content=EMAIL_MANAGER_SYSTEM_PROMPT)
-    ] + supervisors_messages
-
-    response: EmailRouterList = llm.with_structured_output(EmailRouterList).invoke(
-        messages
-    )
+    # in planner mode the orchestrator already routed the workers
+    response = planned_workers(state, "email_workers", EmailRouterList)
+    if response is None:
+        # the task context may carry long answers of the previous managers
+        messages, budget_config = token_budgeter.fit(
+            "manager",
+            [SystemMessage(content=EMAIL_MANAGER_SYSTEM_PROMPT)] + supervisors_messages,
+            drop_history=False,
+        )
+        response: EmailRouterList = await llm.with_structured_output(
+            EmailRouterList
+        ).ainvoke(messages, config=budget_config)
 
     # in this case the manager must elaborate an answer
     # to avoid go to the feedback synthesizer with an empty ai asnwers
     if response.workers == []:
-        ai_manager_answer = llm.invoke(
-            [SystemMessage(content=EMAIL_MANAGER_END_PROMPT)] + supervisors_messages
+        messages, budget_config = token_budgeter.fit(
+            "manager",
+            [SystemMessage(content=EMAIL_MANAGER_END_PROMPT)] + supervisors_messages,
+            drop_history=False,
         )
+        ai_manager_answer = await llm.ainvoke(messages, config=budget_config)
+        token_budgeter.record_usage("manager", ai_manager_answer)
         # ensure the ai answer is in the 3rd position
         supervisors_messages += supervisors_messages + [ai_manager_answer]
         return Command(
@@ -323,31 +524,70 @@ async def email_manage_node(
     )
 
 
-def feedback_synthesizer_node(state: GraphState) -> Command[Literal["orchestrator"]]:
+def feedback_pass_through(supervisors_messages: list[BaseMessage]):
+    """The manager answer when it needs no synthesis, else None.
+
+    Rule: the manager ran exactly one worker and it answered. Answers of
+    the manager itself, when it routed no worker, are still synthesized.
+    """
+    if not PASS_THROUGH or len(supervisors_messages) != 3:
+        return None
+    answer = supervisors_messages[2]
+    workers = set(calendar_workers_dict) | set(email_workers_dict)
+    if answer.name in workers and isinstance(answer.content, str) and answer.content.strip():
+        return answer.content
+    return None
+
+
+async def feedback_synthesizer_node(state: GraphState) -> Command[Literal["orchestrator"]]:
     """Synthesizes feedback and return to the orchestrator."""
 
     # state["supervisors_messages"] contains the query from the orchestrator
     orchestrator_query = state["supervisors_messages"][0].content
     manager_response = state["manager_response"]
+
+    answer = feedback_pass_through(state["supervisors_messages"])
+    if answer is not None:
+        manager_response[-1]["answer"] = answer
+        manager_response[-1]["passthrough"] = True
+        skipped_hops["feedback_synthesizer"] += 1
+        return Command(
+            goto="orchestrator",
+            update={
+                "supervisors_messages": [],
+                "manager_response": manager_response,
+            },
+        )
     agents_chat_history = ""
 
+    if manager_response[-1]["route_manager"] == "calendar_manage":
+        feedback_prompt_template = feedback_calendar_manager_prompt_template
+    elif manager_response[-1]["route_manager"] == "email_manage":
+        feedback_prompt_template = feedback_email_manager_prompt_template
+
     # we just need the agents messages to be able to synthesize the feedback
     # in 0 is the orchestrator query, in 1,3,5...(odd) is the supervisor query
-    for i, mess in enumerate(state["supervisors_messages"][2::2]):
+    agents_messages = state["supervisors_messages"][2::2]
+    # the agent answers share what the prompt leaves of the budget
+    budget = token_budgeter.budget("feedback_synthesizer")
+    share = (
+        budget
+        - token_budgeter.count(feedback_prompt_template.template)
+        - token_budgeter.count(orchestrator_query)
+    ) // max(len(agents_messages), 1)
+    for i, mess in enumerate(agents_messages):
         agents_chat_history += f" ### Message {i+1} - Agent {mess.name}:\n"
-        agents_chat_history += f"```{mess.content}```\n\n"
+        agents_chat_history += f"```{token_budgeter.truncate(mess.content, max(share, 0))}```\n\n"
 
     agents_chat_history = agents_chat_history[:-2]  # remove the last \n\n
 
-    if manager_response[-1]["route_manager"] == "calendar_manage":
-        feedback_prompt_template = feedback_calendar_manager_prompt_template
-    elif manager_response[-1]["route_manager"] == "email_manage":
-        feedback_prompt_template = feedback_email_manager_prompt_template
-    ai_response = llm.invoke(
+    ai_response = await llm.ainvoke(
         input=feedback_prompt_template.invoke(
             {"query": orchestrator_query, "agents_chat_history": agents_chat_history}
-        ).text
+        ).text,
+        config={"metadata": {**ensure_config().get("metadata", {}), "token_budget": budget}},
     )
+    token_budgeter.record_usage("feedback_synthesizer", ai_response)
 
     # set the manager answer to the last orchestrator query
     manager_response[-1]["answer"] = ai_response.content
@@ -361,6 +601,14 @@ def feedback_synthesizer_node(state: GraphState) -> Command[Literal["orchestrato
     )
 
 
+# the nodes a manager branch may go through, see `run_manager_branch`
+manager_nodes = {
+    "date_manage": date_manage_node,
+    "calendar_manage": calendar_manage_node,
+    "email_manage": email_manage_node,
+    "feedback_synthesizer": feedback_synthesizer_node,
+}
+
 # build the graph
 orchestrator_builder = StateGraph(GraphState)
 
@@ -376,30 +624,58 @@ orchestrator_builder.add_edge(START, "orchestrator_input")
 
 
 
-async def init_orchestrator():
-    """Initialize the orchestrator graph with Postgres if available, else SQLite."""
+async def init_checkpointer():
+    """Create the checkpointer, Postgres if available, else SQLite.
+
+    Both checkpointers are natively async. Pool sizes and timeouts are read
+    from the `database` section of `config.ini`.
+
+    Returns:
+        tuple: The checkpointer and the resource that backs it (an async
+        connection pool or a SQLite connection). The caller owns the resource
+        and must close it when the checkpointer is no longer needed.
+    """
     db_uri = os.getenv("POSTGRES_DB_URI")
 
     if db_uri:
         # Prefer PostgreSQL
-        connection_kwargs = {
-            "autocommit": True,
-            "prepare_threshold": 0,
-        }
-        pool = ConnectionPool(
-            conninfo=db_uri,
-            max_size=20,
-            kwargs=connection_kwargs,
+        checkpointer, pool = await PostgresSaverCustom.from_conn_info(
+            db_uri,
+            min_size=int(config.get("database", "pool-min-size", fallback=1)),
+            max_size=int(config.get("database", "pool-max-size", fallback=20)),
+            statement_timeout_ms=int(
+                config.get("database", "statement-timeout-ms", fallback=0)
+            ),
+            pool_timeout=float(config.get("database", "pool-timeout", fallback=30)),
         )
-        checkpointer = PostgresSaverCustom(pool)
-        checkpointer.setup()  # Postgres saver uses sync setup
-        orchestrator_graph = orchestrator_builder.compile(checkpointer=checkpointer)
-        return orchestrator_graph
-
-    # Fallback to SQLite (async)
-    conn = await aiosqlite.connect("checkpoints.db")
-    checkpointer = AsyncSqliteSaver(conn)
-    await checkpointer.setup()
-    orchestrator_graph = orchestrator_builder.compile(checkpointer=checkpointer)
-
-    return orchestrator_graph
\ No newline at end of file
+        try:
+            await checkpointer.setup()
+        except Exception:
+            await pool.close()
+            raise
+        return checkpointer, pool
+
+    # Fallback to SQLite
+    checkpointer, conn = await SqliteSaverCustom.from_path(
+        config.get("database", "sqlite-path", fallback="checkpoints.db"),
+        busy_timeout_ms=int(
+            config.get("database", "sqlite-busy-timeout-ms", fallback=5000)
+        ),
+    )
+    try:
+        await checkpointer.setup()
+    except Exception:
+        await conn.close()
+        raise
+    return checkpointer, conn
+
+
+async def init_orchestrator(checkpointer=None):
+    """Compile the orchestrator graph.
+
+    Every call without a `checkpointer` opens a new database resource, so
+    long-lived processes should use `OrchestratorRuntime` instead.
+    """
+    if checkpointer is None:
+        checkpointer, _ = await init_checkpointer()
+    return orchestrator_builder.compile(checkpointer=checkpointer)
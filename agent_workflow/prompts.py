@@ -251,7 +251,8 @@ You must always output a JSON object following this schema:
     "managers": [
         {{
             "route_manager": "date_manage" | "calendar_manage" | "email_manage",
-            "query": "string"
+            "query": "string",
+            "depends_on": [integer]
         }}
     ]
 }}
@@ -261,6 +262,10 @@ Where:
   - Must be one of the manager names if you need that manager to act on the request.
 - **query**:
   - The query must use the same language as the user's request while preserving original titles, links, event names, and email content.
+- **depends_on**:
+  - The 0-based positions in `managers` of the previous managers whose answers this manager needs (e.g., `[0]` for a `calendar_manage` that needs the date range of the `date_manage` in position 0).
+  - Use `[]` when the manager does not need any previous answer, so it can run at the same time as the others (e.g., "summarize my work inbox and show my personal calendar" has independent `email_manage` and `calendar_manage` managers).
+  - A manager can only depend on managers listed before it.
 
 ---
 ### **Decision Logic**
@@ -289,6 +294,29 @@ Where:
 - **Preserve original event titles, links, and email content in the queries**.
 """
 
+# planner mode: the orchestrator also routes the tasks of the workers
+PLANNER_PROMPT_ORCHESTRATOR = ENTRY_PROMPT_ORCHESTRATOR + f"""
+---
+### **Worker Tasks**
+In addition to the managers, you plan the tasks of their workers, so the managers do not need to route them:
+- Every `calendar_manage` lists its `calendar_workers`, chosen among:
+{calendar_workers_info_dict}
+- Every `email_manage` lists its `email_workers`, chosen among:
+{email_workers_info_dict}
+- Leave `calendar_workers` and `email_workers` out of the other managers.
+
+Each worker is an object with:
+- `name`: The worker to call.
+- `task`: A concise description of the task to perform, in the language of the user's request.
+
+**Worker Selection Guidelines**
+- If the user does not **explicitly** specify a calendar or an email account, the task **must be assigned exclusively** to `personal_calendar` or `personal_email`.
+- If the user explicitly mentions "all calendars", "all accounts" or similar phrasing, replicate the task for each worker.
+- The answers of the managers a manager depends on (e.g. the date range of `date_manage`) are added to the tasks of its workers, refer to them (e.g. "the events of the requested date range") instead of guessing dates.
+- If the user requests emails without a quantity, fetch **10** emails, or **25** for older emails.
+- Do not modify, translate, or alter event titles and email subjects.
+"""
+
 RESPONSE_PROMPT_ORCHESTRATOR = f"""
 
 **Role**: You are an **Orchestrator** responsible for **generating a response to the user's request** based on:
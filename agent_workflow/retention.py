@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from psycopg_pool import AsyncConnectionPool
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+
+@dataclass
+class RetentionReport:
+    """What one retention pass deleted."""
+
+    threads: int = 0
+    checkpoints: int = 0
+    writes: int = 0
+    blobs: int = 0
+    # size of the deleted checkpoints, writes and blobs
+    bytes_reclaimed: int = 0
+    seconds: float = 0.0
+
+    def add(self, other: "RetentionReport"):
+        self.threads += other.threads
+        self.checkpoints += other.checkpoints
+        self.writes += other.writes
+        self.blobs += other.blobs
+        self.bytes_reclaimed += other.bytes_reclaimed
+
+
+# Postgres
+# checkpoint_id are uuid6, so they sort by creation time. The versions of
+# the channels are zero-padded strings, so they sort too: blobs older than
+# the newest version a kept checkpoint references and referenced by none of
+# them are unreachable, while blobs written ahead of an in-flight checkpoint
+# are newer and left alone.
+
+PG_THREADS_OVER_LIMIT = """
+SELECT thread_id, checkpoint_ns FROM checkpoints
+GROUP BY thread_id, checkpoint_ns
+HAVING count(*) > %(keep)s
+"""
+
+PG_DELETE_CHECKPOINTS = """
+WITH deleted AS (
+    DELETE FROM checkpoints
+    WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(checkpoint_ns)s
+    AND checkpoint_id NOT IN (
+        SELECT checkpoint_id FROM checkpoints
+        WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(checkpoint_ns)s
+        ORDER BY checkpoint_id DESC
+        LIMIT %(keep)s
+    )
+    RETURNING pg_column_size(checkpoint) + pg_column_size(metadata) AS size
+)
+SELECT count(*) AS count, coalesce(sum(size), 0) AS size FROM deleted
+"""
+
+PG_DELETE_WRITES = """
+WITH deleted AS (
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = %(thread_id)s AND w.checkpoint_ns = %(checkpoint_ns)s
+    AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns
+        AND c.checkpoint_id = w.checkpoint_id
+    )
+    RETURNING octet_length(w.blob) AS size
+)
+SELECT count(*) AS count, coalesce(sum(size), 0) AS size FROM deleted
+"""
+
+PG_DELETE_BLOBS = """
+WITH deleted AS (
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = %(thread_id)s AND b.checkpoint_ns = %(checkpoint_ns)s
+    AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+        AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+    )
+    AND b.version < (
+        SELECT max(c.checkpoint -> 'channel_versions' ->> b.channel) FROM checkpoints c
+        WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+    )
+    RETURNING coalesce(octet_length(b.blob), 0) AS size
+)
+SELECT count(*) AS count, coalesce(sum(size), 0) AS size FROM deleted
+"""
+
+# SQLite
+# `AsyncSqliteSaver` keeps the channel values inside the checkpoints, there
+# are no blobs.
+
+SQLITE_THREADS_OVER_LIMIT = """
+SELECT thread_id, checkpoint_ns FROM checkpoints
+GROUP BY thread_id, checkpoint_ns
+HAVING count(*) > :keep
+"""
+
+SQLITE_DELETE_CHECKPOINTS = """
+DELETE FROM checkpoints
+WHERE thread_id = :thread_id AND checkpoint_ns = :checkpoint_ns
+AND checkpoint_id NOT IN (
+    SELECT checkpoint_id FROM checkpoints
+    WHERE thread_id = :thread_id AND checkpoint_ns = :checkpoint_ns
+    ORDER BY checkpoint_id DESC
+    LIMIT :keep
+)
+RETURNING coalesce(length(checkpoint), 0) + coalesce(length(metadata), 0)
+"""
+
+SQLITE_DELETE_WRITES = """
+DELETE FROM writes
+WHERE thread_id = :thread_id AND checkpoint_ns = :checkpoint_ns
+AND NOT EXISTS (
+    SELECT 1 FROM checkpoints c
+    WHERE c.thread_id = writes.thread_id AND c.checkpoint_ns = writes.checkpoint_ns
+    AND c.checkpoint_id = writes.checkpoint_id
+)
+RETURNING coalesce(length(value), 0)
+"""
+
+
+class CheckpointRetention:
+    """Keeps the latest checkpoints of every thread and deletes the rest.
+
+    Every graph super-step writes a checkpoint, the graph only reads the
+    latest one of a thread, so older checkpoints, the pending writes of the
+    deleted checkpoints and the channel blobs no kept checkpoint references
+    can go.
+
+    Threads are pruned `batch_threads` at a time, one short transaction per
+    thread, with `pause_seconds` between batches, so a pass never holds the
+    database away from the requests for long.
+
+    Args:
+        checkpointer: An `AsyncPostgresSaver` or `AsyncSqliteSaver`.
+        keep (int): Checkpoints kept per thread and namespace.
+        interval_seconds (float): Seconds between two passes of `start`.
+        batch_threads (int): Threads pruned between two pauses.
+        pause_seconds (float): Pause between two batches.
+    """
+
+    def __init__(
+        self,
+        checkpointer,
+        keep: int = 20,
+        interval_seconds: float = 3600,
+        batch_threads: int = 50,
+        pause_seconds: float = 0.5,
+    ):
+        if keep < 1:
+            raise ValueError("At least the latest checkpoint of a thread must be kept")
+        self.checkpointer = checkpointer
+        self.keep = keep
+        self.interval_seconds = interval_seconds
+        self.batch_threads = batch_threads
+        self.pause_seconds = pause_seconds
+        self.total = RetentionReport()
+        self.last_report = None
+        self._task = None
+
+    # Postgres
+
+    @asynccontextmanager
+    async def _pg_connection(self):
+        conn = self.checkpointer.conn
+        if isinstance(conn, AsyncConnectionPool):
+            async with conn.connection() as conn:
+                yield conn
+        else:
+            async with self.checkpointer.lock:
+                yield conn
+
+    async def _pg_threads(self) -> list[tuple[str, str]]:
+        async with self._pg_connection() as conn:
+            cursor = await conn.execute(PG_THREADS_OVER_LIMIT, {"keep": self.keep})
+            return [(row["thread_id"], row["checkpoint_ns"]) for row in await cursor.fetchall()]
+
+    async def _pg_prune(self, thread_id: str, checkpoint_ns: str) -> RetentionReport:
+        params = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "keep": self.keep}
+        report = RetentionReport(threads=1)
+        async with self._pg_connection() as conn:
+            async with conn.transaction():
+                for query, field in (
+                    (PG_DELETE_CHECKPOINTS, "checkpoints"),
+                    (PG_DELETE_WRITES, "writes"),
+                    (PG_DELETE_BLOBS, "blobs"),
+                ):
+                    row = await (await conn.execute(query, params)).fetchone()
+                    setattr(report, field, row["count"])
+                    report.bytes_reclaimed += int(row["size"])
+        return report
+
+    # SQLite
+
+    async def _sqlite_threads(self) -> list[tuple[str, str]]:
+        # the connection is shared with the checkpointer
+        async with self.checkpointer.lock:
+            async with self.checkpointer.conn.execute(
+                SQLITE_THREADS_OVER_LIMIT, {"keep": self.keep}
+            ) as cursor:
+                return [tuple(row) for row in await cursor.fetchall()]
+
+    async def _sqlite_prune(self, thread_id: str, checkpoint_ns: str) -> RetentionReport:
+        params = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "keep": self.keep}
+        report = RetentionReport(threads=1)
+        conn = self.checkpointer.conn
+        async with self.checkpointer.lock:
+            try:
+                for query, field in (
+                    (SQLITE_DELETE_CHECKPOINTS, "checkpoints"),
+                    (SQLITE_DELETE_WRITES, "writes"),
+                ):
+                    async with conn.execute(query, params) as cursor:
+                        sizes = [row[0] for row in await cursor.fetchall()]
+                    setattr(report, field, len(sizes))
+                    report.bytes_reclaimed += sum(sizes)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+        return report
+
+    async def run_once(self) -> RetentionReport:
+        """Prune every thread over the limit, a batch at a time."""
+        start = time.perf_counter()
+        if isinstance(self.checkpointer, AsyncPostgresSaver):
+            threads, prune = await self._pg_threads(), self._pg_prune
+        elif isinstance(self.checkpointer, AsyncSqliteSaver):
+            threads, prune = await self._sqlite_threads(), self._sqlite_prune
+        else:
+            raise TypeError(f"No retention for {type(self.checkpointer).__name__}")
+
+        report = RetentionReport()
+        for i in range(0, len(threads), self.batch_threads):
+            if i:
+                await asyncio.sleep(self.pause_seconds)
+            for thread_id, checkpoint_ns in threads[i : i + self.batch_threads]:
+                report.add(await prune(thread_id, checkpoint_ns))
+        report.seconds = time.perf_counter() - start
+
+        self.total.add(report)
+        self.last_report = report
+        if report.threads:
+            logger.info(
+                f"Checkpoint retention: {report.checkpoints} checkpoints, "
+                f"{report.writes} writes and {report.blobs} blobs of {report.threads} "
+                f"threads deleted, {report.bytes_reclaimed / 1024:.1f} KiB reclaimed "
+                f"in {report.seconds:.2f}s"
+            )
+        return report
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Checkpoint retention failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Run a pass now, then every `interval_seconds`, in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="checkpoint-retention")
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "keep": self.keep,
+            "total": asdict(self.total),
+            "last": asdict(self.last_report) if self.last_report else None,
+        }
+
+
+def retention_from_config(checkpointer):
+    """The retention job of `checkpointer`, None when it is disabled."""
+    keep = int(config.get("database", "retention-keep-checkpoints", fallback=20))
+    if keep <= 0:
+        return None
+    return CheckpointRetention(
+        checkpointer,
+        keep=keep,
+        interval_seconds=float(
+            config.get("database", "retention-interval-seconds", fallback=3600)
+        ),
+        batch_threads=int(config.get("database", "retention-batch-threads", fallback=50)),
+        pause_seconds=float(
+            config.get("database", "retention-pause-seconds", fallback=0.5)
+        ),
+    )
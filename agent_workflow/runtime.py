@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiosqlite import Connection as SqliteConnection
+from psycopg_pool import AsyncConnectionPool
+
+from agent_workflow.calendar_workers import calendar_workers_dict
+from agent_workflow.email_projection import email_projection
+from agent_workflow.email_workers import email_workers_dict
+from agent_workflow.llm_limiter import llm_limiter
+from agent_workflow.orchestrator import init_checkpointer, orchestrator_builder
+from agent_workflow.retention import retention_from_config
+from agent_workflow.thread_summaries import thread_summaries
+from agent_workflow.token_budget import token_budgeter
+from agent_workflow.tool_executor import tool_executor
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+PREWARM_WORKERS = config.get("composio", "prewarm-workers", fallback="true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+
+class OrchestratorRuntime:
+    """Process-lifetime owner of the orchestrator graph.
+
+    The checkpointer, the database resource behind it (Postgres pool or
+    SQLite connection) and the compiled graph are created once in `start`
+    and shared by every request until `shutdown` is called.
+    """
+
+    def __init__(self):
+        self.graph = None
+        self.checkpointer = None
+        self._resource = None
+        self.retention = None
+        self._lock = asyncio.Lock()
+        self.started_at = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.graph is not None
+
+    @property
+    def pool(self) -> Optional[AsyncConnectionPool]:
+        """The Postgres pool of the checkpointer, None with SQLite."""
+        return self._resource if isinstance(self._resource, AsyncConnectionPool) else None
+
+    async def start(self):
+        """Open the database resource, run the migrations and compile the graph.
+
+        Calling `start` on a running runtime is a no-op, so it is safe to call
+        it from `on_ready`, which Discord fires again after reconnects.
+        """
+        async with self._lock:
+            if self.is_running:
+                return self
+            init_time = time.time()
+            self.checkpointer, self._resource = await init_checkpointer()
+            self.graph = orchestrator_builder.compile(checkpointer=self.checkpointer)
+            # old checkpoints are pruned in the background
+            self.retention = retention_from_config(self.checkpointer)
+            if self.retention is not None:
+                self.retention.start()
+            self.started_at = time.time()
+            logger.info(
+                f"Orchestrator runtime started in {self.started_at - init_time:.4f}s "
+                f"({type(self.checkpointer).__name__})"
+            )
+            return self
+
+    async def warm(self):
+        """Establish the database connections ahead of the first request.
+
+        The workers are built in the background, a request that needs one
+        before it is ready builds it itself. The tokenizer is loaded off the
+        event loop, its first load downloads it.
+        """
+        if PREWARM_WORKERS:
+            calendar_workers_dict.prewarm()
+            email_workers_dict.prewarm()
+        await asyncio.to_thread(token_budgeter.warm)
+        if isinstance(self._resource, AsyncConnectionPool):
+            await self._resource.wait()
+        await self.health()
+
+    async def health(self) -> dict:
+        """Check that the runtime is started and the database answers."""
+        status = {
+            "running": self.is_running,
+            "checkpointer": type(self.checkpointer).__name__,
+            "database": False,
+            "workers": {**calendar_workers_dict.stats(), **email_workers_dict.stats()},
+            "tools": tool_executor.stats(),
+            "email_projection": email_projection.stats() if email_projection else None,
+            "thread_summaries": thread_summaries.stats() if thread_summaries else None,
+            "llm_limiter": llm_limiter.stats() if llm_limiter else None,
+        }
+        if not self.is_running:
+            return status
+        try:
+            if isinstance(self._resource, AsyncConnectionPool):
+                async with self._resource.connection() as conn:
+                    await conn.execute("SELECT 1")
+                status["pool"] = self._resource.get_stats()
+            elif isinstance(self._resource, SqliteConnection):
+                async with self._resource.execute("SELECT 1") as cursor:
+                    await cursor.fetchone()
+            status["database"] = True
+            if self.retention is not None:
+                status["retention"] = self.retention.stats()
+        except Exception as e:
+            logger.warning(f"Orchestrator runtime health check failed: {e}")
+            status["error"] = str(e)
+        return status
+
+    async def shutdown(self):
+        """Release the compiled graph and close the database resource."""
+        async with self._lock:
+            if not self.is_running:
+                return
+            if self.retention is not None:
+                await self.retention.stop()
+                self.retention = None
+            resource, self._resource = self._resource, None
+            self.graph = None
+            self.checkpointer = None
+            try:
+                if isinstance(resource, AsyncConnectionPool):
+                    await resource.close()
+                elif isinstance(resource, SqliteConnection):
+                    await resource.close()
+            finally:
+                logger.info("Orchestrator runtime stopped")
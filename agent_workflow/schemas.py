@@ -1,4 +1,4 @@
-from typing import List, Literal
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 from agent_workflow.calendar_workers import calendar_workers_dict
@@ -25,6 +25,13 @@ class OrchestratorRouter(BaseModel):
         ...,
         description="The query for the manager.",
     )
+    depends_on: Optional[List[int]] = Field(
+        default=None,
+        description=(
+            "The 0-based positions in `managers` of the previous managers whose "
+            "answers this manager needs. Use `[]` when it is independent."
+        ),
+    )
 
 
 class OrchestratorRouterList(BaseModel):
@@ -57,3 +64,22 @@ class EmailRouterList(BaseModel):
     """Worker to route to tasks. If no workers needed, use a empty list `[]`."""
 
     workers: List[EmailrRouter]
+
+
+class PlannedManager(OrchestratorRouter):
+    """A manager of the plan, with the tasks of its workers."""
+
+    calendar_workers: Optional[List[CalendarRouter]] = Field(
+        default=None,
+        description="For `calendar_manage` only: the calendar workers to call and their tasks.",
+    )
+    email_workers: Optional[List[EmailrRouter]] = Field(
+        default=None,
+        description="For `email_manage` only: the email workers to call and their tasks.",
+    )
+
+
+class OrchestratorPlan(BaseModel):
+    """The managers to route tasks and the tasks of their workers. If no manager needed, use a empty list `[]`."""
+
+    managers: List[PlannedManager]
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Discord rejects messages longer than 2000 characters
+MESSAGE_LIMIT = 2000
+
+PLACEHOLDER = "⏳ *Thinking…*"
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Split `text` in chunks of at most `limit` characters, on line breaks
+    when possible."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    return chunks + [text] if text or not chunks else chunks
+
+
+class ProgressiveReply:
+    """A chat message edited in place while an answer is being generated.
+
+    A placeholder is posted right away. Status lines and streamed text are
+    buffered and the message is edited at most once per
+    `min_edit_interval` seconds, which keeps the edits under the Discord
+    rate limits however fast the tokens arrive.
+
+    Args:
+        channel: Channel with an async `send(content)` returning a message
+            with an async `edit(content=...)`.
+        min_edit_interval (float): Minimum time between two edits.
+        render (Callable): Formats the answer text before it is shown.
+    """
+
+    def __init__(
+        self,
+        channel,
+        min_edit_interval: float = 1.2,
+        render: Callable[[str], str] = lambda text: text,
+    ):
+        self.channel = channel
+        self.min_edit_interval = min_edit_interval
+        self.render = render
+        self.message = None
+        self.status = None
+        self.text = ""
+        self.edits = 0
+        self.started_at = None
+        self.first_token_at = None
+        self._shown = None
+        self._ticker = None
+
+    async def start(self):
+        self.started_at = time.perf_counter()
+        self.message = await self.channel.send(PLACEHOLDER)
+        self._shown = PLACEHOLDER
+        self._ticker = asyncio.create_task(self._tick())
+
+    def set_status(self, status: str):
+        self.status = status
+
+    def append(self, text: str):
+        if text and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.text += text
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    def _content(self) -> str:
+        if self.text:
+            content = self.render(self.text)
+            if len(content) > MESSAGE_LIMIT:
+                # the full answer is split when finished
+                content = content[: MESSAGE_LIMIT - 1] + "…"
+            return content
+        if self.status:
+            return f"⏳ *{self.status}…*"
+        return PLACEHOLDER
+
+    async def _edit(self, content: str):
+        if content == self._shown:
+            return
+        await self.message.edit(content=content)
+        self._shown = content
+        self.edits += 1
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.min_edit_interval)
+            try:
+                await self._edit(self._content())
+            except Exception as e:
+                logger.warning(f"Failed to edit the streamed message: {e}")
+
+    async def finish(self, text: Optional[str] = None):
+        """Show the complete answer, split in several messages if needed."""
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if text is not None:
+            self.text = text
+        try:
+            await self._show(split_message(self.render(self.text)))
+        except Exception as e:
+            logger.warning(f"Failed to send the rendered message: {e}")
+            await self._show(split_message(self.text))
+
+    async def _show(self, chunks: list[str]):
+        await self._edit(chunks[0])
+        for chunk in chunks[1:]:
+            await self.channel.send(chunk)
+
+
+async def stream_graph_answer(
+    graph,
+    graph_input: dict,
+    config: dict,
+    reply: ProgressiveReply,
+    output_node: str = "orchestrator_output",
+) -> Any:
+    """Run `graph` streaming the tokens of `output_node` into `reply`.
+
+    The `status` custom events and the tool calls become status lines.
+
+    Returns:
+        The final state of the graph run.
+    """
+    final_state = None
+    async for event in graph.astream_events(graph_input, config, version="v2"):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            if event["metadata"].get("langgraph_node") == output_node:
+                reply.append(event["data"]["chunk"].content)
+        elif kind == "on_custom_event" and event["name"] == "status":
+            reply.set_status(event["data"]["status"])
+        elif kind == "on_tool_start":
+            reply.set_status(f"Using {event['name']}")
+        elif kind == "on_chain_end" and not event["parent_ids"]:
+            final_state = event["data"].get("output")
+    return final_state
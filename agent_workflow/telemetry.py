@@ -0,0 +1,383 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional, Protocol
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import ensure_config
+from langchain_core.tools import StructuredTool
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+
+@dataclass
+class Span:
+    """A timed unit of work of a graph run.
+
+    `kind` is one of `request` (a whole graph run), `node`, `worker`,
+    `react_step` (a node of a worker graph), `llm` or `tool`. `start` is a
+    POSIX timestamp and `queue_wait_ms` the time the work waited before
+    running, see `TelemetryCallbackHandler`.
+    """
+
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration_ms: float = 0.0
+    queue_wait_ms: Optional[float] = None
+    attributes: dict = field(default_factory=dict)
+
+
+class SpanSink(Protocol):
+    def export(self, span: Span): ...
+
+
+class NullSpanSink:
+    def export(self, span: Span):
+        pass
+
+
+class LoggingSpanSink:
+    """Logs every span at debug level."""
+
+    def export(self, span: Span):
+        logger.debug(
+            f"{span.kind} {span.name}: {span.duration_ms:.1f} ms "
+            f"(queue {span.queue_wait_ms}) {span.attributes}"
+        )
+
+
+class JsonlSpanSink:
+    """Appends every span as a JSON line to `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(asdict(span), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _payload_bytes(value: Any) -> int:
+    if value is None:
+        return 0
+    content = getattr(value, "content", value)
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    return len(content.encode())
+
+
+class _OpenSpan:
+    __slots__ = ("span", "perf_start", "exec_start", "last_child_end")
+
+    def __init__(self, span: Span, perf_start: float):
+        self.span = span
+        self.perf_start = perf_start
+        self.exec_start = None
+        self.last_child_end = perf_start
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Records the spans of graph runs from the LangChain callbacks.
+
+    Graph nodes are the chains named after their `langgraph_node` (or
+    `branch_node`, for the managers the orchestrator runs concurrently),
+    workers are the runs named after their `worker` metadata. Other chains
+    are not spans, their children are attached to the closest span. LLM
+    calls record their token usage and prompt/completion sizes, tool calls
+    their argument and result sizes.
+
+    Queue wait is, for nodes, the time since the previous node of the same
+    parent ended (scheduling and checkpointing) and, for the tools wrapped by
+    `instrument_tool`, the time before the tool function started in its
+    thread pool.
+
+    Args:
+        sink (SpanSink): Where the finished spans are exported.
+    """
+
+    # the records are cheap, no need for a thread pool round trip
+    run_inline = True
+
+    def __init__(self, sink: SpanSink):
+        self.sink = sink
+        self._open = {}
+        # untracked runs to the closest tracked ancestor
+        self._aliases = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, run_id: Optional[UUID]) -> Optional[UUID]:
+        return self._aliases.get(run_id, run_id)
+
+    def _start(
+        self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attributes
+    ):
+        now = time.perf_counter()
+        with self._lock:
+            parent_run_id = self._resolve(parent_run_id)
+            parent = self._open.get(parent_run_id)
+            if parent_run_id is not None and parent is None:
+                # a run started outside of an instrumented graph run
+                return
+            queue_wait_ms = None
+            if kind in ("node", "react_step") and parent is not None:
+                queue_wait_ms = (now - parent.last_child_end) * 1000
+            self._open[run_id] = _OpenSpan(
+                Span(
+                    name=name,
+                    kind=kind,
+                    trace_id=parent.span.trace_id if parent else str(run_id),
+                    span_id=str(run_id),
+                    parent_id=str(parent_run_id) if parent_run_id else None,
+                    start=time.time(),
+                    queue_wait_ms=queue_wait_ms,
+                    attributes=attributes,
+                ),
+                now,
+            )
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes):
+        now = time.perf_counter()
+        with self._lock:
+            self._aliases.pop(run_id, None)
+            open_span = self._open.pop(run_id, None)
+            if open_span is None:
+                return
+            parent_id = open_span.span.parent_id
+            parent = self._open.get(UUID(parent_id)) if parent_id else None
+            if parent is not None:
+                parent.last_child_end = now
+        span = open_span.span
+        span.duration_ms = (now - open_span.perf_start) * 1000
+        if open_span.exec_start is not None:
+            span.queue_wait_ms = (open_span.exec_start - open_span.perf_start) * 1000
+        span.attributes.update(attributes)
+        if error is not None:
+            span.attributes["error"] = repr(error)
+        try:
+            self.sink.export(span)
+        except Exception as e:
+            logger.warning(f"Failed to export span {span.name}: {e}")
+
+    def mark_execution_start(self, run_id: UUID):
+        """Record that the work of `run_id` started, ending its queue wait."""
+        open_span = self._open.get(run_id)
+        if open_span is not None and open_span.exec_start is None:
+            open_span.exec_start = time.perf_counter()
+
+    # chains: the graph run, its nodes and the workers
+
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs
+    ):
+        metadata = metadata or {}
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        if parent_run_id is None:
+            self._start(run_id, None, name, "request", thread_id=metadata.get("thread_id"))
+        elif name == metadata.get("worker"):
+            self._start(run_id, parent_run_id, name, "worker")
+        elif name in (
+            metadata.get("langgraph_node"),
+            metadata.get("branch_node"),
+        ) and not name.startswith("__"):
+            parent = self._open.get(self._resolve(parent_run_id))
+            in_worker = parent is not None and parent.span.kind in ("worker", "react_step")
+            self._start(run_id, parent_run_id, name, "react_step" if in_worker else "node")
+        else:
+            with self._lock:
+                self._aliases[run_id] = self._resolve(parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    # LLM calls
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs
+    ):
+        self._start(
+            run_id,
+            parent_run_id,
+            kwargs.get("name")
+            or (metadata or {}).get("ls_model_name")
+            or ((serialized or {}).get("id") or ["chat_model"])[-1],
+            "llm",
+            model=(metadata or {}).get("ls_model_name"),
+            prompt_bytes=sum(_payload_bytes(m) for batch in messages for m in batch),
+            token_budget=(metadata or {}).get("token_budget"),
+            estimated_prompt_tokens=(metadata or {}).get("estimated_prompt_tokens"),
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        completion_bytes = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                completion_bytes += _payload_bytes(generation.text)
+                if message is not None and getattr(message, "tool_calls", None):
+                    completion_bytes += _payload_bytes(message.tool_calls)
+                if message is not None and getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        if not usage:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            usage = {
+                "input_tokens": token_usage.get("prompt_tokens"),
+                "output_tokens": token_usage.get("completion_tokens"),
+            }
+        self._end(
+            run_id,
+            prompt_tokens=usage.get("input_tokens"),
+            completion_tokens=usage.get("output_tokens"),
+            completion_bytes=completion_bytes,
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    # tool calls
+
+    def on_tool_start(
+        self, serialized, input_str, *, run_id, parent_run_id=None, inputs=None, **kwargs
+    ):
+        self._start(
+            run_id,
+            parent_run_id,
+            kwargs.get("name") or (serialized or {}).get("name", "tool"),
+            "tool",
+            input_bytes=_payload_bytes(inputs if inputs is not None else input_str),
+        )
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, output_bytes=_payload_bytes(output))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+
+def instrument_tool(tool: StructuredTool) -> StructuredTool:
+    """Record when the function of `tool` starts, in place.
+
+    Sync tools run in a thread pool, the time between the tool call and the
+    start of its function is the queue wait of the tool span.
+    """
+    original_func = tool.func
+
+    def instrumented_tool_function(**kwargs):
+        callbacks = ensure_config().get("callbacks")
+        run_id = getattr(callbacks, "parent_run_id", None)
+        for handler in getattr(callbacks, "handlers", []):
+            if isinstance(handler, TelemetryCallbackHandler):
+                handler.mark_execution_start(run_id)
+        return original_func(**kwargs)
+
+    tool.func = instrumented_tool_function
+    return tool
+
+
+def _build_sink() -> SpanSink:
+    sink = config.get("telemetry", "sink", fallback="none")
+    if sink == "jsonl":
+        return JsonlSpanSink(config.get("telemetry", "path", fallback="spans.jsonl"))
+    if sink == "log":
+        return LoggingSpanSink()
+    return NullSpanSink()
+
+
+_sink = _build_sink()
+# one handler records every run, its state is keyed by run id
+telemetry_handler = (
+    None if isinstance(_sink, NullSpanSink) else TelemetryCallbackHandler(_sink)
+)
+
+
+def telemetry_callbacks() -> list:
+    """The callbacks to pass in the config of an instrumented graph run."""
+    return [telemetry_handler] if telemetry_handler is not None else []
+
+
+def load_spans(path: str) -> list[Span]:
+    with open(path, encoding="utf-8") as file:
+        return [Span(**json.loads(line)) for line in file if line.strip()]
+
+
+def format_trace(spans: list[Span], trace_id: str) -> str:
+    """The spans of a trace as an indented tree, children in start order."""
+    trace = [span for span in spans if span.trace_id == trace_id]
+    children = {}
+    for span in sorted(trace, key=lambda span: span.start):
+        children.setdefault(span.parent_id, []).append(span)
+
+    lines = []
+
+    def add(span: Span, depth: int):
+        queue = f" queue {span.queue_wait_ms:.0f} ms" if span.queue_wait_ms else ""
+        tokens = ""
+        if span.attributes.get("prompt_tokens") is not None:
+            tokens = (
+                f" tokens {span.attributes['prompt_tokens']}"
+                f"/{span.attributes.get('completion_tokens')}"
+            )
+            if span.attributes.get("token_budget") is not None:
+                tokens += f" (budget {span.attributes['token_budget']})"
+        lines.append(
+            f"{'  ' * depth}{span.kind} {span.name}: "
+            f"{span.duration_ms:.0f} ms{queue}{tokens}"
+        )
+        for child in children.get(span.span_id, []):
+            add(child, depth + 1)
+
+    for root in children.get(None, []):
+        add(root, 0)
+    return "\n".join(lines)
+
+
+def summarize(spans: list[Span]) -> str:
+    """Duration percentiles of every span name, and the slowest request."""
+    groups = {}
+    for span in spans:
+        groups.setdefault((span.kind, span.name), []).append(span)
+    lines = [f"{'span':<45} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'queue ms':>9}"]
+    for (kind, name), group in sorted(
+        groups.items(), key=lambda item: -sum(s.duration_ms for s in item[1])
+    ):
+        durations = sorted(span.duration_ms for span in group)
+        waits = [span.queue_wait_ms for span in group if span.queue_wait_ms is not None]
+        lines.append(
+            f"{kind + ' ' + name:<45} {len(group):>6} "
+            f"{durations[len(durations) // 2]:>9.1f} "
+            f"{durations[min(len(durations) - 1, int(len(durations) * 0.95))]:>9.1f} "
+            f"{(sum(waits) / len(waits) if waits else 0):>9.1f}"
+        )
+    requests = [span for span in spans if span.kind == "request"]
+    if requests:
+        slowest = max(requests, key=lambda span: span.duration_ms)
+        lines += ["", "slowest request:", format_trace(spans, slowest.trace_id)]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(summarize(load_spans(sys.argv[1] if len(sys.argv) > 1 else "spans.jsonl")))
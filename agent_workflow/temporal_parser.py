@@ -0,0 +1,648 @@
+"""Rule-based parser for the common temporal expressions.
+
+It resolves expressions such as "tomorrow", "next Friday at 3 PM",
+"in 3 days" or "from March 6 to April 24" to a datetime range without an
+LLM call. Every result carries a confidence, the date worker only trusts
+results above its threshold and falls back to the LLM otherwise.
+"""
+
+import calendar
+import re
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple, Optional
+
+WEEKDAYS = {
+    "monday": 0,
+    "tuesday": 1,
+    "wednesday": 2,
+    "thursday": 3,
+    "friday": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+
+MONTHS = {
+    "january": 1,
+    "jan": 1,
+    "february": 2,
+    "feb": 2,
+    "march": 3,
+    "mar": 3,
+    "april": 4,
+    "apr": 4,
+    "may": 5,
+    "june": 6,
+    "jun": 6,
+    "july": 7,
+    "jul": 7,
+    "august": 8,
+    "aug": 8,
+    "september": 9,
+    "sep": 9,
+    "sept": 9,
+    "october": 10,
+    "oct": 10,
+    "november": 11,
+    "nov": 11,
+    "december": 12,
+    "dec": 12,
+}
+
+NUMBER_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+}
+
+# start and end time of the day parts, "night" ends at 23:59 of the same day
+DAY_PARTS = {
+    "early morning": (time(6, 0), time(9, 0)),
+    "morning": (time(6, 0), time(12, 0)),
+    "noon": (time(12, 0), time(13, 0)),
+    "afternoon": (time(12, 0), time(18, 0)),
+    "evening": (time(18, 0), time(22, 0)),
+    "night": (time(20, 0), time(23, 59)),
+    "tonight": (time(20, 0), time(23, 59)),
+    "midnight": (time(0, 0), time(1, 0)),
+}
+
+# words that carry temporal meaning, if one of them is left unparsed the
+# expression is only partially understood and the LLM must resolve it
+TEMPORAL_WORDS = {
+    "ago",
+    "after",
+    "am",
+    "autumn",
+    "before",
+    "beginning",
+    "christmas",
+    "day",
+    "days",
+    "early",
+    "easter",
+    "end",
+    "fortnight",
+    "half",
+    "holiday",
+    "holidays",
+    "hour",
+    "hours",
+    "late",
+    "mid",
+    "minute",
+    "minutes",
+    "month",
+    "months",
+    "next",
+    "past",
+    "pm",
+    "previous",
+    "quarter",
+    "rest",
+    "since",
+    "spring",
+    "summer",
+    "till",
+    "until",
+    "week",
+    "weekend",
+    "weeks",
+    "winter",
+    "year",
+    "years",
+} | set(WEEKDAYS) | (set(MONTHS) - {"may", "mar"}) | set(DAY_PARTS)
+
+NUM = r"(\d{1,3}|" + "|".join(NUMBER_WORDS) + r")"
+WEEKDAY = r"(" + "|".join(WEEKDAYS) + r")"
+MONTH = r"(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")"
+FULL_MONTH = r"(" + "|".join(calendar.month_name[1:]).lower().replace("|may", "") + r")"
+ORDINAL = r"(\d{1,2})(?:st|nd|rd|th)?"
+CLOCK = r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)?"
+RANGE_CONNECTOR = re.compile(r"^\s*(?:-|to|until|till|through|thru|and)\s*$")
+
+FULL_CONFIDENCE = 1.0
+AMBIGUOUS_CONFIDENCE = 0.5
+PARTIAL_CONFIDENCE = 0.3
+
+
+class ParsedDateRange(NamedTuple):
+    """A resolved datetime range and how much the parser trusts it."""
+
+    start_datetime: Optional[datetime]
+    end_datetime: Optional[datetime]
+    confidence: float
+    description: str = ""
+
+
+class _Component(NamedTuple):
+    """A parsed piece of the expression and the text span it covers."""
+
+    kind: str  # "date", "time" or "moment"
+    start: object
+    end: object
+    span: tuple[int, int]
+    confidence: float = FULL_CONFIDENCE
+    error: str = ""
+    # shift applied to the end of a range that wraps, "from Friday to Monday"
+    wrap: Optional[timedelta] = None
+
+
+def _number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _month_end(year: int, month: int) -> date:
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _month_with_day(month_start: date, day: int) -> date:
+    """The first month from `month_start` that has `day`, e.g. a 31st."""
+    if not 1 <= day <= 31:
+        raise ValueError(f"no month has a day {day}")
+    while day > calendar.monthrange(month_start.year, month_start.month)[1]:
+        month_start = _add_months(month_start, 1)
+    return month_start
+
+
+def _localize(tz, value: datetime) -> datetime:
+    """Attach `tz` to a naive datetime, pytz zones need `localize`."""
+    if hasattr(tz, "localize"):
+        return tz.localize(value)
+    return value.replace(tzinfo=tz)
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _clock(hour: str, minute: Optional[str], meridiem: Optional[str]):
+    """Convert clock parts to a `time`, returns None for invalid times."""
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def _explicit_date(today: date, month: int, day: int, year: Optional[int], past: bool):
+    """Resolve a month/day with an optional year.
+
+    Without a year the next occurrence is used, or the last one for past
+    references such as "last January 3rd".
+    """
+    if year is not None:
+        return date(year, month, day)
+    candidate = date(today.year, month, day)
+    if past and candidate > today:
+        candidate = date(today.year - 1, month, day)
+    elif not past and candidate < today:
+        candidate = date(today.year + 1, month, day)
+    return candidate
+
+
+def normalize_expression(text: str) -> str:
+    """Lowercase the expression and drop the punctuation the rules ignore."""
+    text = text.lower().replace("’", "'").replace("o'clock", "")
+    text = re.sub(r"[?!;\"()\[\]*#`_]|\.(?!\d)", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _date_rules(now: datetime):
+    """The date rules, ordered from the most to the least specific."""
+    today = now.date()
+
+    def relative_day(match):
+        offsets = {
+            "day after tomorrow": 2,
+            "day before yesterday": -2,
+            "tomorrow": 1,
+            "today": 0,
+            "yesterday": -1,
+        }
+        day = today + timedelta(days=offsets[match.group(1)])
+        return day, day
+
+    def in_units(match):
+        amount, unit = _number(match.group(1)), match.group(2)
+        if unit.startswith("day"):
+            day = today + timedelta(days=amount)
+        elif unit.startswith("week"):
+            day = today + timedelta(weeks=amount)
+        elif unit.startswith("month"):
+            day = _add_months(today, amount)
+        else:
+            return date(today.year + amount, 1, 1), date(today.year + amount, 12, 31)
+        return day, day
+
+    def units_ago(match):
+        amount, unit = _number(match.group(1)), match.group(2)
+        if unit.startswith("day"):
+            day = today - timedelta(days=amount)
+        elif unit.startswith("week"):
+            day = today - timedelta(weeks=amount)
+        elif unit.startswith("month"):
+            first = _add_months(today.replace(day=1), -amount)
+            return first, _month_end(first.year, first.month)
+        else:
+            return date(today.year - amount, 1, 1), date(today.year - amount, 12, 31)
+        return day, day
+
+    def rolling_window(match):
+        direction, amount = match.group(1), _number(match.group(2) or "1")
+        unit = match.group(3)
+        if unit.startswith("day"):
+            delta = timedelta(days=amount)
+        elif unit.startswith("week"):
+            delta = timedelta(weeks=amount)
+        else:
+            return None
+        if direction == "next":
+            return today, today + delta
+        return today - delta, today
+
+    def rest_of(match):
+        unit = match.group(1)
+        if unit == "week":
+            return today, _week_start(today) + timedelta(days=6)
+        if unit == "month":
+            return today, _month_end(today.year, today.month)
+        return today, date(today.year, 12, 31)
+
+    def named_period(match):
+        modifier, unit = match.group(1), match.group(2)
+        shift = {"this": 0, "current": 0, "next": 1, "coming": 1}.get(modifier, -1)
+        if unit == "week":
+            start = _week_start(today) + timedelta(weeks=shift)
+            return start, start + timedelta(days=6)
+        if unit == "month":
+            start = _add_months(today.replace(day=1), shift)
+            return start, _month_end(start.year, start.month)
+        year = today.year + shift
+        return date(year, 1, 1), date(year, 12, 31)
+
+    def weekend(match):
+        modifier = match.group(1) or "this"
+        saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+        if today.weekday() == 6:
+            # it's still this weekend on Sunday
+            saturday = today - timedelta(days=1)
+        if modifier == "next":
+            saturday += timedelta(weeks=1)
+        elif modifier in ("last", "past", "previous"):
+            saturday -= timedelta(weeks=1)
+        return saturday, saturday + timedelta(days=1)
+
+    def weekday(match):
+        modifier, target = match.group(1), WEEKDAYS[match.group(2)]
+        if modifier in ("last", "past", "previous"):
+            days_back = (today.weekday() - target) % 7 or 7
+            day = today - timedelta(days=days_back)
+        else:
+            days_ahead = (target - today.weekday()) % 7
+            if modifier == "next" and days_ahead == 0:
+                days_ahead = 7
+            day = today + timedelta(days=days_ahead)
+        return day, day
+
+    def iso_date(match):
+        day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        return day, day
+
+    def month_day(match):
+        past = match.group(1) is not None
+        month, day = MONTHS[match.group(2)], int(match.group(3))
+        year = int(match.group(4)) if match.group(4) else None
+        day = _explicit_date(today, month, day, year, past)
+        return day, day
+
+    def day_month(match):
+        past = match.group(1) is not None
+        day, month = int(match.group(2)), MONTHS[match.group(3)]
+        year = int(match.group(4)) if match.group(4) else None
+        day = _explicit_date(today, month, day, year, past)
+        return day, day
+
+    def day_of_month_range(match):
+        first, last = int(match.group(1)), int(match.group(2))
+        month_start = today.replace(day=1)
+        if last < today.day:
+            # the whole range already passed, use the next month
+            month_start = _add_months(month_start, 1)
+        month_start = _month_with_day(month_start, last)
+        return month_start.replace(day=first), month_start.replace(day=last)
+
+    def day_of_month(match):
+        day = int(match.group(1))
+        month_start = today.replace(day=1)
+        if day < today.day:
+            month_start = _add_months(month_start, 1)
+        # "the 31st" in a 30 day month is the next 31st
+        candidate = _month_with_day(month_start, day).replace(day=day)
+        return candidate, candidate
+
+    def whole_month(match):
+        modifier, month = match.group(1), MONTHS[match.group(2)]
+        if modifier in ("in", "during", "of", "the month of"):
+            modifier = None
+        year = int(match.group(3)) if match.group(3) else today.year
+        if match.group(3) is None:
+            if modifier in ("last", "past", "previous") and month >= today.month:
+                year -= 1
+            elif modifier not in ("last", "past", "previous") and month < today.month:
+                year += 1
+        return date(year, month, 1), _month_end(year, month)
+
+    return [
+        (
+            r"\b(day after tomorrow|day before yesterday|tomorrow|today|yesterday)\b",
+            relative_day,
+        ),
+        (r"\bin " + NUM + r" (days?|weeks?|months?|years?)\b", in_units),
+        (r"\b" + NUM + r" (days?|weeks?|months?|years?) ago\b", units_ago),
+        (
+            r"\b(?:the|for the) (next|last|past|previous) (?:" + NUM + r" )?"
+            r"(days?|weeks?)\b",
+            rolling_window,
+        ),
+        (r"\b(next|last|past|previous) " + NUM + r" (days?|weeks?)\b", rolling_window),
+        (r"\b(?:the )?rest of (?:this|the) (week|month|year)\b", rest_of),
+        (r"\b(this|current|next|coming|last|past|previous) (week|month|year)\b", named_period),
+        (r"\b(?:(this|next|last|past|previous) )?weekend\b", weekend),
+        (
+            r"\b(?:(this|next|coming|last|past|previous|on) )?" + WEEKDAY + r"\b",
+            weekday,
+        ),
+        (r"\b(\d{4})-(\d{2})-(\d{2})\b", iso_date),
+        (
+            r"\b(last |past |previous )?" + MONTH + r" " + ORDINAL
+            + r"\b(?:,? (\d{4})\b)?",
+            month_day,
+        ),
+        (
+            r"\b(last |past |previous )?(?:the )?" + ORDINAL + r" (?:of )?" + MONTH
+            + r"\b(?:,? (\d{4})\b)?",
+            day_month,
+        ),
+        (
+            r"\b(?:from )?the (\d{1,2})(?:st|nd|rd|th) (?:to|until|till|through|-) "
+            r"the (\d{1,2})(?:st|nd|rd|th)\b",
+            day_of_month_range,
+        ),
+        (r"\bthe (\d{1,2})(?:st|nd|rd|th)\b", day_of_month),
+        (
+            r"\b(?:(this|next|last|past|previous|in|during|the month of|of) )"
+            + MONTH + r"\b(?: (\d{4})\b)?",
+            whole_month,
+        ),
+        # a bare month name, except "may" and the abbreviations
+        (r"\b()" + FULL_MONTH + r"\b(?: (\d{4})\b)?", whole_month),
+    ]
+
+
+def _time_rules(now: datetime):
+    """The time of day rules, resolved to a `(start, end)` time pair."""
+
+    def clock_range(match):
+        if not any(match.group(i) for i in (2, 3, 5, 6)):
+            # two bare numbers ("1 to 10") are not a time range
+            return None
+        end = _clock(match.group(4), match.group(5), match.group(6))
+        # "5 to 9 PM" uses the meridiem of the end time for both times
+        start_meridiem = match.group(3) or match.group(6)
+        start = _clock(match.group(1), match.group(2), start_meridiem)
+        if start is not None and end is not None and start > end and not match.group(3):
+            start = _clock(match.group(1), match.group(2), None)
+        return start, end
+
+    def clock(match):
+        start = _clock(match.group(1), match.group(2), match.group(3))
+        if start is None:
+            return None, None
+        end = (datetime.combine(date.min, start) + timedelta(hours=1)).time()
+        if end < start:
+            end = time(23, 59)
+        return start, end
+
+    def day_part(match):
+        return DAY_PARTS[match.group(1)]
+
+    day_parts = "|".join(sorted(DAY_PARTS, key=len, reverse=True))
+    return [
+        (
+            r"\b(?:from |between )?" + CLOCK + r" ?(?:-|to|until|till|and) ?"
+            + CLOCK + r"\b",
+            clock_range,
+        ),
+        (r"\bat " + CLOCK + r"\b", clock),
+        (r"\b" + r"(\d{1,2})(?::(\d{2}))? ?(am|pm)\b", clock),
+        (r"\b(\d{1,2}):(\d{2})()\b", clock),
+        (r"\b(?:in the |this |at )?(" + day_parts + r")s?\b", day_part),
+    ]
+
+
+def _moment_rules(now: datetime):
+    """Rules relative to the current time, resolved to exact datetimes."""
+
+    def in_short_units(match):
+        amount, unit = _number(match.group(1)), match.group(2)
+        if unit.startswith("hour"):
+            start = now + timedelta(hours=amount)
+        else:
+            start = now + timedelta(minutes=amount)
+        return start, start + timedelta(hours=1)
+
+    def now_moment(match):
+        return now, now + timedelta(hours=1)
+
+    return [
+        (r"\bin " + NUM + r" (hours?|minutes?|mins?)\b", in_short_units),
+        (r"\b(?:right )?now\b", now_moment),
+    ]
+
+
+def _overlaps(span, spans) -> bool:
+    return any(span[0] < other[1] and other[0] < span[1] for other in spans)
+
+
+def _extract_components(text: str, now: datetime) -> list[_Component]:
+    components = []
+    for kind, rules in (
+        ("moment", _moment_rules(now)),
+        ("date", _date_rules(now)),
+        ("time", _time_rules(now)),
+    ):
+        for pattern, handler in rules:
+            for match in re.finditer(pattern, text):
+                span = match.span()
+                if _overlaps(span, [c.span for c in components]):
+                    continue
+                try:
+                    result = handler(match)
+                except ValueError:
+                    components.append(
+                        _Component(
+                            kind, None, None, span,
+                            error=f"{match.group(0)} is not a valid date",
+                        )
+                    )
+                    continue
+                if result is None:
+                    continue
+                start, end = result
+                confidence = FULL_CONFIDENCE
+                wrap = timedelta(weeks=1) if handler.__name__ == "weekday" else None
+                if kind == "time" and (start is None or end is None):
+                    components.append(
+                        _Component(
+                            kind, None, None, span,
+                            error=f"{match.group(0)} is not a valid time",
+                        )
+                    )
+                    continue
+                if kind == "time" and re.fullmatch(r"at \d{1,2}", match.group(0).strip()):
+                    # "at 5" could be 05:00 or 17:00
+                    if int(match.group(1)) <= 12:
+                        confidence = AMBIGUOUS_CONFIDENCE
+                components.append(
+                    _Component(kind, start, end, span, confidence, wrap=wrap)
+                )
+    return sorted(components, key=lambda c: c.span)
+
+
+def _merge_ranges(text: str, components: list[_Component]) -> list[_Component]:
+    """Join "from X to Y" and "X and Y" pairs of the same kind into one range."""
+    merged = []
+    for component in components:
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and previous.kind == component.kind
+            and component.wrap is not None
+            and component.start < previous.start
+        ):
+            component = component._replace(
+                start=component.start + component.wrap,
+                end=component.end + component.wrap,
+            )
+        if (
+            previous is not None
+            and previous.kind == component.kind
+            and not previous.error
+            and not component.error
+            and RANGE_CONNECTOR.match(text[previous.span[1]:component.span[0]])
+        ):
+            merged[-1] = previous._replace(
+                end=max(previous.end, component.end),
+                start=min(previous.start, component.start),
+                span=(previous.span[0], component.span[1]),
+                confidence=min(previous.confidence, component.confidence),
+            )
+            if component.kind == "time" and component.start < previous.start:
+                # "from 11pm until 1am" ends the next day
+                merged[-1] = merged[-1]._replace(start=previous.start, end=component.end)
+            elif component.start < previous.start:
+                start, end = merged[-1].span
+                merged[-1] = merged[-1]._replace(
+                    error=f"the range {text[start:end]} ends before it starts"
+                )
+        else:
+            merged.append(component)
+    return merged
+
+
+def _leftover_confidence(text: str, components: list[_Component]) -> float:
+    """Lower the confidence when temporal words or numbers were not parsed."""
+    leftover = list(text)
+    for component in components:
+        for i in range(*component.span):
+            leftover[i] = " "
+    words = re.findall(r"[a-z]+|\d+", "".join(leftover))
+    for word in words:
+        if word in TEMPORAL_WORDS or word.isdigit():
+            return PARTIAL_CONFIDENCE
+    return FULL_CONFIDENCE
+
+
+def parse_date_range(text: str, now: datetime) -> Optional[ParsedDateRange]:
+    """Resolve the temporal expression of `text` relative to `now`.
+
+    Args:
+        text (str): The natural language request.
+        now (datetime): The current time, aware in the configured timezone.
+
+    Returns:
+        ParsedDateRange: The resolved range, None when no temporal expression
+        was found.
+    """
+    tz = now.tzinfo
+    normalized = normalize_expression(text)
+    components = _merge_ranges(normalized, _extract_components(normalized, now))
+    if not components:
+        return None
+
+    errors = [c.error for c in components if c.error]
+    if errors:
+        return ParsedDateRange(
+            None, None, FULL_CONFIDENCE, f"Error: {errors[0][0].upper()}{errors[0][1:]}."
+        )
+
+    confidence = min(
+        [c.confidence for c in components]
+        + [_leftover_confidence(normalized, components)]
+    )
+    dates = [c for c in components if c.kind == "date"]
+    times = [c for c in components if c.kind == "time"]
+    moments = [c for c in components if c.kind == "moment"]
+
+    if moments:
+        if dates or times or len(moments) > 1:
+            confidence = min(confidence, AMBIGUOUS_CONFIDENCE)
+        start, end = moments[0].start, moments[0].end
+        return ParsedDateRange(
+            start.replace(second=0, microsecond=0),
+            end.replace(second=0, microsecond=0),
+            confidence,
+        )
+
+    if len(dates) > 1 or len(times) > 1:
+        # several unconnected dates ("Monday or Friday"), cover all of them
+        confidence = min(confidence, AMBIGUOUS_CONFIDENCE)
+    start_day = min(c.start for c in dates) if dates else now.date()
+    end_day = max(c.end for c in dates) if dates else now.date()
+
+    if times:
+        start_time, end_time = times[0].start, times[-1].end
+        if start_day != end_day:
+            # "next week in the morning" has no single range
+            confidence = min(confidence, AMBIGUOUS_CONFIDENCE)
+        if start_time > end_time:
+            # "from 11pm to 1am" ends the next day
+            end_day += timedelta(days=1)
+    else:
+        start_time, end_time = time(0, 0), time(23, 59)
+
+    return ParsedDateRange(
+        _localize(tz, datetime.combine(start_day, start_time)),
+        _localize(tz, datetime.combine(end_day, end_time)),
+        confidence,
+    )
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+from agent_workflow.token_budget import token_budgeter
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_summaries (
+    entity_id TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    thread_tokens INTEGER NOT NULL,
+    summary_tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (entity_id, thread_id)
+);
+"""
+
+THREAD_SUMMARY_PROMPT = """
+Summarize this email thread for an assistant answering questions about it.
+Keep, for every message in order: the sender, the date and what they said or
+asked, with every name, date, amount, decision and open question. Use short
+markdown bullets, no introduction.
+
+### Thread {thread_id}:
+{thread}
+"""
+
+
+def thread_version(messages: list[dict]) -> str:
+    """Changes whenever the thread gains, or loses, a message.
+
+    Gmail bumps the `historyId` of a thread on every change; Composio
+    messages may not carry it, so the count and last message id are used
+    too.
+    """
+    history_ids = [
+        int(message["historyId"])
+        for message in messages
+        if str(message.get("historyId", "")).isdigit()
+    ]
+    last = messages[-1] if messages else {}
+    return ":".join(
+        (
+            str(max(history_ids, default="")),
+            str(len(messages)),
+            str(last.get("messageId") or last.get("id") or ""),
+        )
+    )
+
+
+class ThreadSummaryCache:
+    """Persistent LLM summaries of Gmail threads, per entity and thread id.
+
+    A summary is kept with the version of the thread it was made from, see
+    `thread_version`, and is made again once the thread gains messages. The
+    thread is still fetched to check its version, which the tool result
+    cache makes cheap for repeated questions, but the worker reads the
+    summary instead of every message. The tokens saved are those of the
+    thread the worker did not read, less those of the summary.
+
+    Args:
+        path (str): SQLite database file, created on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.tokens_saved = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The database connection, call with the lock held."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def get(self, entity_id: str, thread_id: str, version: str) -> Optional[str]:
+        """The summary of the thread at `version`, None if missing or stale."""
+        with self._lock:
+            row = self.connection.execute(
+                """
+                SELECT version, summary, thread_tokens, summary_tokens
+                FROM thread_summaries WHERE entity_id = ? AND thread_id = ?
+                """,
+                (entity_id, thread_id),
+            ).fetchone()
+            if row is not None and row[0] == version:
+                self.hits += 1
+                self.tokens_saved += max(row[2] - row[3], 0)
+                return row[1]
+            self.misses += 1
+            self.invalidations += row is not None
+        return None
+
+    def put(
+        self,
+        entity_id: str,
+        thread_id: str,
+        version: str,
+        summary: str,
+        thread_tokens: int,
+    ):
+        with self._lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO thread_summaries VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (entity_id, thread_id) DO UPDATE SET
+                    version = excluded.version,
+                    summary = excluded.summary,
+                    thread_tokens = excluded.thread_tokens,
+                    summary_tokens = excluded.summary_tokens,
+                    created_at = excluded.created_at
+                """,
+                (
+                    entity_id,
+                    thread_id,
+                    version,
+                    summary,
+                    thread_tokens,
+                    token_budgeter.count(summary),
+                    time.time(),
+                ),
+            )
+
+    def summarize(self, entity_id: str, thread_id: str, messages: list[dict], llm) -> dict:
+        """The summary of the thread, made with `llm` when not cached."""
+        version = thread_version(messages)
+        summary = self.get(entity_id, thread_id, version)
+        if summary is not None:
+            return {"thread_id": thread_id, "summary": summary, "cached": True}
+        thread = json.dumps(messages, ensure_ascii=False, default=str)
+        thread_tokens = token_budgeter.encoder(thread)
+        # long threads are cut to the budget of the summary prompt
+        thread = token_budgeter.truncate(thread, token_budgeter.budget("thread_summary"))
+        response = llm.invoke(THREAD_SUMMARY_PROMPT.format(thread_id=thread_id, thread=thread))
+        token_budgeter.record_usage("thread_summary", response)
+        self.put(entity_id, thread_id, version, response.content, thread_tokens)
+        return {"thread_id": thread_id, "summary": response.content, "cached": False}
+
+    def summary_tool(self, entity_id: str, fetch_thread, llm) -> StructuredTool:
+        """A tool that summarizes a thread of `entity_id`.
+
+        `fetch_thread` is the function of the GMAIL_FETCH_MESSAGE_BY_THREAD_ID
+        tool of the entity, `llm` writes the missing summaries.
+        """
+
+        def summarize_email_thread(thread_id: str) -> dict:
+            result = fetch_thread(thread_id=thread_id)
+            if not isinstance(result, dict) or result.get("error"):
+                return result
+            messages = (result.get("data") or {}).get("messages") or []
+            if not messages:
+                return result
+            return {
+                "data": self.summarize(entity_id, thread_id, messages, llm),
+                "error": None,
+                "successful": True,
+            }
+
+        class SummarizeEmailThreadRequest(BaseModel):
+            thread_id: str = Field(description="The id of the thread to summarize.")
+
+        return StructuredTool.from_function(
+            func=summarize_email_thread,
+            name="SUMMARIZE_EMAIL_THREAD",
+            description=(
+                "A summary of every message of an email thread: who said what "
+                "and when. Kept up to date with the new messages of the thread."
+            ),
+            args_schema=SummarizeEmailThreadRequest,
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+SUMMARIES_ENABLED = config.get("thread-summaries", "enabled", fallback="true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+# next to the SQLite checkpoint database unless configured
+_path = config.get("thread-summaries", "path", fallback="") or os.path.join(
+    os.path.dirname(config.get("database", "sqlite-path", fallback="checkpoints.db")),
+    "thread_summaries.db",
+)
+
+thread_summaries = ThreadSummaryCache(_path) if SUMMARIES_ENABLED else None
@@ -0,0 +1,282 @@
+import logging
+import math
+import os
+import threading
+from functools import lru_cache
+from typing import Callable, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage, trim_messages
+from langchain_core.runnables import ensure_config
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+# tokens added by the chat format around every message and every reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+TRUNCATION_MARKER = "\n[… {count} tokens truncated …]\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens of `text` estimated from its length, without a tokenizer."""
+    return math.ceil(len(text.encode()) / 4)
+
+
+def _load_encoder(model: str) -> Callable[[str], int]:
+    model_name = model.split("/")[-1]
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            # recent OpenAI models all use this encoding
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"No tokenizer for {model}, tokens are estimated: {e}")
+        return estimate_tokens
+
+
+class _LazyEncoder:
+    """Counts tokens with the encoding of `model`, loaded by `load` or on
+    the first count."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoder = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Callable[[str], int]:
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    self._encoder = _load_encoder(self.model)
+        return self._encoder
+
+    def __call__(self, text: str) -> int:
+        return self.load()(text)
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model: str, tokenizer: str = "tiktoken") -> Callable[[str], int]:
+    """A cached function counting the tokens of a text for `model`.
+
+    With the `tiktoken` tokenizer the tiktoken encoding of the model is used
+    when it can be loaded (it is downloaded once and cached by tiktoken),
+    otherwise, and with the `estimate` tokenizer, tokens are estimated from
+    the text length. The encoding is not loaded at import, but by
+    `TokenBudgeter.warm` or on the first count.
+    """
+    if tokenizer == "estimate":
+        return estimate_tokens
+    return _LazyEncoder(model)
+
+
+def _content_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        part if isinstance(part, str) else str(part.get("text", ""))
+        for part in message.content
+    )
+
+
+class TokenBudgeter:
+    """Fits the prompts of each node in a token budget.
+
+    Args:
+        encoder (Callable): Counts the tokens of a text.
+        budgets (dict): Prompt token budget of each node.
+        default_budget (int): Budget of the nodes missing from `budgets`.
+    """
+
+    def __init__(
+        self,
+        encoder: Callable[[str], int],
+        budgets: dict[str, int],
+        default_budget: int = 8000,
+    ):
+        self.encoder = encoder
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.count = lru_cache(maxsize=4096)(self._count)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Load the tokenizer, which may download it, ahead of the first count."""
+        load = getattr(self.encoder, "load", None)
+        if load is not None:
+            load()
+
+    def _count(self, text: str) -> int:
+        return self.encoder(text)
+
+    def budget(self, node: str) -> int:
+        return self.budgets.get(node, self.default_budget)
+
+    def count_message(self, message: BaseMessage) -> int:
+        tokens = TOKENS_PER_MESSAGE + self.count(_content_text(message))
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            tokens += self.count(str(tool_call.get("args", "")))
+        return tokens
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> int:
+        return TOKENS_PER_REPLY + sum(self.count_message(m) for m in messages)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the head and the tail of `text` in about `max_tokens` tokens."""
+        tokens = self.count(text)
+        if tokens <= max_tokens:
+            return text
+        # characters per token of this text, to cut without re-encoding
+        ratio = len(text) / tokens
+        keep = max(int(max_tokens * ratio) - len(TRUNCATION_MARKER) - 8, 0)
+        head, tail = text[: keep * 3 // 4], text[len(text) - keep // 4 :]
+        return head + TRUNCATION_MARKER.format(count=tokens - max_tokens) + tail
+
+    def truncate_message(self, message: BaseMessage, max_tokens: int) -> BaseMessage:
+        text = _content_text(message)
+        truncated = self.truncate(text, max_tokens)
+        if truncated is text:
+            return message
+        return message.model_copy(update={"content": truncated})
+
+    def fit(
+        self,
+        node: str,
+        messages: Sequence[BaseMessage],
+        drop_history: bool = True,
+    ) -> tuple[list[BaseMessage], dict]:
+        """Fit `messages` in the budget of `node`.
+
+        Messages over half of the budget are truncated first, so a single
+        pasted email thread cannot push out the rest. Then, with
+        `drop_history`, the oldest messages between the leading system
+        messages and the last message are dropped, starting the kept history
+        on a human message. Otherwise, like in a ReAct loop where the tool
+        calls and results must stay paired, the largest tool results are
+        truncated further.
+
+        Returns:
+            The fitted messages, and a config to pass to the LLM call that
+            puts the budget next to the usage in the telemetry spans.
+        """
+        budget = self.budget(node)
+        messages = list(messages)
+        head = []
+        while messages and isinstance(messages[0], SystemMessage):
+            head.append(messages.pop(0))
+        truncated = 0
+
+        cap = budget // 2
+        fitted = []
+        for message in messages:
+            new_message = self.truncate_message(message, cap)
+            truncated += new_message is not message
+            fitted.append(new_message)
+
+        available = budget - self.count_messages(head)
+        dropped = 0
+        if self.count_messages(fitted) > available and drop_history and len(fitted) > 1:
+            last = fitted[-1]
+            history = trim_messages(
+                fitted[:-1],
+                max_tokens=max(available - self.count_message(last) - TOKENS_PER_REPLY, 0),
+                strategy="last",
+                token_counter=lambda ms: sum(self.count_message(m) for m in ms),
+                start_on="human",
+                allow_partial=False,
+            )
+            dropped = len(fitted) - 1 - len(history)
+            fitted = history + [last]
+
+        while (excess := self.count_messages(fitted) - available) > 0:
+            # shrink the largest message that can shrink, the tool results first
+            order = sorted(
+                range(len(fitted)),
+                key=lambda i: (
+                    not isinstance(fitted[i], ToolMessage),
+                    -self.count_message(fitted[i]),
+                ),
+            )
+            for index in order:
+                message = fitted[index]
+                tokens = self.count(_content_text(message))
+                shrunk = self.truncate_message(message, max(tokens - excess, 0))
+                if self.count_message(shrunk) < self.count_message(message):
+                    fitted[index] = shrunk
+                    truncated += 1
+                    break
+            else:
+                break
+
+        fitted = head + fitted
+        estimated = self.count_messages(fitted)
+        with self._lock:
+            stats = self._stats.setdefault(
+                node,
+                {"calls": 0, "budget": budget, "max_estimated": 0, "dropped": 0, "truncated": 0},
+            )
+            stats["calls"] += 1
+            stats["max_estimated"] = max(stats["max_estimated"], estimated)
+            stats["dropped"] += dropped
+            stats["truncated"] += truncated
+        if dropped or truncated:
+            logger.debug(
+                f"{node}: {estimated}/{budget} prompt tokens, "
+                f"{dropped} messages dropped, {truncated} truncated"
+            )
+        metadata = {
+            **ensure_config().get("metadata", {}),
+            "token_budget": budget,
+            "estimated_prompt_tokens": estimated,
+        }
+        return fitted, {"metadata": metadata}
+
+    def record_usage(self, node: str, response) -> Optional[int]:
+        """Compare the prompt tokens billed for `response` with the budget."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens")
+        if prompt_tokens is None:
+            return None
+        budget = self.budget(node)
+        with self._lock:
+            stats = self._stats.setdefault(node, {"budget": budget})
+            stats["max_actual"] = max(stats.get("max_actual", 0), prompt_tokens)
+            if prompt_tokens > budget:
+                stats["over_budget"] = stats.get("over_budget", 0) + 1
+        if prompt_tokens > budget:
+            logger.warning(f"{node}: {prompt_tokens} prompt tokens over the {budget} budget")
+        return prompt_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {node: dict(stats) for node, stats in self._stats.items()}
+
+
+_model = config.get("configurable", "llm-model")
+# the TOKENIZER environment variable overrides the configured tokenizer
+_tokenizer = os.getenv(
+    "TOKENIZER", config.get("token-budget", "tokenizer", fallback="tiktoken")
+)
+token_budgeter = TokenBudgeter(
+    encoder=get_encoder(_model, _tokenizer),
+    budgets={
+        node: int(config.get("token-budget", node.replace("_", "-"), fallback=default))
+        for node, default in (
+            ("orchestrator_input", 6000),
+            ("orchestrator_output", 12000),
+            ("manager", 8000),
+            ("feedback_synthesizer", 12000),
+            ("worker", 24000),
+            ("thread_summary", 16000),
+        )
+    },
+    default_budget=int(config.get("token-budget", "default", fallback=8000)),
+)
@@ -0,0 +1,126 @@
+import copy
+import json
+import logging
+
+from langchain_core.tools import StructuredTool
+
+from agent_workflow.cache import BoundedCache
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+# read actions whose results are cached, by the app they read from
+READ_ACTIONS = {
+    "GOOGLECALENDAR_FIND_EVENT": "googlecalendar",
+    "GOOGLECALENDAR_FIND_FREE_SLOTS": "googlecalendar",
+    "GMAIL_FETCH_EMAILS": "gmail",
+    "GMAIL_LIST_THREADS": "gmail",
+    "GMAIL_FETCH_MESSAGE_BY_THREAD_ID": "gmail",
+}
+
+# write actions that invalidate the cached reads of their app and entity
+WRITE_ACTIONS = {
+    "GOOGLECALENDAR_CREATE_EVENT": "googlecalendar",
+    "GOOGLECALENDAR_UPDATE_EVENT": "googlecalendar",
+    "GOOGLECALENDAR_DELETE_EVENT": "googlecalendar",
+    "GMAIL_SEND_EMAIL": "gmail",
+    "GMAIL_REPLY_TO_THREAD": "gmail",
+    "GMAIL_CREATE_EMAIL_DRAFT": "gmail",
+}
+
+
+def normalize_arguments(kwargs: dict) -> str:
+    """A stable representation of tool arguments, unset values are ignored."""
+    arguments = {key: value for key, value in kwargs.items() if value is not None}
+    return json.dumps(arguments, sort_keys=True, default=str)
+
+
+def is_successful(result) -> bool:
+    """Whether a Composio action result reports success."""
+    if not isinstance(result, dict):
+        return False
+    # older Composio versions spell the key "successfull"
+    successful = result.get("successful", result.get("successfull", False))
+    return bool(successful) and not result.get("error")
+
+
+class ToolResultCache:
+    """TTL cache of the results of Composio read actions.
+
+    Entries are keyed by entity, action and normalized arguments. A
+    successful write action drops every cached read of the same app and
+    entity, so a created event or a sent email is visible right away.
+
+    Args:
+        ttl_seconds (float): Lifetime of a cached result.
+        max_size (int): Entries kept before the least recently used is evicted.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_size: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.cache = BoundedCache(max_size=max_size)
+        self.invalidations = 0
+
+    def invalidate(self, entity_id: str, app: str) -> int:
+        dropped = self.cache.invalidate(
+            lambda key: key[0] == entity_id and READ_ACTIONS[key[1]] == app
+        )
+        self.invalidations += dropped
+        return dropped
+
+    def clear(self):
+        """Drop every cached result."""
+        self.cache.clear()
+
+    def wrap_tool(self, tool: StructuredTool, entity_id: str) -> StructuredTool:
+        """Cache the reads of `tool`, or invalidate on its writes, in place."""
+        action = tool.name
+        original_func = tool.func
+
+        if action in READ_ACTIONS:
+
+            def cached_tool_function(**kwargs):
+                key = (entity_id, action, normalize_arguments(kwargs))
+                result = self.cache.get(key)
+                if result is None:
+                    result = original_func(**kwargs)
+                    if is_successful(result):
+                        self.cache.set(
+                            key,
+                            result,
+                            expires_at=self.cache.clock() + self.ttl_seconds,
+                        )
+                # the caller may modify the result
+                return copy.deepcopy(result)
+
+            tool.func = cached_tool_function
+
+        elif action in WRITE_ACTIONS:
+            app = WRITE_ACTIONS[action]
+
+            def invalidating_tool_function(**kwargs):
+                result = original_func(**kwargs)
+                if is_successful(result):
+                    dropped = self.invalidate(entity_id, app)
+                    logger.debug(
+                        f"{action} for {entity_id}: {dropped} cached reads dropped"
+                    )
+                return result
+
+            tool.func = invalidating_tool_function
+
+        return tool
+
+    def wrap_tools(self, tools: list[StructuredTool], entity_id: str) -> list:
+        return [self.wrap_tool(tool, entity_id) for tool in tools]
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "invalidations": self.invalidations}
+
+
+tool_result_cache = ToolResultCache(
+    ttl_seconds=float(config.get("composio", "tool-cache-ttl-seconds", fallback=60)),
+    max_size=int(config.get("composio", "tool-cache-size", fallback=256)),
+)
@@ -0,0 +1,115 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from langchain_core.tools import StructuredTool
+
+from agent_workflow.tool_cache import WRITE_ACTIONS
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+
+class ToolExecutor:
+    """Runs the sync tool functions of the workers off the event loop.
+
+    The Composio tools are blocking HTTP calls. Their async versions run
+    them on a thread pool of their own, shared by every worker, so the tool
+    calls of an LLM step, which `ToolNode` starts together, and the steps
+    of concurrent workers run side by side without the event loop default
+    pool (5 threads on a single core) queueing them.
+
+    A read running longer than the timeout answers with a Composio error,
+    so the worker can report it; its thread finishes in the background, as
+    a running thread cannot be interrupted. Writes, see `WRITE_ACTIONS`,
+    have no timeout: a write that timed out usually still succeeds, and a
+    retry of the worker would send the email or create the event twice.
+
+    Args:
+        max_workers (int): The threads running tool calls.
+        timeout_seconds (float): Time limit of a tool call, 0 for none.
+    """
+
+    def __init__(self, max_workers: int = 16, timeout_seconds: float = 30.0):
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="tool")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _run(self, func, kwargs: dict):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return func(**kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def arun(self, name: str, func, kwargs: dict):
+        """Run `func(**kwargs)` on the pool, in the context of the caller."""
+        with self._lock:
+            self.calls += 1
+        # the tool functions read the run config from the context
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(context.run, self._run, func, kwargs)
+        )
+        timeout = None if name in WRITE_ACTIONS else self.timeout_seconds or None
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"{name} timed out after {self.timeout_seconds}s")
+            return {
+                "successful": False,
+                "data": {},
+                "error": f"The {name} action timed out after {self.timeout_seconds:g}s.",
+            }
+
+    def wrap_tool(self, tool: StructuredTool) -> StructuredTool:
+        """Run the calls of `tool` on the pool when invoked async, in place.
+
+        The sync function is looked up at call time, so it may still be
+        wrapped afterwards.
+        """
+        if tool.func is None or tool.coroutine is not None:
+            return tool
+
+        async def executed_tool_function(**kwargs):
+            return await self.arun(tool.name, tool.func, kwargs)
+
+        tool.coroutine = executed_tool_function
+        return tool
+
+    def wrap_tools(self, tools: list[StructuredTool]) -> list:
+        return [self.wrap_tool(tool) for tool in tools]
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+        }
+
+    def shutdown(self):
+        """Stop the threads once the running calls finish, drop the queued ones."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+tool_executor = ToolExecutor(
+    max_workers=int(config.get("composio", "tool-threads", fallback=16)),
+    timeout_seconds=float(config.get("composio", "tool-timeout-seconds", fallback=30)),
+)
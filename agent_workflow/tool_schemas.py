@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Optional, Sequence
+
+import composio
+from requests.adapters import HTTPAdapter
+from composio.utils.shared import json_schema_to_model
+from composio_langchain import ComposioToolSet
+from composio_langchain.toolset import StructuredTool as ComposioStructuredTool
+from langchain_core.tools import StructuredTool
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+# connections kept alive per entity, as many as tool calls may run at once
+TOOL_THREADS = int(config.get("composio", "tool-threads", fallback=16))
+
+# bump when the layout of the cache files changes
+SCHEMA_CACHE_VERSION = 1
+
+
+@lru_cache(maxsize=None)
+def get_composio_toolset(entity_id: Optional[str] = None) -> ComposioToolSet:
+    """The Composio toolset of `entity_id`, created on first use.
+
+    Creating it refreshes the Composio actions cache over the network, so
+    tools loaded from the schema cache only create it on their first call.
+    Every entity has its own keep-alive HTTP sessions, with connection
+    pools as large as the tool thread pool, see `ToolExecutor`; the actions
+    run on the long timeout session of the client.
+    """
+    if entity_id is None:
+        return ComposioToolSet()
+    toolset = ComposioToolSet(entity_id=entity_id)
+    for session in (toolset.client.http, toolset.client.long_timeout_http):
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=TOOL_THREADS))
+    return toolset
+
+
+class ToolSchemaCache:
+    """On-disk cache of the Composio action schemas of the workers.
+
+    `get_tools` builds the tools from the cached schemas of the actions and
+    entity without any network round trip, and refetches the schemas once
+    per process on a background thread to keep the cache current; changes
+    are used from the next start. Without a cached copy the schemas are
+    fetched and saved right away.
+
+    Files of another cache version or Composio version are ignored.
+
+    Args:
+        directory (str, optional): Where the schemas are saved, None
+            disables the cache.
+        toolset_factory (Callable): Returns the Composio toolset, of the
+            `entity_id` keyword argument when given.
+        background_refresh (bool): Refetch the cached schemas in the
+            background.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str],
+        toolset_factory: Callable[..., ComposioToolSet] = get_composio_toolset,
+        background_refresh: bool = True,
+    ):
+        self.directory = directory
+        self.toolset_factory = toolset_factory
+        self.background_refresh = background_refresh
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._refreshed = set()
+        self._lock = threading.Lock()
+
+    def key(self, actions: Sequence[str], entity_id: str) -> str:
+        key = json.dumps([SCHEMA_CACHE_VERSION, sorted(actions), entity_id])
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def path(self, actions: Sequence[str], entity_id: str) -> str:
+        return os.path.join(self.directory, f"{entity_id}-{self.key(actions, entity_id)}.json")
+
+    def load(self, actions: Sequence[str], entity_id: str) -> Optional[list[dict]]:
+        """The cached schemas, None when missing or stale."""
+        try:
+            with open(self.path(actions, entity_id)) as file:
+                cached = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if (
+            cached.get("version") != SCHEMA_CACHE_VERSION
+            or cached.get("composio") != composio.__version__
+            or sorted(cached.get("actions", [])) != sorted(actions)
+        ):
+            return None
+        return cached["schemas"]
+
+    def save(self, actions: Sequence[str], entity_id: str, schemas: list[dict]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(actions, entity_id)
+        # write then rename, so a crash never leaves a truncated file
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(
+                {
+                    "version": SCHEMA_CACHE_VERSION,
+                    "composio": composio.__version__,
+                    "actions": list(actions),
+                    "entity_id": entity_id,
+                    "fetched_at": time.time(),
+                    "schemas": schemas,
+                },
+                file,
+            )
+        os.replace(f"{path}.tmp", path)
+
+    def fetch(self, actions: Sequence[str]) -> list[dict]:
+        """Fetch the schemas of `actions` from Composio."""
+        return [
+            schema.model_dump(exclude_none=True)
+            for schema in self.toolset_factory().get_action_schemas(actions=list(actions))
+        ]
+
+    def refresh(self, actions: Sequence[str], entity_id: str) -> bool:
+        """Refetch and save the schemas, True when they changed."""
+        schemas = self.fetch(actions)
+        changed = schemas != self.load(actions, entity_id)
+        if changed:
+            self.save(actions, entity_id, schemas)
+            logger.info(f"Tool schemas of {entity_id} changed, used from the next start")
+        self.refreshes += 1
+        return changed
+
+    def _refresh_in_background(self, actions: Sequence[str], entity_id: str):
+        key = self.key(actions, entity_id)
+        with self._lock:
+            if key in self._refreshed:
+                return
+            self._refreshed.add(key)
+
+        def refresh():
+            try:
+                self.refresh(actions, entity_id)
+            except Exception as e:
+                logger.warning(f"Refreshing the tool schemas of {entity_id} failed: {e}")
+
+        threading.Thread(target=refresh, name=f"refresh-schemas-{entity_id}", daemon=True).start()
+
+    def get_tools(self, actions: Sequence[str], entity_id: str) -> list[StructuredTool]:
+        """The tools of `actions` for `entity_id`, like `ComposioToolSet.get_tools`."""
+        if not self.directory:
+            return list(
+                self.toolset_factory(entity_id=entity_id).get_tools(
+                    actions=actions, entity_id=entity_id
+                )
+            )
+
+        schemas = self.load(actions, entity_id)
+        if schemas is None:
+            self.misses += 1
+            schemas = self.fetch(actions)
+            try:
+                self.save(actions, entity_id, schemas)
+            except OSError as e:
+                logger.warning(f"Saving the tool schemas of {entity_id} failed: {e}")
+            with self._lock:
+                self._refreshed.add(self.key(actions, entity_id))
+        else:
+            self.hits += 1
+            if self.background_refresh:
+                self._refresh_in_background(actions, entity_id)
+        return [self._tool(schema, entity_id) for schema in schemas]
+
+    def _tool(self, schema: dict, entity_id: str) -> StructuredTool:
+        """A tool executing the action of `schema`, as Composio wraps them.
+
+        Invalid arguments answer a Composio error instead of raising, like
+        the tools of `ComposioToolSet`.
+        """
+        action = schema["name"]
+        toolset_factory = self.toolset_factory
+
+        def execute_action(**kwargs):
+            return toolset_factory(entity_id=entity_id).execute_action(
+                action=action, params=kwargs, entity_id=entity_id
+            )
+
+        return ComposioStructuredTool.from_function(
+            func=execute_action,
+            name=action,
+            description=schema["description"],
+            args_schema=json_schema_to_model(json_schema=schema["parameters"]),
+            return_schema=True,
+        )
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes}
+
+
+# the TOOL_SCHEMA_CACHE_DIR environment variable overrides the configured
+# directory, an empty value disables the cache
+tool_schema_cache = ToolSchemaCache(
+    os.getenv(
+        "TOOL_SCHEMA_CACHE_DIR",
+        config.get("composio", "schema-cache-dir", fallback="tool_schemas"),
+    )
+    or None
+)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from langgraph.graph.state import CompiledStateGraph
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRegistry:
+    """The workers of a manager, built on first use.
+
+    Building a worker fetches the schemas of its Composio tools over the
+    network and compiles its ReAct graph, so the names are known from the
+    start but nothing is built before a request needs the worker, or
+    `prewarm` builds it in the background. Built workers are kept for the
+    life of the process.
+
+    Args:
+        builders (dict): A function building the compiled worker, by name.
+    """
+
+    def __init__(self, builders: dict[str, Callable[[], CompiledStateGraph]]):
+        self.builders = builders
+        self._workers = {}
+        self._build_seconds = {}
+        # one lock per worker, so a slow worker does not delay the others
+        self._locks = {name: threading.Lock() for name in builders}
+        self._prewarm_task: Optional[asyncio.Task] = None
+
+    def keys(self):
+        return self.builders.keys()
+
+    def __iter__(self):
+        return iter(self.builders)
+
+    def __len__(self):
+        return len(self.builders)
+
+    def __contains__(self, name) -> bool:
+        return name in self.builders
+
+    def is_built(self, name: str) -> bool:
+        return name in self._workers
+
+    def get(self, name: str) -> CompiledStateGraph:
+        """The worker `name`, built on the calling thread if needed."""
+        worker = self._workers.get(name)
+        if worker is not None:
+            return worker
+        with self._locks[name]:
+            if name not in self._workers:
+                start = time.perf_counter()
+                self._workers[name] = self.builders[name]()
+                self._build_seconds[name] = time.perf_counter() - start
+                logger.info(f"Built worker {name} in {self._build_seconds[name]:.2f}s")
+        return self._workers[name]
+
+    __getitem__ = get
+
+    async def aget(self, name: str) -> CompiledStateGraph:
+        """The worker `name`, built on a thread so the event loop keeps running."""
+        worker = self._workers.get(name)
+        if worker is not None:
+            return worker
+        return await asyncio.to_thread(self.get, name)
+
+    def prewarm(self, names: Optional[Iterable[str]] = None) -> asyncio.Task:
+        """Build the workers in the background, all of them by default.
+
+        A worker that fails to build is logged and built again on its first
+        use.
+        """
+
+        async def build_all():
+            for name in names if names is not None else list(self.builders):
+                try:
+                    await self.aget(name)
+                except Exception as e:
+                    logger.warning(f"Prewarming worker {name} failed: {e}")
+
+        if self._prewarm_task is None or self._prewarm_task.done():
+            self._prewarm_task = asyncio.create_task(build_all(), name="prewarm-workers")
+        return self._prewarm_task
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "built": name in self._workers,
+                "build_seconds": self._build_seconds.get(name),
+            }
+            for name in self.builders
+        }
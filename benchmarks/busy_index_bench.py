@@ -0,0 +1,84 @@
+"""Latency of free/busy checks on the local index against a linear scan.
+
+Run from the repository root:
+
+    python -m benchmarks.busy_index_bench --events 5000 --queries 10000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from agent_workflow.busy_index import BusyBlock, IntervalIndex
+
+
+def make_blocks(count: int, start: datetime) -> list[BusyBlock]:
+    rng = random.Random(0)
+    blocks = []
+    for i in range(count):
+        block_start = start + timedelta(minutes=15 * rng.randrange(365 * 24 * 4))
+        duration = timedelta(minutes=rng.choice((15, 30, 60, 90, 120, 24 * 60)))
+        blocks.append(BusyBlock(block_start, block_start + duration, str(i)))
+    return blocks
+
+
+def percentile(samples: list[float], q: float) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1]
+
+
+def measure(check, queries) -> list[float]:
+    samples = []
+    for start, end in queries:
+        init_time = time.perf_counter()
+        check(start, end)
+        samples.append((time.perf_counter() - init_time) * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+
+    start = pytz.timezone("Asia/Karachi").localize(datetime(2025, 1, 1))
+    blocks = make_blocks(args.events, start)
+
+    init_time = time.perf_counter()
+    index = IntervalIndex()
+    for block in blocks:
+        index.add(block)
+    build_ms = (time.perf_counter() - init_time) * 1e3
+
+    rng = random.Random(1)
+    queries = []
+    for _ in range(args.queries):
+        query_start = start + timedelta(minutes=15 * rng.randrange(365 * 24 * 4))
+        queries.append((query_start, query_start + timedelta(hours=1)))
+
+    def scan(query_start, query_end):
+        return [b for b in blocks if b.start < query_end and b.end > query_start]
+
+    def lookup(query_start, query_end):
+        return list(index.overlapping(query_start, query_end))
+
+    assert all(
+        sorted(scan(*q)) == sorted(lookup(*q)) for q in queries[:100]
+    ), "index and scan disagree"
+
+    print(f"{args.events} events, index built in {build_ms:.1f} ms")
+    for name, check in (("linear scan", scan), ("interval index", lookup)):
+        samples = measure(check, queries)
+        print(
+            f"{name:>15}: p50 {percentile(samples, 50):8.1f} us"
+            f"  p95 {percentile(samples, 95):8.1f} us"
+            f"  p99 {percentile(samples, 99):8.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
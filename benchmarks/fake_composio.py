@@ -0,0 +1,194 @@
+"""In-memory stand-in of the Composio toolset used by the workers.
+
+`install()` registers a fake `composio_langchain` package, it must run before
+the worker modules are imported. The tools answer from a synthetic calendar
+and mailbox per entity after `latency` seconds.
+"""
+
+import itertools
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import requests
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel
+
+
+class FakeArguments(BaseModel):
+    """The arguments of the calendar and Gmail actions the fakes look at."""
+
+    timeMin: Optional[str] = None
+    timeMax: Optional[str] = None
+    query: Optional[str] = None
+    max_results: Optional[int] = None
+    page_token: Optional[str] = None
+    single_events: Optional[bool] = None
+    event_id: Optional[str] = None
+    summary: Optional[str] = None
+    start_datetime: Optional[str] = None
+    thread_id: Optional[str] = None
+    recipient_email: Optional[str] = None
+    subject: Optional[str] = None
+    body: Optional[str] = None
+    label_ids: Optional[list[Any]] = None
+
+
+# JSON schema types of the FakeArguments fields, as Composio describes them
+JSON_TYPES = {str: "string", int: "integer", bool: "boolean", list: "array"}
+
+
+class FakeActionModel(BaseModel):
+    """The fields of a Composio action schema the toolset wraps."""
+
+    name: str
+    description: str
+    parameters: dict
+
+
+def fake_action_schema(action: str) -> FakeActionModel:
+    properties = {}
+    for name, field in FakeArguments.model_fields.items():
+        # Optional[X] annotations, X is the first argument
+        annotation = field.annotation.__args__[0]
+        json_type = JSON_TYPES[getattr(annotation, "__origin__", annotation)]
+        properties[name] = {"type": json_type, "title": name, "description": name}
+    return FakeActionModel(
+        name=action,
+        description=f"Fake {action}",
+        parameters={"title": "FakeArguments", "type": "object", "properties": properties},
+    )
+
+
+class FakeComposioBackend:
+    """Synthetic Google Calendar and Gmail accounts of every entity.
+
+    `schema_latency` is the time Composio takes to create a toolset or to
+    answer an action schemas request.
+    """
+
+    def __init__(
+        self, latency: float = 0.2, events_per_day: int = 4, schema_latency: float = 0.0
+    ):
+        self.latency = latency
+        self.events_per_day = events_per_day
+        self.schema_latency = schema_latency
+        self.calls = Counter()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _events(self, entity_id: str, time_min: Optional[str]) -> list[dict]:
+        day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        if time_min:
+            try:
+                day = datetime(*[int(part) for part in time_min.split(",")[:3]])
+            except ValueError:
+                pass
+        events = []
+        for i in range(self.events_per_day):
+            start = day + timedelta(hours=9 + 2 * i)
+            events.append(
+                {
+                    "id": f"{entity_id}-{start:%Y%m%d%H}",
+                    "summary": f"Meeting {i + 1}",
+                    "start": {"dateTime": start.isoformat() + "+05:00"},
+                    "end": {"dateTime": (start + timedelta(hours=1)).isoformat() + "+05:00"},
+                }
+            )
+        return events
+
+    def _messages(self, entity_id: str, count: int) -> list[dict]:
+        now = datetime.now()
+        return [
+            {
+                "messageId": f"{entity_id}-m{i}",
+                "threadId": f"{entity_id}-t{i}",
+                "subject": f"Project update {i}",
+                "sender": f"colleague{i}@example.com",
+                "messageText": "Here is the weekly update of the project. " * 5,
+                "messageTimestamp": (now - timedelta(hours=i)).isoformat() + "Z",
+                "labelIds": ["INBOX", "UNREAD"],
+            }
+            for i in range(count)
+        ]
+
+    def execute(self, action: str, entity_id: str, arguments: dict) -> dict:
+        with self._lock:
+            self.calls[action] += 1
+        time.sleep(self.latency)
+        if action == "GOOGLECALENDAR_FIND_EVENT":
+            data = {"event_data": {"event_data": self._events(entity_id, arguments.get("timeMin"))}}
+        elif action == "GOOGLECALENDAR_FIND_FREE_SLOTS":
+            data = {"calendars": {"primary": {"busy": []}}}
+        elif action in ("GOOGLECALENDAR_CREATE_EVENT", "GOOGLECALENDAR_UPDATE_EVENT"):
+            data = {
+                "response_data": {
+                    "id": arguments.get("event_id") or f"created-{next(self._ids)}",
+                    "summary": arguments.get("summary", "Event"),
+                    "start": {"dateTime": arguments.get("start_datetime")},
+                    "end": {"dateTime": arguments.get("start_datetime")},
+                }
+            }
+        elif action in ("GMAIL_FETCH_EMAILS", "GMAIL_LIST_THREADS"):
+            data = {"messages": self._messages(entity_id, int(arguments.get("max_results") or 10))}
+        elif action == "GMAIL_FETCH_MESSAGE_BY_THREAD_ID":
+            data = {"messages": self._messages(entity_id, 1)}
+        else:
+            data = {"id": f"sent-{next(self._ids)}"}
+        return {"data": data, "error": None, "successful": True}
+
+
+class FakeComposioToolSet:
+    """Drop-in for `composio_langchain.ComposioToolSet`."""
+
+    backend = FakeComposioBackend()
+
+    def __init__(self, *args, **kwargs):
+        with self.backend._lock:
+            self.backend.calls["toolset"] += 1
+        time.sleep(self.backend.schema_latency)
+        # the HTTP sessions of the Composio client, never used
+        self.client = types.SimpleNamespace(
+            http=requests.Session(), long_timeout_http=requests.Session()
+        )
+
+    def get_action_schemas(self, actions: list[str], **kwargs) -> list[FakeActionModel]:
+        with self.backend._lock:
+            self.backend.calls["action_schemas"] += 1
+        time.sleep(self.backend.schema_latency)
+        return [fake_action_schema(action) for action in actions]
+
+    def execute_action(self, action: str, params: dict, entity_id: str = "default", **kwargs):
+        return self.backend.execute(action, entity_id, params)
+
+    def get_tools(self, actions: list[str], entity_id: str = "default", **kwargs):
+        self.get_action_schemas(actions)
+        return [self._tool(action, entity_id) for action in actions]
+
+    def _tool(self, action: str, entity_id: str) -> StructuredTool:
+        def execute(**kwargs):
+            return self.backend.execute(action, entity_id, kwargs)
+
+        return StructuredTool.from_function(
+            func=execute,
+            name=action,
+            description=f"Fake {action}",
+            args_schema=FakeArguments,
+        )
+
+
+def install(backend: FakeComposioBackend) -> FakeComposioBackend:
+    """Make `composio_langchain.ComposioToolSet` use `backend`."""
+    FakeComposioToolSet.backend = backend
+    module = types.ModuleType("composio_langchain")
+    module.ComposioToolSet = FakeComposioToolSet
+    # the tool schema cache wraps the actions with the toolset's StructuredTool
+    module.toolset = types.ModuleType("composio_langchain.toolset")
+    module.toolset.StructuredTool = StructuredTool
+    sys.modules["composio_langchain"] = module
+    sys.modules["composio_langchain.toolset"] = module.toolset
+    return backend
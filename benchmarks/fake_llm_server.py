@@ -0,0 +1,285 @@
+"""OpenAI-compatible chat completions server with scripted answers.
+
+The answer of a request depends on what the agents ask for:
+
+- a structured output (`with_structured_output`, as a JSON schema response
+  format or a forced tool call) gets the scripted value of that schema,
+  see `Scenario`,
+- a worker with tools first calls `Scenario.worker_tools` for its app,
+  then answers once the tool results are in the conversation,
+- anything else gets a plain text answer.
+
+Every answer is delayed by `latency` seconds, streamed answers also wait
+`token_latency` between chunks. With `max_concurrency`, the requests above
+it are answered 429, like a rate limited provider.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from aiohttp import web
+
+
+@dataclass
+class Scenario:
+    """Scripted structured outputs of one kind of user request."""
+
+    name: str
+    managers: list = field(default_factory=list)
+    calendar_workers: list = field(default_factory=list)
+    email_workers: list = field(default_factory=list)
+    answer: str = "Here is a summary of what I found for you."
+
+
+# the first tool a worker calls, by the prefix of its tools
+WORKER_TOOLS = {
+    "GOOGLECALENDAR_": (
+        "GOOGLECALENDAR_FIND_EVENT",
+        {"timeMin": "2025,03,03,00,00,00", "timeMax": "2025,03,04,00,00,00"},
+    ),
+    "GMAIL_": ("GMAIL_FETCH_EMAILS", {"max_results": 5}),
+}
+
+
+SCENARIOS = {
+    "chat": Scenario(name="chat"),
+    "calendar": Scenario(
+        name="calendar",
+        managers=[
+            {"route_manager": "date_manage", "query": "tomorrow"},
+            {"route_manager": "calendar_manage", "query": "List my events tomorrow."},
+        ],
+        calendar_workers=[
+            {"name": "personal_calendar", "task": "List the events of tomorrow."}
+        ],
+    ),
+    "email": Scenario(
+        name="email",
+        managers=[{"route_manager": "email_manage", "query": "Summarize my inbox."}],
+        email_workers=[{"name": "work_email", "task": "Fetch the latest emails."}],
+    ),
+    "calendar+email": Scenario(
+        name="calendar+email",
+        managers=[
+            {
+                "route_manager": "calendar_manage",
+                "query": "List my events today.",
+                "depends_on": [],
+            },
+            {
+                "route_manager": "email_manage",
+                "query": "Summarize my inbox.",
+                "depends_on": [],
+            },
+        ],
+        calendar_workers=[
+            {"name": "personal_calendar", "task": "List the events of today."},
+            {"name": "work_calendar", "task": "List the events of today."},
+        ],
+        email_workers=[{"name": "work_email", "task": "Fetch the latest emails."}],
+    ),
+}
+
+
+class FakeLLMServer:
+    """Serves `/v1/chat/completions` on localhost.
+
+    Args:
+        scenario (Scenario): Scripted answers, may be replaced between runs.
+        latency (float): Seconds before the first byte of every answer.
+        token_latency (float): Seconds between the chunks of streamed answers.
+        max_concurrency (int, optional): Requests served at once, the others
+            are answered 429 with a Retry-After of `latency`.
+    """
+
+    def __init__(
+        self,
+        scenario: Scenario = SCENARIOS["chat"],
+        latency: float = 0.3,
+        token_latency: float = 0.01,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.scenario = scenario
+        self.latency = latency
+        self.token_latency = token_latency
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.throttled = 0
+        self.calls = Counter()
+        self.prompt_tokens = 0
+        self._ids = itertools.count()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = None
+
+    def _structured_output(self, name: str) -> dict:
+        if name == "OrchestratorRouterList":
+            return {"managers": self.scenario.managers}
+        if name == "OrchestratorPlan":
+            workers = {
+                "calendar_manage": {"calendar_workers": self.scenario.calendar_workers},
+                "email_manage": {"email_workers": self.scenario.email_workers},
+            }
+            return {
+                "managers": [
+                    {**manager, **workers.get(manager["route_manager"], {})}
+                    for manager in self.scenario.managers
+                ]
+            }
+        if name == "CalendarRouterList":
+            return {"workers": self.scenario.calendar_workers}
+        if name == "EmailRouterList":
+            return {"workers": self.scenario.email_workers}
+        if name == "DateExtractionResult":
+            return {
+                "start_datetime": "2025-03-03T00:00:00+05:00",
+                "end_datetime": "2025-03-03T23:59:00+05:00",
+            }
+        return {}
+
+    def answer(self, request: dict) -> tuple[str, dict]:
+        """The kind of the request and its assistant message."""
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            name = response_format["json_schema"]["name"]
+            content = json.dumps(self._structured_output(name))
+            return name, {"role": "assistant", "content": content}
+
+        tool_choice = request.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            name = tool_choice["function"]["name"]
+            arguments = self._structured_output(name)
+            return name, self._tool_call_message(name, arguments)
+
+        messages = request.get("messages", [])
+        tool_names = [tool["function"]["name"] for tool in request.get("tools", [])]
+        if tool_names and messages and messages[-1]["role"] != "tool":
+            for prefix, (name, arguments) in WORKER_TOOLS.items():
+                if name in tool_names and tool_names[0].startswith(prefix):
+                    return "worker_tool_call", self._tool_call_message(name, arguments)
+        kind = "worker_answer" if tool_names else "text"
+        return kind, {"role": "assistant", "content": self.scenario.answer}
+
+    def _tool_call_message(self, name: str, arguments: dict) -> dict:
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{next(self._ids)}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }
+            ],
+        }
+
+    async def chat_completions(self, http_request: web.Request):
+        if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+            self.throttled += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status=429,
+                headers={"retry-after-ms": str(int(self.latency * 1000))},
+            )
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await self._chat_completions(http_request)
+        finally:
+            self.in_flight -= 1
+
+    async def _chat_completions(self, http_request: web.Request):
+        request = await http_request.json()
+        kind, message = self.answer(request)
+        self.calls[kind] += 1
+        prompt_tokens = len(json.dumps(request.get("messages", []))) // 4
+        self.prompt_tokens += prompt_tokens
+        await asyncio.sleep(self.latency)
+
+        completion = {
+            "id": f"chatcmpl-{next(self._ids)}",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+        }
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        if not request.get("stream"):
+            return web.json_response(
+                {
+                    **completion,
+                    "object": "chat.completion",
+                    "choices": [
+                        {"index": 0, "message": message, "finish_reason": finish_reason}
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": 20,
+                        "total_tokens": prompt_tokens + 20,
+                    },
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(http_request)
+
+        async def send(delta: dict, finish: Optional[str] = None):
+            chunk = {
+                **completion,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        if message.get("tool_calls"):
+            tool_calls = [{"index": 0, **message["tool_calls"][0]}]
+            await send({"role": "assistant", "tool_calls": tool_calls})
+        else:
+            for i, word in enumerate(message["content"].split(" ")):
+                await send({"role": "assistant", "content": word if i == 0 else f" {word}"})
+                await asyncio.sleep(self.token_latency)
+        await send({}, finish_reason)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def start(self, port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def start_in_thread(self) -> str:
+        """Serve from a thread with its own event loop, so the server does not
+        compete with the measured code for its loop."""
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop())
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        self._loop = loop
+        return self.base_url
+
+    def stop_thread(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -0,0 +1,96 @@
+"""Bursts of LLM calls against a rate limited endpoint, with and without the limiter.
+
+The fake LLM server of `fake_llm_server` serves `--capacity` requests at
+once and answers 429 to the others, like a provider past its rate limit.
+`--burst` calls start together, in `--rounds` rounds, through `ChatOpenAI`
+clients built either plainly, retrying the 429s on their own, or on a
+shared `LLMLimiter`. Reports the wall time, the 429s the server sent and
+the calls that failed after their retries.
+
+Run from the repository root:
+
+    python -m benchmarks.llm_limiter_bench --capacity 4 --burst 24 --llm-latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+
+import openai
+from langchain_openai import ChatOpenAI
+
+from agent_workflow.llm_limiter import LLMLimiter
+from benchmarks.fake_llm_server import FakeLLMServer
+
+
+async def measure(mode: str, args) -> dict:
+    server = FakeLLMServer(latency=args.llm_latency, max_concurrency=args.capacity)
+    base_url = server.start_in_thread()
+    clients = {}
+    limiter = None
+    if mode == "limiter":
+        limiter = LLMLimiter(initial_concurrency=args.initial_concurrency)
+        clients = {
+            "http_client": limiter.http_client(),
+            "http_async_client": limiter.http_async_client(),
+        }
+    # one client per agent, like the orchestrator and the workers
+    llms = [
+        ChatOpenAI(model="fake", api_key="fake", base_url=base_url, **clients)
+        for _ in range(4)
+    ]
+    failures = 0
+
+    async def call(i: int):
+        nonlocal failures
+        try:
+            await llms[i % len(llms)].ainvoke("hi")
+        except openai.RateLimitError:
+            failures += 1
+
+    init_time = time.perf_counter()
+    for _ in range(args.rounds):
+        await asyncio.gather(*(call(i) for i in range(args.burst)))
+    duration = time.perf_counter() - init_time
+    server.stop_thread()
+    result = {
+        "duration": duration,
+        "throttled": server.throttled,
+        "failures": failures,
+        "max_in_flight": server.max_in_flight,
+    }
+    if limiter is not None:
+        stats = limiter.stats()
+        result["concurrency"] = stats["concurrency"]
+        result["mean_wait"] = stats["mean_wait_seconds"]
+        result["max_queue"] = stats["max_queue_depth"]
+    return result
+
+
+async def main(args):
+    print(
+        f"capacity {args.capacity}, {args.rounds} bursts of {args.burst} calls, "
+        f"LLM latency {args.llm_latency}s\n"
+    )
+    for mode in ("plain", "limiter"):
+        result = await measure(mode, args)
+        line = (
+            f"{mode:>8}: {result['duration']:6.2f} s, {result['throttled']:4d} 429s, "
+            f"{result['failures']:3d} failed calls"
+        )
+        if "concurrency" in result:
+            line += (
+                f", concurrency {result['concurrency']}, mean wait "
+                f"{result['mean_wait']:.2f} s, max queue {result['max_queue']}"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--burst", type=int, default=24)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--initial-concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""Ingest and search latency of the local Gmail mirror on a synthetic mailbox.
+
+Run from the repository root:
+
+    python -m benchmarks.mail_mirror_bench --messages 100000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from agent_workflow.mail_mirror import MailMirror
+
+COMMON_WORDS = (
+    "invoice meeting project update report review budget contract travel "
+    "offer interview launch release deadline agenda feedback proposal order "
+    "shipping payment receipt reminder newsletter webinar account security"
+).split()
+# word frequencies of real mail follow Zipf's law
+WORDS = COMMON_WORDS + [f"term{i}" for i in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(WORDS) + 1)))
+SENDERS = [f"person{i}@example{i % 40}.com" for i in range(400)]
+LABELS = ["INBOX", "UNREAD", "STARRED", "IMPORTANT", "CATEGORY_UPDATES", "SENT"]
+
+
+def make_messages(count: int) -> list[dict]:
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(count):
+        date = start + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+        messages.append(
+            {
+                "messageId": f"m{i}",
+                "threadId": f"t{i // 3}",
+                "subject": " ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=4)).capitalize(),
+                "sender": rng.choice(SENDERS),
+                "messageText": " ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=30)),
+                "messageTimestamp": date.isoformat(),
+                "labelIds": rng.sample(LABELS, k=2),
+            }
+        )
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "mirror.db")
+        mirror = MailMirror(path)
+
+        init_time = time.perf_counter()
+        for i in range(0, len(messages), 1000):
+            mirror.ingest("personal", messages[i : i + 1000])
+        ingest_seconds = time.perf_counter() - init_time
+        size_mb = sum(
+            os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+        ) / 2**20
+        print(
+            f"{args.messages} messages ingested in {ingest_seconds:.1f} s "
+            f"({args.messages / ingest_seconds:.0f} msg/s), {size_mb:.1f} MB on disk"
+        )
+
+        rng = random.Random(1)
+
+        def word():
+            return rng.choices(WORDS, cum_weights=CUM_WEIGHTS)[0]
+
+        searches = {
+            "one word": lambda: mirror.search("personal", word()),
+            "two words": lambda: mirror.search("personal", f"{word()} {word()}"),
+            "word + sender": lambda: mirror.search(
+                "personal", word(), sender=rng.choice(SENDERS)
+            ),
+            "word + year": lambda: mirror.search(
+                "personal",
+                word(),
+                after=int(datetime(2021, 1, 1, tzinfo=timezone.utc).timestamp()),
+                before=int(datetime(2022, 1, 1, tzinfo=timezone.utc).timestamp()),
+            ),
+        }
+        for name, search in searches.items():
+            samples = []
+            for _ in range(args.queries):
+                init_time = time.perf_counter()
+                search()
+                samples.append((time.perf_counter() - init_time) * 1e3)
+            quantiles = statistics.quantiles(samples, n=100)
+            print(
+                f"{name:>14}: p50 {quantiles[49]:7.2f} ms"
+                f"  p95 {quantiles[94]:7.2f} ms  p99 {quantiles[98]:7.2f} ms"
+            )
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
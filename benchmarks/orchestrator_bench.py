@@ -0,0 +1,214 @@
+"""End-to-end latency and throughput of the orchestrator, without network.
+
+The agents talk to the fake LLM server of `fake_llm_server` and use the
+fake Composio tools of `fake_composio`. Each scenario is run by N
+concurrent users sending requests one after the other.
+
+Run from the repository root:
+
+    python -m benchmarks.orchestrator_bench --users 8 --requests 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks import fake_composio
+from benchmarks.fake_llm_server import SCENARIOS, FakeLLMServer
+
+USER_INPUTS = {
+    "chat": "Hello there! What can you do?",
+    "calendar": "What do I have tomorrow?",
+    "email": "Summarize my latest work emails.",
+    "calendar+email": "Show my meetings today and summarize my inbox.",
+}
+
+
+def count_checkpoint_writes(checkpointer, counter: Counter):
+    """Count the checkpoints and pending writes stored by `checkpointer`."""
+    for name in ("aput", "aput_writes"):
+        method = getattr(checkpointer, name)
+
+        async def counted(*args, _method=method, _name=name, **kwargs):
+            counter[_name] += 1
+            return await _method(*args, **kwargs)
+
+        setattr(checkpointer, name, counted)
+    return checkpointer
+
+
+async def build_checkpointer(kind: str, directory: str):
+    if kind == "sqlite":
+        from agent_workflow.database import SqliteSaverCustom
+
+        checkpointer, connection = await SqliteSaverCustom.from_path(
+            os.path.join(directory, "checkpoints.db")
+        )
+        await checkpointer.setup()
+        return checkpointer, connection.close
+    from langgraph.checkpoint.memory import MemorySaver
+
+    async def close():
+        pass
+
+    return MemorySaver(), close
+
+
+def percentiles(samples: list[float]) -> str:
+    if len(samples) < 2:
+        return f"p50 {samples[0]:6.2f} s"
+    quantiles = statistics.quantiles(samples, n=100)
+    return f"p50 {quantiles[49]:6.2f} s  p95 {quantiles[94]:6.2f} s  p99 {quantiles[98]:6.2f} s"
+
+
+async def run_scenario(
+    args, server, backend, orchestrator, name, mode, directory, callbacks
+) -> dict:
+    from agent_workflow.busy_index import busy_index
+    from agent_workflow.tool_cache import tool_result_cache
+
+    server.scenario = SCENARIOS[name]
+    orchestrator.ORCHESTRATOR_MODE = mode
+    # every run starts cold, the tool results of the previous one are not reused
+    tool_result_cache.clear()
+    busy_index.clear()
+    checkpoint_writes = Counter()
+    checkpointer, close = await build_checkpointer(args.checkpointer, directory)
+    graph = orchestrator.orchestrator_builder.compile(
+        checkpointer=count_checkpoint_writes(checkpointer, checkpoint_writes)
+    )
+    llm_calls_before = Counter(server.calls)
+    tool_calls_before = Counter(backend.calls)
+    latencies = []
+    errors = 0
+
+    async def user(index: int):
+        nonlocal errors
+        config = {
+            "configurable": {"thread_id": f"{mode}-{name}-user-{index}"},
+            "callbacks": callbacks,
+        }
+        for _ in range(args.requests):
+            init_time = time.perf_counter()
+            try:
+                await graph.ainvoke({"user_input": USER_INPUTS[name]}, config)
+            except Exception as e:
+                errors += 1
+                print(f"  {name}: request failed: {e!r}")
+                continue
+            latencies.append(time.perf_counter() - init_time)
+
+    init_time = time.perf_counter()
+    await asyncio.gather(*[user(i) for i in range(args.users)])
+    duration = time.perf_counter() - init_time
+    await close()
+
+    requests = max(len(latencies), 1)
+    llm_calls = Counter(server.calls)
+    llm_calls.subtract(llm_calls_before)
+    tool_calls = Counter(backend.calls)
+    tool_calls.subtract(tool_calls_before)
+    return {
+        "scenario": name,
+        "mode": mode,
+        "latencies": latencies,
+        "errors": errors,
+        "throughput": len(latencies) / duration,
+        "llm_calls": sum(llm_calls.values()) / requests,
+        "llm_calls_by_kind": {k: v / requests for k, v in llm_calls.items() if v},
+        "tool_calls": sum(tool_calls.values()) / requests,
+        "checkpoint_writes": checkpoint_writes["aput"] / requests,
+        "pending_writes": checkpoint_writes["aput_writes"] / requests,
+    }
+
+
+def print_report(result: dict):
+    print(f"{result['scenario']} ({result['mode']} mode):")
+    if result["latencies"]:
+        print(f"  latency     {percentiles(result['latencies'])}")
+    print(
+        f"  throughput  {result['throughput']:.2f} req/s"
+        f" ({len(result['latencies'])} ok, {result['errors']} failed)"
+    )
+    by_kind = ", ".join(f"{k} {v:.1f}" for k, v in sorted(result["llm_calls_by_kind"].items()))
+    print(f"  LLM calls   {result['llm_calls']:.1f} per request ({by_kind})")
+    print(f"  tool calls  {result['tool_calls']:.1f} per request")
+    print(
+        f"  checkpoints {result['checkpoint_writes']:.1f} puts"
+        f" + {result['pending_writes']:.1f} pending writes per request"
+    )
+
+
+async def main(args):
+    server = FakeLLMServer(latency=args.llm_latency)
+    os.environ["LLM_BASE_URL"] = server.start_in_thread()
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    # the fake tool schemas are not worth caching on disk
+    os.environ["TOOL_SCHEMA_CACHE_DIR"] = ""
+    # no tokenizer download, the bench runs offline
+    os.environ["TOKENIZER"] = "estimate"
+    backend = fake_composio.install(
+        fake_composio.FakeComposioBackend(latency=args.tool_latency)
+    )
+    # the agents read LLM_BASE_URL at import time
+    from agent_workflow import orchestrator
+
+    # build the workers up front, so the first requests do not pay for it
+    for workers in (orchestrator.calendar_workers_dict, orchestrator.email_workers_dict):
+        for name in workers:
+            workers.get(name)
+
+    print(
+        f"{args.users} users x {args.requests} requests, LLM latency "
+        f"{args.llm_latency}s, tool latency {args.tool_latency}s, "
+        f"{args.checkpointer} checkpointer\n"
+    )
+    callbacks = []
+    if args.spans:
+        from agent_workflow.telemetry import JsonlSpanSink, TelemetryCallbackHandler
+
+        sink = JsonlSpanSink(args.spans)
+        callbacks.append(TelemetryCallbackHandler(sink))
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for name in args.scenarios:
+                for mode in args.modes:
+                    print_report(
+                        await run_scenario(
+                            args, server, backend, orchestrator, name, mode, directory,
+                            callbacks,
+                        )
+                    )
+    finally:
+        server.stop_thread()
+    if args.spans:
+        sink.close()
+        print(f"\nspans written to {args.spans}, break them down with:")
+        print(f"python -m agent_workflow.telemetry {args.spans}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=4, help="Concurrent users.")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per user.")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--checkpointer", choices=("memory", "sqlite"), default="memory"
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=("router", "planner"),
+        default=["router"],
+        help="Orchestrator modes to compare, see `orchestrator-mode` in config.ini.",
+    )
+    parser.add_argument("--spans", help="Write the telemetry spans to this JSONL file.")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    asyncio.run(main(parser.parse_args()))
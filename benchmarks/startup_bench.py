@@ -0,0 +1,105 @@
+"""Cold start time of the workers with and without the tool schema cache.
+
+Every run is a new Python process that imports the worker modules and
+builds the four calendar and email workers against the fake Composio tools
+of `fake_composio`. A Composio round trip (toolset creation or an action
+schemas request) takes `--schema-latency` seconds. The runs are:
+
+- no cache: every worker fetches its schemas, like before the cache,
+- cold cache: an empty cache directory, the schemas are fetched and saved,
+- warm cache: the schemas are loaded from disk and refreshed in the
+  background.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_bench --schema-latency 0.5 --runs 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(args):
+    """Build every worker and print the timings as JSON."""
+    from benchmarks import fake_composio
+
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    backend = fake_composio.install(
+        fake_composio.FakeComposioBackend(schema_latency=args.schema_latency)
+    )
+    start = time.perf_counter()
+    from agent_workflow.calendar_workers import calendar_workers_dict
+    from agent_workflow.email_workers import email_workers_dict
+
+    imported = time.perf_counter()
+    for workers in (calendar_workers_dict, email_workers_dict):
+        for name in workers:
+            workers.get(name)
+    built = time.perf_counter()
+    print(
+        json.dumps(
+            {
+                "import_seconds": imported - start,
+                "build_seconds": built - imported,
+                # with a warm cache, these are the background refreshes
+                "composio_calls": backend.calls["toolset"] + backend.calls["action_schemas"],
+            }
+        )
+    )
+
+
+def run(schema_latency: float, cache_dir: str) -> dict:
+    env = {**os.environ, "TOOL_SCHEMA_CACHE_DIR": cache_dir}
+    start = time.perf_counter()
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.startup_bench",
+            "--child",
+            "--schema-latency",
+            str(schema_latency),
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_seconds"] = time.perf_counter() - start
+    return result
+
+
+def main(args):
+    results = {"no cache": [], "cold cache": [], "warm cache": []}
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as directory:
+            results["no cache"].append(run(args.schema_latency, ""))
+            results["cold cache"].append(run(args.schema_latency, directory))
+            results["warm cache"].append(run(args.schema_latency, directory))
+
+    print(f"Composio round trip {args.schema_latency}s, median of {args.runs} runs\n")
+    print(f"{'':12} {'process':>9} {'import':>9} {'build':>9} {'Composio calls':>15}")
+    for name, runs in results.items():
+        print(
+            f"{name:12}"
+            f" {statistics.median(r['process_seconds'] for r in runs):8.2f}s"
+            f" {statistics.median(r['import_seconds'] for r in runs):8.2f}s"
+            f" {statistics.median(r['build_seconds'] for r in runs):8.2f}s"
+            f" {statistics.median(r['composio_calls'] for r in runs):15.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schema-latency", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    child(args) if args.child else main(args)
@@ -0,0 +1,97 @@
+"""Wall time of worker tool steps with several tool calls, without network.
+
+Every step is a `ToolNode` run of an LLM answer with N tool calls against
+the fake Composio tools of `fake_composio`, each call taking
+`--tool-latency` seconds. W workers run a step at the same time, like
+`execute_workers` does. The tool calls run either:
+
+- sequentially, one after the other,
+- on the default thread pool of the event loop, like the plain tools,
+- on the tool threads of `ToolExecutor`.
+
+Run from the repository root:
+
+    python -m benchmarks.tool_executor_bench --tool-latency 0.2 --threads 16
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import ToolNode
+
+from benchmarks import fake_composio
+from agent_workflow.tool_executor import ToolExecutor
+
+ACTION = "GOOGLECALENDAR_FIND_EVENT"
+
+
+def build_node(entity_id: str, executor=None) -> ToolNode:
+    tools = [fake_composio.FakeComposioToolSet()._tool(ACTION, entity_id)]
+    if executor is not None:
+        tools = executor.wrap_tools(tools)
+    return ToolNode(tools)
+
+
+def tool_step(calls: int) -> dict:
+    return {
+        "messages": [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": ACTION, "args": {"timeMin": "2025,03,03,00,00,00"}, "id": f"call-{i}"}
+                    for i in range(calls)
+                ],
+            )
+        ]
+    }
+
+
+async def sequential_step(node: ToolNode, calls: int):
+    for _ in range(calls):
+        await node.ainvoke(tool_step(1))
+
+
+async def measure(mode: str, calls: int, workers: int, args) -> float:
+    executor = ToolExecutor(args.threads, args.timeout) if mode == "tool threads" else None
+    nodes = [build_node(f"entity-{i}", executor) for i in range(workers)]
+    init_time = time.perf_counter()
+    if mode == "sequential":
+        await asyncio.gather(*(sequential_step(node, calls) for node in nodes))
+    else:
+        await asyncio.gather(*(node.ainvoke(tool_step(calls)) for node in nodes))
+    duration = time.perf_counter() - init_time
+    if executor is not None:
+        executor.shutdown()
+    return duration
+
+
+async def main(args):
+    fake_composio.FakeComposioToolSet.backend = fake_composio.FakeComposioBackend(
+        latency=args.tool_latency
+    )
+    print(
+        f"tool latency {args.tool_latency}s, {args.threads} tool threads, "
+        f"{min(32, (os.cpu_count() or 1) + 4)} default pool threads\n"
+    )
+    modes = ("sequential", "default pool", "tool threads")
+    print(f"{'workers x calls':>16}" + "".join(f"{mode:>15}" for mode in modes))
+    for workers in args.workers:
+        for calls in args.calls:
+            durations = [await measure(mode, calls, workers, args) for mode in modes]
+            print(
+                f"{f'{workers} x {calls}':>16}"
+                + "".join(f"{duration:>13.2f} s" for duration in durations)
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    parser.add_argument("--threads", type=int, default=16, help="Tool threads.")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--calls", type=int, nargs="+", default=[1, 4, 8])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+
+from langchain_core.tools import StructuredTool
+
+from agent_workflow.busy_index import (
+    BusyBlock,
+    BusyIndex,
+    IntervalIndex,
+    parse_calendar_datetime,
+)
+
+
+def event(event_id, start, end, **fields):
+    return {
+        "id": event_id,
+        "summary": event_id,
+        "start": {"dateTime": start},
+        "end": {"dateTime": end},
+        **fields,
+    }
+
+
+def test_interval_index_overlap():
+    index = IntervalIndex()
+    day = datetime(2025, 3, 3)
+    index.add(BusyBlock(day, day + timedelta(days=2), "offsite"))
+    index.add(BusyBlock(day.replace(hour=9), day.replace(hour=10), "standup"))
+    index.add(BusyBlock(day.replace(hour=10), day.replace(hour=11), "review"))
+
+    overlapping = index.overlapping(day.replace(hour=9, minute=30), day.replace(hour=10))
+    assert [b.event_id for b in overlapping] == ["offsite", "standup"]
+
+    assert index.remove("offsite")
+    assert not index.remove("offsite")
+    # adjacent blocks do not overlap
+    assert list(index.overlapping(day.replace(hour=11), day.replace(hour=12))) == []
+
+
+def test_parse_calendar_datetime_formats():
+    expected = parse_calendar_datetime("2025-03-03T09:00:00")
+    assert parse_calendar_datetime("2025,03,03,09,00,00") == expected
+    assert parse_calendar_datetime({"dateTime": "2025-03-03T09:00:00"}) == expected
+    assert parse_calendar_datetime("not a date") is None
+
+
+def test_conflict_tool_syncs_once_then_answers_locally():
+    calls = []
+
+    def find_event(**kwargs):
+        calls.append(kwargs)
+        return {
+            "data": {
+                "event_data": {
+                    "event_data": [
+                        event("standup", "2025-03-03T09:00:00+05:00", "2025-03-03T09:30:00+05:00"),
+                        event(
+                            "focus",
+                            "2025-03-03T14:00:00+05:00",
+                            "2025-03-03T16:00:00+05:00",
+                            transparency="transparent",
+                        ),
+                    ]
+                }
+            },
+            "error": None,
+            "successful": True,
+        }
+
+    index = BusyIndex(staleness_seconds=60)
+    find_tool = StructuredTool.from_function(
+        func=find_event, name="GOOGLECALENDAR_FIND_EVENT", description="find"
+    )
+    index.observe_tool(find_tool, "personal")
+    check = index.conflict_tool("personal", find_tool)
+
+    busy = check.func("2025-03-03T09:15:00", "2025-03-03T10:00:00")
+    free = check.func("2025-03-03T14:00:00", "2025-03-03T15:00:00")
+
+    assert len(calls) == 1
+    assert busy["data"]["is_free"] is False
+    assert busy["data"]["conflicts"][0]["event_id"] == "standup"
+    # transparent events do not block the time
+    assert free["data"]["is_free"] is True
+    assert index.stats()["local_queries"] == 1
+
+
+def test_writes_update_the_index():
+    index = BusyIndex()
+    start, end = "2025-03-03T09:00:00+05:00", "2025-03-03T10:00:00+05:00"
+
+    def create_event(**kwargs):
+        return {"data": {"response_data": event("new", start, end)}, "error": None}
+
+    def delete_event(**kwargs):
+        return {"data": {}, "error": None}
+
+    create = StructuredTool.from_function(
+        func=create_event, name="GOOGLECALENDAR_CREATE_EVENT", description="create"
+    )
+    delete = StructuredTool.from_function(
+        func=delete_event, name="GOOGLECALENDAR_DELETE_EVENT", description="delete"
+    )
+    index.observe_tool(create, "work")
+    index.observe_tool(delete, "work")
+    window = (parse_calendar_datetime(start), parse_calendar_datetime(end))
+
+    create.func(summary="new")
+    assert [b.event_id for b in index.conflicts("work", *window)] == ["new"]
+
+    delete.func(event_id="new")
+    assert index.conflicts("work", *window) == []
+
+    create.func(summary="new")
+    index.clear()
+    assert index.stats()["entities"] == {}
+
+
+def test_conflict_tool_errors_when_the_range_is_not_listed():
+    results = [
+        {"data": {}, "error": "Rate limit exceeded", "successful": False},
+        {"data": {"items": [], "nextPageToken": "next"}, "error": None, "successful": True},
+    ]
+
+    def find_event(**kwargs):
+        return results.pop(0)
+
+    index = BusyIndex(staleness_seconds=60)
+    find_tool = StructuredTool.from_function(
+        func=find_event, name="GOOGLECALENDAR_FIND_EVENT", description="find"
+    )
+    index.observe_tool(find_tool, "personal")
+    check = index.conflict_tool("personal", find_tool)
+
+    failed = check.func("2025-03-03T09:00:00", "2025-03-03T10:00:00")
+    assert failed["successful"] is False
+    assert "Rate limit exceeded" in failed["error"]
+    # a truncated listing is not trusted either
+    truncated = check.func("2025-03-03T09:00:00", "2025-03-03T10:00:00")
+    assert truncated["successful"] is False
+    assert "FIND_FREE_SLOTS" in truncated["error"]
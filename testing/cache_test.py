@@ -0,0 +1,80 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytz
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from agent_workflow import date_worker  # noqa: E402
+from agent_workflow.cache import BoundedCache, next_midnight  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bounded_cache_evicts_least_recently_used():
+    cache = BoundedCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_bounded_cache_expires_entries():
+    clock = FakeClock()
+    cache = BoundedCache(max_size=2, clock=clock)
+    cache.set("a", 1, expires_at=1010.0)
+
+    assert cache.get("a") == 1
+    clock.now = 1010.0
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_next_midnight_uses_the_timezone_day():
+    tz = pytz.timezone("Asia/Karachi")
+    now = tz.localize(datetime(2025, 10, 15, 23, 30))
+
+    assert next_midnight(now) == tz.localize(datetime(2025, 10, 16)).timestamp()
+
+
+def test_date_results_are_cached(monkeypatch):
+    calls = []
+
+    class FakeStructuredLLM:
+        async def ainvoke(self, messages, **kwargs):
+            calls.append(messages)
+            return date_worker.DateExtractionResult(
+                start_datetime="2025-12-25T00:00:00+05:00",
+                end_datetime="2025-12-25T23:59:00+05:00",
+            )
+
+    class FakeLLM:
+        def with_structured_output(self, schema, **kwargs):
+            return FakeStructuredLLM()
+
+    monkeypatch.setattr(date_worker, "llm", FakeLLM())
+    monkeypatch.setattr(date_worker, "result_cache", BoundedCache(max_size=8))
+
+    async def main():
+        return [
+            await date_worker.acalculate_date("What about this Christmas?"),
+            await date_worker.acalculate_date("what about   this christmas"),
+        ]
+
+    first, second = asyncio.run(main())
+
+    assert first == second
+    assert len(calls) == 1
+    assert date_worker.date_cache_stats()["result"]["hits"] == 1
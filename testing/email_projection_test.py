@@ -0,0 +1,109 @@
+import base64
+
+from langchain_core.tools import StructuredTool
+
+from agent_workflow.email_projection import EmailProjection, strip_quoted_text
+
+HTML_BODY = (
+    "<html><head><style>p {color: red}</style></head><body>"
+    "<div>Hi Sara,</div><p>The review is moved to <b>Friday&nbsp;10:00</b>.</p>"
+    '<div class="gmail_quote">On Mon, Mar 3, 2025 Sara wrote:'
+    "<blockquote>Can we move the review?</blockquote></div></body></html>"
+)
+
+
+def fetch_emails(**kwargs):
+    return {
+        "successful": True,
+        "error": None,
+        "data": {
+            "messages": [
+                {
+                    "messageId": "m1",
+                    "threadId": "t1",
+                    "subject": "Review",
+                    "sender": "john@example.com",
+                    "labelIds": ["INBOX"],
+                    "messageText": HTML_BODY,
+                    "attachmentList": [{"filename": "agenda.pdf", "attachmentId": "x" * 500}],
+                    "payload": {"parts": [{"body": {"data": "A" * 20000}}]},
+                    "preview": {"body": "Hi Sara", "subject": "Review"},
+                }
+            ],
+            "resultSizeEstimate": 1,
+        },
+    }
+
+
+def test_fetched_messages_are_projected():
+    projection = EmailProjection(count_tokens=lambda text: len(text) // 4)
+    tool = StructuredTool.from_function(
+        func=fetch_emails, name="GMAIL_FETCH_EMAILS", description="Fetch."
+    )
+    projection.wrap_tool(tool)
+
+    result = tool.func()
+    message = result["data"]["messages"][0]
+    assert message == {
+        "messageId": "m1",
+        "threadId": "t1",
+        "subject": "Review",
+        "sender": "john@example.com",
+        "labelIds": ["INBOX"],
+        "messageText": "Hi Sara,\nThe review is moved to Friday 10:00.",
+        "attachmentList": ["agenda.pdf"],
+    }
+    assert result["data"]["resultSizeEstimate"] == 1
+
+    stats = projection.stats()["GMAIL_FETCH_EMAILS"]
+    assert stats["calls"] == 1
+    assert stats["bytes_after"] * 20 < stats["bytes_before"]
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_gmail_api_thread_messages_and_truncation():
+    body = "Line of the update. " * 50 + "\n\nOn Tue, Mar 4, 2025 at 9:00 John\n<john@example.com> wrote:\n> old"
+    encoded = base64.urlsafe_b64encode(body.encode()).decode().rstrip("=")
+    thread = {
+        "successful": True,
+        "data": {
+            "messages": [
+                {
+                    "id": "m2",
+                    "threadId": "t2",
+                    "snippet": "Line of the update.",
+                    "payload": {
+                        "headers": [
+                            {"name": "From", "value": "John <john@example.com>"},
+                            {"name": "Subject", "value": "Update"},
+                            {"name": "Received", "value": "by 10.0.0.1"},
+                        ],
+                        "parts": [
+                            {"mimeType": "text/plain", "body": {"data": encoded}},
+                            {"mimeType": "text/html", "body": {"data": encoded}},
+                        ],
+                    },
+                }
+            ]
+        },
+    }
+    projection = EmailProjection(body_bytes=100, count_tokens=len)
+
+    message = projection.project("GMAIL_FETCH_MESSAGE_BY_THREAD_ID", thread)["data"]["messages"][0]
+    assert message["sender"] == "John <john@example.com>"
+    assert message["subject"] == "Update"
+    assert "payload" not in message and "Received" not in str(message)
+    assert message["messageText"].startswith("Line of the update.")
+    assert message["messageText"].endswith("more bytes]")
+    assert "wrote" not in message["messageText"]
+
+    # errors are left to the worker
+    error = {"successful": False, "data": None, "error": "invalid thread id"}
+    assert projection.project("GMAIL_FETCH_MESSAGE_BY_THREAD_ID", error) is error
+
+
+def test_strip_quoted_text():
+    assert strip_quoted_text("Sure!\n\n> Can we meet?\n> Thanks") == "Sure!"
+    assert strip_quoted_text("See below.\n-----Original Message-----\nFrom: a") == "See below."
+    # a message that only quotes is kept whole
+    assert strip_quoted_text("> quoted") == "> quoted"
@@ -0,0 +1,29 @@
+import asyncio
+
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+
+from benchmarks.fake_llm_server import SCENARIOS, FakeLLMServer
+
+
+class OrchestratorRouterList(BaseModel):
+    managers: list[dict]
+
+
+def test_fake_server_scripts_structured_outputs():
+    async def main():
+        server = FakeLLMServer(scenario=SCENARIOS["email"], latency=0)
+        base_url = await server.start()
+        try:
+            llm = ChatOpenAI(model="fake", api_key="fake", base_url=base_url)
+            routing = await llm.with_structured_output(OrchestratorRouterList).ainvoke("hi")
+            chunks = [chunk.content async for chunk in llm.astream("hi")]
+        finally:
+            await server.stop()
+        return server, routing, chunks
+
+    server, routing, chunks = asyncio.run(main())
+
+    assert routing.managers[0]["route_manager"] == "email_manage"
+    assert "".join(chunks) == SCENARIOS["email"].answer
+    assert server.calls == {"OrchestratorRouterList": 1, "text": 1}
@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+
+from agent_workflow import orchestrator  # noqa: E402
+from agent_workflow.fast_path import ANSWERS, FastPath, IntentClassifier  # noqa: E402
+from agent_workflow.schemas import OrchestratorRouterList  # noqa: E402
+
+
+def test_classifier_intents():
+    classifier = IntentClassifier()
+
+    assert classifier.classify("Hi there!").name == "greeting"
+    assert classifier.classify("thanks a lot 🙏").confidence == 1.0
+    assert classifier.classify("Hey, what can you do?").name == "help"
+    assert classifier.classify("good night").name == "goodbye"
+
+    # requests with a task are left to the orchestrator
+    assert classifier.classify("thanks, now book a room for tomorrow").confidence < 0.8
+    assert classifier.classify("help me schedule a call with John").confidence < 0.8
+    assert classifier.classify("What's on my calendar?").name is None
+    assert classifier.classify("hi " * 10).name is None
+    # acknowledgements usually answer a question of the assistant
+    for text in ("ok", "okay please", "perfect", "great, now", "ok then", "later"):
+        assert classifier.classify(text).name is None
+
+
+class FakeLLM:
+    def with_structured_output(self, schema, **kwargs):
+        return self
+
+    async def ainvoke(self, input, **kwargs):
+        if isinstance(input, list) and "route" in str(input[0].content).lower():
+            return OrchestratorRouterList(managers=[])
+        return AIMessage(content="You said hi before.")
+
+
+def test_fast_path_answers_into_the_checkpoint(monkeypatch):
+    monkeypatch.setattr(orchestrator, "llm", FakeLLM())
+    monkeypatch.setattr(orchestrator, "llm_orchestrator", FakeLLM())
+    graph = orchestrator.orchestrator_builder.compile(checkpointer=MemorySaver())
+    fast_path = FastPath(IntentClassifier())
+    config = {"configurable": {"thread_id": "user_a"}}
+
+    async def main():
+        answer = await fast_path.try_answer(graph, "hello!", config)
+        skipped = await fast_path.try_answer(graph, "what did I say?", config)
+        state = await graph.aget_state(config)
+        # the next run goes through the graph on top of the fast path answer
+        response = await graph.ainvoke({"user_input": "what did I say?"}, config)
+        # the answer to a question of the assistant goes to the graph
+        await graph.aupdate_state(
+            config,
+            {"messages": [AIMessage(content="Should I book it for **3 PM?**")]},
+            as_node="orchestrator_output",
+        )
+        reply = await fast_path.try_answer(graph, "thanks!", config)
+        await graph.aupdate_state(
+            config,
+            {"messages": [AIMessage(content="Your call is booked for 3 PM.")]},
+            as_node="orchestrator_output",
+        )
+        thanks = await fast_path.try_answer(graph, "thanks!", config)
+        return answer, skipped, state, response, reply, thanks
+
+    answer, skipped, state, response, reply, thanks = asyncio.run(main())
+
+    assert answer == ANSWERS["greeting"]
+    assert skipped is None
+    assert state.next == ()
+    assert [m.type for m in state.values["messages"]] == ["human", "ai"]
+    assert [m.type for m in response["messages"]] == ["human", "ai", "human", "ai"]
+    assert reply is None
+    assert thanks == ANSWERS["thanks"]
+    assert fast_path.stats() == {
+        "requests": 4,
+        "answered": {"greeting": 1, "thanks": 1},
+        "share": 2 / 4,
+    }
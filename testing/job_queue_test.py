@@ -0,0 +1,287 @@
+import asyncio
+import os
+import time
+import uuid
+
+import psycopg
+import pytest
+from langchain_core.messages import AIMessage
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from agent_workflow.job_queue import (
+    JOBS_CHANNEL,
+    RESULTS_CHANNEL,
+    Job,
+    JobExecutor,
+    JobQueue,
+    JobResult,
+    ResultDispatcher,
+)
+
+POSTGRES_DB_URI = os.getenv("POSTGRES_DB_URI")
+
+
+class MemoryQueue:
+    """The `JobQueue` interface over a list, without Postgres."""
+
+    lease_seconds = 30
+    poll_interval_seconds = 0.01
+
+    def __init__(self, max_attempts=2):
+        self.max_attempts = max_attempts
+        self.jobs = []
+
+    async def enqueue(self, thread_id, user_input, gateway, reply_to):
+        self.jobs.append(
+            {
+                "id": len(self.jobs) + 1,
+                "thread_id": thread_id,
+                "user_input": user_input,
+                "gateway": gateway,
+                "reply_to": reply_to,
+                "status": "queued",
+                "attempts": 0,
+                "executor": None,
+                "answer": None,
+                "error": None,
+                "delivered": False,
+            }
+        )
+        return len(self.jobs)
+
+    async def claim(self, executor):
+        busy = set()
+        for job in self.jobs:
+            if job["status"] == "queued" and job["thread_id"] not in busy:
+                job.update(status="running", executor=executor, attempts=job["attempts"] + 1)
+                return Job(job["id"], job["thread_id"], job["user_input"], job["attempts"])
+            if job["status"] in ("queued", "running"):
+                busy.add(job["thread_id"])
+        return None
+
+    async def heartbeat(self, job_ids, executor):
+        pass
+
+    async def requeue_expired(self):
+        return 0
+
+    async def complete(self, job_id, executor, answer):
+        self.jobs[job_id - 1].update(status="done", answer=answer)
+        return True
+
+    async def fail(self, job_id, executor, error):
+        self.jobs[job_id - 1].update(status="failed", error=error)
+        return True
+
+    async def claim_results(self, gateway, limit=50):
+        results = []
+        for job in self.jobs:
+            if job["gateway"] == gateway and job["status"] in ("done", "failed") and not job["delivered"]:
+                job["delivered"] = True
+                results.append(
+                    JobResult(job["id"], job["thread_id"], job["status"], job["answer"], job["error"], job["reply_to"])
+                )
+        return results
+
+    async def wait(self, channel):
+        await asyncio.sleep(self.poll_interval_seconds)
+
+    async def prune(self, keep_seconds):
+        return 0
+
+    async def close(self):
+        pass
+
+
+class FakeGraph:
+    def __init__(self):
+        self.runs = []
+        self.running = set()
+        self.overlaps = 0
+
+    async def ainvoke(self, state, config):
+        thread_id = config["configurable"]["thread_id"]
+        self.overlaps += thread_id in self.running
+        self.running.add(thread_id)
+        self.runs.append((thread_id, state["user_input"]))
+        await asyncio.sleep(0.02)
+        self.running.discard(thread_id)
+        if state["user_input"] == "boom":
+            raise RuntimeError("tool failed")
+        return {"messages": [AIMessage(content=f"answer to {state['user_input']}")]}
+
+
+def test_executors_run_the_jobs_and_the_gateway_gets_the_answers():
+    async def main():
+        queue = MemoryQueue()
+        graph = FakeGraph()
+        delivered = []
+
+        async def deliver(result):
+            delivered.append(result)
+
+        # a result of a previous gateway process nobody waits for
+        await queue.enqueue("carol", "old", "discord", {"channel_id": 3})
+        queue.jobs[0].update(status="done", answer="old answer")
+
+        dispatcher = ResultDispatcher(queue, "discord", deliver)
+        dispatcher.start()
+        jobs = [
+            await dispatcher.submit(thread_id, text, {"channel_id": 1})
+            for thread_id, text in [("alice", "a1"), ("bob", "b1"), ("alice", "a2"), ("bob", "boom")]
+        ]
+        executors = [JobExecutor(queue, graph, concurrency=2, name=f"executor-{i}") for i in range(2)]
+        runs = [asyncio.create_task(executor.run()) for executor in executors]
+
+        results = [await asyncio.wait_for(dispatcher.wait(job_id), 5) for job_id in jobs]
+        for executor in executors:
+            executor.stop()
+        await asyncio.gather(*runs)
+        await dispatcher.stop()
+        return graph, results, delivered, executors
+
+    graph, results, delivered, executors = asyncio.run(main())
+
+    assert [(r.status, r.answer) for r in results[:3]] == [
+        ("done", "answer to a1"),
+        ("done", "answer to b1"),
+        ("done", "answer to a2"),
+    ]
+    # failed runs are reported, not run again
+    assert (results[3].status, results[3].error) == ("failed", "tool failed")
+    assert graph.runs.count(("bob", "boom")) == 1
+    # the requests of a thread ran one at a time and in order
+    assert graph.overlaps == 0
+    assert [text for thread_id, text in graph.runs if thread_id == "alice"] == ["a1", "a2"]
+    assert [(r.thread_id, r.answer) for r in delivered] == [("carol", "old answer")]
+    assert sum(e.stats()["completed"] for e in executors) == 3
+    assert sum(e.stats()["failed"] for e in executors) == 1
+
+
+def test_late_results_are_delivered_after_the_wait_times_out():
+    async def main():
+        queue = MemoryQueue()
+        delivered = []
+
+        async def deliver(result):
+            delivered.append(result)
+
+        dispatcher = ResultDispatcher(queue, "discord", deliver)
+        job_id = await dispatcher.submit("alice", "a1", {"channel_id": 1})
+        timed_out = False
+        try:
+            await dispatcher.wait(job_id, timeout=0.01)
+        except asyncio.TimeoutError:
+            timed_out = True
+        await queue.claim("executor")
+        await queue.complete(job_id, "executor", "late answer")
+        await dispatcher.dispatch_once()
+        return timed_out, delivered
+
+    timed_out, delivered = asyncio.run(main())
+
+    assert timed_out
+    assert [result.answer for result in delivered] == ["late answer"]
+
+
+class FakeFastPath:
+    async def try_answer(self, graph, text, config):
+        return "Hello!" if text == "hi" else None
+
+
+def test_executors_answer_the_fast_path_in_thread_order():
+    async def main():
+        queue = MemoryQueue()
+        graph = FakeGraph()
+        first = await queue.enqueue("alice", "a1", "discord", {"channel_id": 1})
+        second = await queue.enqueue("alice", "hi", "discord", {"channel_id": 1})
+        executor = JobExecutor(queue, graph, concurrency=2, fast_path=FakeFastPath())
+        run = asyncio.create_task(executor.run())
+        while any(job["status"] != "done" for job in queue.jobs):
+            await asyncio.sleep(0.01)
+        executor.stop()
+        await run
+        return graph, [queue.jobs[job_id - 1]["answer"] for job_id in (first, second)]
+
+    graph, answers = asyncio.run(main())
+
+    assert answers == ["answer to a1", "Hello!"]
+    assert graph.runs == [("alice", "a1")]
+
+
+@pytest.mark.skipif(not POSTGRES_DB_URI, reason="POSTGRES_DB_URI is not set")
+def test_postgres_claims_in_thread_order_and_requeues_expired_leases():
+    schema = f"job_queue_test_{uuid.uuid4().hex[:8]}"
+
+    async def main():
+        async with await psycopg.AsyncConnection.connect(POSTGRES_DB_URI, autocommit=True) as conn:
+            await conn.execute(f"CREATE SCHEMA {schema}")
+        pool = AsyncConnectionPool(
+            POSTGRES_DB_URI,
+            max_size=4,
+            kwargs={
+                "autocommit": True,
+                "row_factory": dict_row,
+                "options": f"-c search_path={schema}",
+            },
+            open=False,
+        )
+        await pool.open()
+        try:
+            queue = JobQueue(pool, lease_seconds=0.2, max_attempts=2)
+            await queue.setup()
+            a1 = await queue.enqueue("alice", "a1", "discord", {"channel_id": 1})
+            a2 = await queue.enqueue("alice", "a2", "discord", {"channel_id": 1})
+            b1 = await queue.enqueue("bob", "b1", "discord", {"channel_id": 2})
+
+            # concurrent claims skip the locked rows and the busy threads
+            claimed = await asyncio.gather(*(queue.claim(f"executor-{i}") for i in range(3)))
+            assert sorted(job.id for job in claimed if job) == [a1, b1]
+            executors = {job.id: f"executor-{i}" for i, job in enumerate(claimed) if job}
+
+            assert await queue.complete(a1, executors[a1], "answer 1")
+            assert await queue.fail(b1, executors[b1], "tool failed")
+            # bob's request is not run again
+            job = await queue.claim("executor-0")
+            assert (job.id, job.attempts) == (a2, 1)
+            assert await queue.claim("executor-1") is None
+
+            # the executor of a2 stops renewing its lease
+            await asyncio.sleep(0.3)
+            assert await queue.requeue_expired() == 1
+            job = await queue.claim("executor-1")
+            assert (job.id, job.attempts) == (a2, 2)
+            assert not await queue.complete(a2, "executor-0", "stale answer")
+            assert await queue.complete(a2, "executor-1", "answer 2")
+
+            results = await queue.claim_results("discord")
+            assert [(r.id, r.status, r.answer) for r in results] == [
+                (a1, "done", "answer 1"),
+                (a2, "done", "answer 2"),
+                (b1, "failed", None),
+            ]
+            assert results[2].reply_to == {"channel_id": 2}
+            assert await queue.claim_results("discord") == []
+
+            # one LISTEN connection wakes up on every channel waited on
+            listener = JobQueue(pool, conninfo=POSTGRES_DB_URI, poll_interval_seconds=5)
+
+            async def notify(channel):
+                await asyncio.sleep(0.5)
+                async with pool.connection() as conn:
+                    await conn.execute("SELECT pg_notify(%s, '')", (channel,))
+
+            try:
+                for channel in (JOBS_CHANNEL, RESULTS_CHANNEL):
+                    init_time = time.perf_counter()
+                    await asyncio.gather(listener.wait(channel), notify(channel))
+                    assert time.perf_counter() - init_time < 2
+            finally:
+                await listener.close()
+        finally:
+            await pool.close()
+            async with await psycopg.AsyncConnection.connect(POSTGRES_DB_URI, autocommit=True) as conn:
+                await conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+    asyncio.run(main())
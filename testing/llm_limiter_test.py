@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from langchain_openai import ChatOpenAI
+
+from agent_workflow.llm_limiter import LLMLimiter
+from benchmarks.fake_llm_server import FakeLLMServer
+
+
+def test_concurrency_backs_off_on_429s():
+    async def main():
+        server = FakeLLMServer(latency=0.05, token_latency=0, max_concurrency=2)
+        base_url = await server.start()
+        limiter = LLMLimiter(initial_concurrency=8)
+        llms = [
+            ChatOpenAI(
+                model="fake",
+                api_key="fake",
+                base_url=base_url,
+                http_client=limiter.http_client(),
+                http_async_client=limiter.http_async_client(),
+            )
+            for _ in range(2)
+        ]
+
+        async def stream(llm):
+            return "".join([chunk.content async for chunk in llm.astream("hi")])
+
+        try:
+            answers = await asyncio.gather(
+                *(llms[i % 2].ainvoke("hi") for i in range(12)), stream(llms[0])
+            )
+        finally:
+            await server.stop()
+        return server, limiter, answers
+
+    server, limiter, answers = asyncio.run(main())
+
+    assert len(answers) == 13 and answers[-1] == server.scenario.answer
+    stats = limiter.stats()
+    assert 0 < stats["throttled"] == server.throttled
+    assert stats["decreases"] >= 1 and stats["concurrency"] < 8
+    assert stats["max_queue_depth"] > 0
+    # every slot was freed, the streamed answer included
+    assert (stats["in_flight"], stats["queue_depth"]) == (0, 0)
+
+
+def test_requests_per_minute_are_paced():
+    limiter = LLMLimiter(requests_per_minute=600, burst_seconds=0.1)
+
+    async def main():
+        async def request():
+            started_at = await limiter.aacquire()
+            limiter.release(started_at, latency=0.01)
+
+        init_time = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(5)))
+        return time.perf_counter() - init_time
+
+    # one request at once, then one every 0.1s
+    assert asyncio.run(main()) >= 0.35
+    stats = limiter.stats()
+    assert stats["requests"] == 5 and stats["max_queue_depth"] >= 4
+    assert stats["max_wait_seconds"] >= 0.35
@@ -0,0 +1,131 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from langchain_core.tools import StructuredTool
+
+from agent_workflow import mail_mirror
+from agent_workflow.mail_mirror import MailMirror, fts_query
+
+
+def message(message_id, subject, sender, timestamp, labels=("INBOX",)):
+    return {
+        "messageId": message_id,
+        "threadId": f"thread-{message_id}",
+        "subject": subject,
+        "sender": sender,
+        "messageText": f"Body of {subject}",
+        "messageTimestamp": timestamp,
+        "labelIds": list(labels),
+    }
+
+
+def test_fts_query_quotes_words():
+    assert fts_query('invoice "due" OR march-2024') == '"invoice" "due" "OR" "march" "2024"'
+
+
+def test_search_filters_and_orders_by_date(tmp_path):
+    mirror = MailMirror(str(tmp_path / "mirror.db"))
+    mirror.ingest(
+        "personal",
+        [
+            message("1", "Invoice for March", "billing@acme.com", "2024-03-02T10:00:00Z"),
+            message("2", "Invoice for April", "billing@acme.com", "2024-04-02T10:00:00Z"),
+            message("3", "Lunch on Friday", "friend@mail.com", "2024-04-03T10:00:00Z", ("STARRED",)),
+        ],
+    )
+    mirror.ingest("work", [message("4", "Invoice review", "boss@corp.com", "2024-04-04T10:00:00Z")])
+
+    assert [hit["message_id"] for hit in mirror.search("personal", "invoices")] == ["2", "1"]
+    assert [hit["message_id"] for hit in mirror.search("personal", label="starred")] == ["3"]
+    after_march = mirror.search("personal", "invoice", after=1711929600)
+    assert [hit["message_id"] for hit in after_march] == ["2"]
+    assert mirror.search("personal", sender="boss") == []
+
+    # updates replace the indexed text
+    mirror.ingest("personal", [message("1", "Receipt", "billing@acme.com", "2024-03-02T10:00:00Z")])
+    assert [hit["message_id"] for hit in mirror.search("personal", "invoice")] == ["2"]
+    assert mirror.count("personal") == 3
+
+
+def fake_gmail(mailbox):
+    """GMAIL_FETCH_EMAILS over `mailbox`, (timestamp, message) pairs."""
+    queries = []
+
+    def fetch_emails(query=None, max_results=10, page_token=None):
+        queries.append(query)
+        operator, _, value = (query or "").partition(":")
+        matching = sorted(
+            (
+                (timestamp, message)
+                for timestamp, message in mailbox
+                if (operator != "after" or timestamp > int(value))
+                and (operator != "before" or timestamp < int(value))
+            ),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        offset = int(page_token or 0)
+        page = [message for _, message in matching[offset : offset + max_results]]
+        next_token = str(offset + max_results) if offset + max_results < len(matching) else None
+        return {
+            "data": {"messages": page, "nextPageToken": next_token},
+            "error": None,
+            "successful": True,
+        }
+
+    return fetch_emails, queries
+
+
+def dated(message_id, timestamp):
+    iso = datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+    return timestamp, message(message_id, f"Subject {message_id}", "a@b.com", iso)
+
+
+def test_sync_backfills_and_never_skips_mail(tmp_path):
+    now = int(time.time())
+    mailbox = [dated(f"old-{i}", now - 3600 * (i + 1)) for i in range(5)]
+    fetch_emails, queries = fake_gmail(mailbox)
+    mirror = MailMirror(str(tmp_path / "mirror.db"), sync_interval_seconds=60, sync_max_messages=3)
+    search = mirror.search_tool("personal", fetch_emails)
+
+    first = search.func(query="subject", limit=50)["data"]
+    assert len(first["messages"]) == 3
+    assert not first["complete"] and "GMAIL_FETCH_EMAILS" in first["note"]
+    # the oldest of the 3 newest messages
+    assert first["mirrored_since"] == first["messages"][-1]["date"]
+    # within the sync interval
+    search.func(query="subject")
+    assert len(queries) == 2
+
+    # a worker fetch of the latest email does not skip the one before it
+    mailbox += [dated("new-1", now + 100), dated("new-2", now + 200)]
+    observed = StructuredTool.from_function(
+        func=lambda **kwargs: fetch_emails(max_results=1), name="GMAIL_FETCH_EMAILS", description="x"
+    )
+    mirror.observe_tool(observed, "personal")
+    observed.func()
+    assert mirror.count("personal") == 4
+
+    mirror.sync("personal", fetch_emails, force=True)
+    assert mirror.count("personal") == 6
+    assert not mirror.coverage("personal")["complete"]
+    mirror.sync("personal", fetch_emails, force=True)
+    assert mirror.count("personal") == 7
+    assert mirror.coverage("personal") == {"complete": True, "mirrored_since": None}
+
+    mailbox.append(dated("new-3", now + 300))
+    assert mirror.sync("personal", fetch_emails, force=True) == 1
+    assert queries[-1] == f"after:{now + 200}"
+
+
+def test_search_tool_dates_are_in_the_configured_timezone(tmp_path):
+    mirror = MailMirror(str(tmp_path / "mirror.db"))
+    mirror.ingest("personal", [message("1", "Invoice", "billing@acme.com", "2024-04-02T10:00:00Z")])
+    fetch_emails, _ = fake_gmail([])
+    search = mirror.search_tool("personal", fetch_emails)
+
+    received = datetime(2024, 4, 2, 10, tzinfo=timezone.utc).astimezone(mail_mirror.timezone)
+    local = received.replace(tzinfo=None)
+    hits = search.func(after_date=(local - timedelta(minutes=30)).isoformat())["data"]["messages"]
+    assert [hit["date"] for hit in hits] == [received.isoformat()]
+    assert search.func(after_date=(local + timedelta(minutes=30)).isoformat())["data"]["messages"] == []
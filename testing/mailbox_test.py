@@ -0,0 +1,47 @@
+import asyncio
+
+from agent_workflow.mailbox import ConversationMailbox, coalesce_messages
+
+
+def test_coalesce_messages_drops_duplicates():
+    texts = ["hi", "show my calendar", "Show  my calendar ", "for tomorrow"]
+
+    assert coalesce_messages(texts) == "hi\nshow my calendar\nfor tomorrow"
+
+
+def test_bursts_are_coalesced_and_runs_serialized():
+    batches = []
+    running = set()
+    overlaps = []
+
+    async def handler(thread_id, items):
+        if thread_id in running:
+            overlaps.append(thread_id)
+        running.add(thread_id)
+        await asyncio.sleep(0.05)
+        batches.append((thread_id, items))
+        running.discard(thread_id)
+
+    async def main():
+        mailbox = ConversationMailbox(
+            handler, debounce_seconds=0.05, max_wait_seconds=0.5
+        )
+        for text in ("a1", "a2", "a3"):
+            mailbox.submit("user_a", text)
+            await asyncio.sleep(0.01)
+        mailbox.submit("user_b", "b1")
+        # arrives while the first batch of user_a is running
+        await asyncio.sleep(0.08)
+        mailbox.submit("user_a", "a4")
+        await mailbox.drain()
+        return mailbox
+
+    mailbox = asyncio.run(main())
+
+    assert sorted(batches) == [
+        ("user_a", ["a1", "a2", "a3"]),
+        ("user_a", ["a4"]),
+        ("user_b", ["b1"]),
+    ]
+    assert overlaps == []
+    assert mailbox.stats()["coalesced"] == 2
@@ -0,0 +1,258 @@
+import asyncio
+import os
+import time
+
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+
+from agent_workflow import date_worker, orchestrator  # noqa: E402
+from agent_workflow.schemas import (  # noqa: E402
+    CalendarRouter,
+    CalendarRouterList,
+    EmailRouterList,
+    OrchestratorPlan,
+    OrchestratorRouter,
+    OrchestratorRouterList,
+    PlannedManager,
+)
+from agent_workflow.worker_registry import WorkerRegistry  # noqa: E402
+
+LLM_DELAY = 0.2
+
+
+class SlowFakeLLM:
+    """Chat model stand-in whose calls only complete after `LLM_DELAY`."""
+
+    def __init__(self, structured_output=None, managers=()):
+        self.structured_output = structured_output
+        self.managers = list(managers)
+
+    def with_structured_output(self, schema, **kwargs):
+        return SlowFakeLLM(structured_output=schema, managers=self.managers)
+
+    def invoke(self, input, **kwargs):
+        time.sleep(LLM_DELAY)
+        return self._response()
+
+    async def ainvoke(self, input, **kwargs):
+        await asyncio.sleep(LLM_DELAY)
+        return self._response()
+
+    def _response(self):
+        if self.structured_output is OrchestratorRouterList:
+            return OrchestratorRouterList(managers=self.managers)
+        if self.structured_output in (CalendarRouterList, EmailRouterList):
+            return self.structured_output(workers=[])
+        if self.structured_output is date_worker.DateExtractionResult:
+            return date_worker.DateExtractionResult(
+                start_datetime="2025-03-01T00:00:00+05:00",
+                end_datetime="2025-03-01T23:59:00+05:00",
+            )
+        return AIMessage(content="Hello!")
+
+
+def test_concurrent_graph_runs_overlap(monkeypatch):
+    monkeypatch.setattr(orchestrator, "llm", SlowFakeLLM())
+    monkeypatch.setattr(orchestrator, "llm_orchestrator", SlowFakeLLM())
+    graph = orchestrator.orchestrator_builder.compile(checkpointer=MemorySaver())
+
+    async def run(thread_id):
+        return await graph.ainvoke(
+            {"user_input": "Hello there!"},
+            {"configurable": {"thread_id": thread_id}},
+        )
+
+    async def main():
+        init_time = time.perf_counter()
+        responses = await asyncio.gather(run("user_a"), run("user_b"))
+        return responses, time.perf_counter() - init_time
+
+    responses, duration = asyncio.run(main())
+
+    # every run makes two sequential LLM calls (routing and output), so two
+    # runs blocking the loop would take at least 4 * LLM_DELAY
+    assert duration < 3 * LLM_DELAY
+    assert [r["messages"][-1].content for r in responses] == ["Hello!", "Hello!"]
+
+
+def test_concurrent_date_calculations_overlap(monkeypatch):
+    monkeypatch.setattr(date_worker, "llm", SlowFakeLLM())
+
+    async def main():
+        init_time = time.perf_counter()
+        answers = await asyncio.gather(
+            # expressions the local parser leaves to the LLM
+            date_worker.acalculate_date("this Christmas"),
+            date_worker.acalculate_date("next summer"),
+        )
+        return answers, time.perf_counter() - init_time
+
+    answers, duration = asyncio.run(main())
+
+    assert duration < 2 * LLM_DELAY
+    assert all(answer.startswith("The requested date range") for answer in answers)
+
+
+def router(route_manager, depends_on=None):
+    return OrchestratorRouter(
+        route_manager=route_manager, query="tomorrow", depends_on=depends_on
+    )
+
+
+def test_manager_dependencies():
+    manager_list = [
+        router("date_manage"),
+        router("email_manage", depends_on=[]),
+        router("calendar_manage", depends_on=[0, 5]),
+        router("email_manage"),
+    ]
+
+    # a manager without dependencies runs alongside the date manager
+    assert orchestrator.ready_managers(manager_list, set()) == [0, 1]
+    # dependencies on later managers are dropped
+    assert orchestrator.ready_managers(manager_list, {0}) == [1, 2]
+    # no explicit dependencies means depending on every previous manager
+    assert orchestrator.ready_managers(manager_list, {0, 1}) == [2]
+    assert orchestrator.ready_managers(manager_list, {0, 1, 2}) == [3]
+
+
+def test_independent_managers_run_concurrently(monkeypatch):
+    managers = [
+        router("email_manage", depends_on=[]),
+        router("calendar_manage", depends_on=[]),
+    ]
+    monkeypatch.setattr(orchestrator, "llm", SlowFakeLLM())
+    monkeypatch.setattr(orchestrator, "llm_orchestrator", SlowFakeLLM(managers=managers))
+    graph = orchestrator.orchestrator_builder.compile(checkpointer=MemorySaver())
+
+    async def main():
+        init_time = time.perf_counter()
+        response = await graph.ainvoke(
+            {"user_input": "summarize my inbox and show my calendar"},
+            {"configurable": {"thread_id": "user_a"}},
+        )
+        return response, time.perf_counter() - init_time
+
+    response, duration = asyncio.run(main())
+
+    # routing, output and 3 calls per manager: 8 delays in sequence, 5 when
+    # the managers overlap
+    assert duration < 7 * LLM_DELAY
+    assert [r["route_manager"] for r in response["manager_response"]] == [
+        "email_manage",
+        "calendar_manage",
+    ]
+    assert all(r["answer"] == "Hello!" for r in response["manager_response"])
+
+
+def test_planner_mode_skips_manager_routing(monkeypatch):
+    plan = OrchestratorPlan(
+        managers=[
+            PlannedManager(route_manager="date_manage", query="tomorrow"),
+            PlannedManager(
+                route_manager="calendar_manage",
+                query="List my events tomorrow.",
+                calendar_workers=[
+                    CalendarRouter(name="personal_calendar", task="List the events.")
+                ],
+            ),
+        ]
+    )
+    state = {
+        "manager_list": plan.managers,
+        "manager_response": [
+            {"route_manager": "date_manage", "id": 0, "answer": "March 3, 2025"},
+            orchestrator.manager_entry(plan.managers[1], 1),
+        ],
+    }
+
+    routed = orchestrator.planned_workers(state, "calendar_workers", CalendarRouterList)
+    assert [worker.name for worker in routed.workers] == ["personal_calendar"]
+    # the date range reaches the worker with its task
+    assert "date_manage: March 3, 2025" in routed.workers[0].task
+    assert "calendar_workers" not in state["manager_response"][1]
+    assert orchestrator.planned_workers(state, "email_workers", EmailRouterList) is None
+
+    structured_outputs = []
+
+    class PlannerFakeLLM(SlowFakeLLM):
+        def with_structured_output(self, schema, **kwargs):
+            structured_outputs.append(schema)
+            return PlannerFakeLLM(structured_output=schema)
+
+        def _response(self):
+            if self.structured_output is OrchestratorPlan:
+                return OrchestratorPlan(
+                    managers=[
+                        PlannedManager(
+                            route_manager="email_manage", query="inbox", email_workers=[]
+                        )
+                    ]
+                )
+            return super()._response()
+
+    monkeypatch.setattr(orchestrator, "ORCHESTRATOR_MODE", "planner")
+    monkeypatch.setattr(orchestrator, "llm", PlannerFakeLLM())
+    monkeypatch.setattr(orchestrator, "llm_orchestrator", PlannerFakeLLM())
+    graph = orchestrator.orchestrator_builder.compile(checkpointer=MemorySaver())
+    response = asyncio.run(
+        graph.ainvoke({"user_input": "inbox?"}, {"configurable": {"thread_id": "user_a"}})
+    )
+
+    assert structured_outputs == [OrchestratorPlan]
+    assert response["manager_response"][0]["answer"] == "Hello!"
+
+
+def test_single_worker_answer_skips_feedback_and_output(monkeypatch):
+    class FakeWorker:
+        async def ainvoke(self, input, **kwargs):
+            return {"workers_messages": [AIMessage(content="You have 2 events tomorrow.")]}
+
+    class CountingFakeLLM(SlowFakeLLM):
+        calls = 0
+
+        def with_structured_output(self, schema, **kwargs):
+            return CountingFakeLLM(structured_output=schema)
+
+        async def ainvoke(self, input, **kwargs):
+            CountingFakeLLM.calls += 1
+            if self.structured_output is OrchestratorPlan:
+                return OrchestratorPlan(
+                    managers=[
+                        PlannedManager(
+                            route_manager="calendar_manage",
+                            query="List my events tomorrow.",
+                            calendar_workers=[
+                                CalendarRouter(name="personal_calendar", task="List the events.")
+                            ],
+                        )
+                    ]
+                )
+            return await super().ainvoke(input, **kwargs)
+
+    monkeypatch.setattr(orchestrator, "ORCHESTRATOR_MODE", "planner")
+    monkeypatch.setattr(
+        orchestrator,
+        "calendar_workers_dict",
+        WorkerRegistry({"personal_calendar": FakeWorker}),
+    )
+    monkeypatch.setattr(orchestrator, "llm", CountingFakeLLM())
+    monkeypatch.setattr(orchestrator, "llm_orchestrator", CountingFakeLLM())
+    graph = orchestrator.orchestrator_builder.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "user_a"}}
+    response = asyncio.run(graph.ainvoke({"user_input": "tomorrow?"}, config))
+
+    # only the planner call, the worker answer is passed through as is
+    assert CountingFakeLLM.calls == 1
+    assert response["messages"][-1].content == "You have 2 events tomorrow."
+    assert response["skipped_hops"] == 2
+
+    monkeypatch.setattr(orchestrator, "PASS_THROUGH", False)
+    response = asyncio.run(graph.ainvoke({"user_input": "tomorrow?"}, config))
+
+    assert CountingFakeLLM.calls == 4
+    assert response["messages"][-1].content == "Hello!"
+    assert response["skipped_hops"] == 0
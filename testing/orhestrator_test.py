@@ -1,16 +1,19 @@
 import asyncio
-from agent_workflow.orchestrator import init_orchestrator
+from agent_workflow.runtime import OrchestratorRuntime
 
 async def main():
-    orchestrator_graph = await init_orchestrator()
+    runtime = await OrchestratorRuntime().start()
 
     config = {"configurable": {"thread_id": "testing_state_graph3.44"}}
 
-    response = await orchestrator_graph.ainvoke(
-        {"user_input": "Hello there!"},
-        config
-    )
-    print(response["messages"][-1].content)
+    try:
+        response = await runtime.graph.ainvoke(
+            {"user_input": "Hello there!"},
+            config
+        )
+        print(response["messages"][-1].content)
+    finally:
+        await runtime.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,155 @@
+import asyncio
+import operator
+import os
+import uuid
+from typing import Annotated
+
+import psycopg
+import pytest
+from langgraph.graph import START, END, StateGraph
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from typing_extensions import TypedDict
+
+from agent_workflow.database import PostgresSaverCustom, SqliteSaverCustom
+from agent_workflow.retention import CheckpointRetention
+
+POSTGRES_DB_URI = os.getenv("POSTGRES_DB_URI")
+
+
+class CounterState(TypedDict):
+    count: Annotated[int, operator.add]
+
+
+class ItemsState(TypedDict):
+    # lists are stored in the blobs by the Postgres checkpointer
+    items: Annotated[list, operator.add]
+
+
+def build_graph(checkpointer, state, update):
+    builder = StateGraph(state)
+    builder.add_node("first", lambda state: update)
+    builder.add_node("second", lambda state: update)
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+async def count_rows(conn, table, thread_id):
+    async with conn.execute(
+        f"SELECT count(*) FROM {table} WHERE thread_id = ?", (thread_id,)
+    ) as cursor:
+        return (await cursor.fetchone())[0]
+
+
+def test_sqlite_retention_keeps_the_latest_checkpoints(tmp_path):
+    async def run():
+        checkpointer, conn = await SqliteSaverCustom.from_path(str(tmp_path / "cp.db"))
+        await checkpointer.setup()
+        graph = build_graph(checkpointer, CounterState, {"count": 1})
+        for thread_id, messages in (("alice", 5), ("bob", 1)):
+            config = {"configurable": {"thread_id": thread_id}}
+            for _ in range(messages):
+                await graph.ainvoke({"count": 0}, config)
+
+        retention = CheckpointRetention(checkpointer, keep=3, batch_threads=1, pause_seconds=0)
+        report = await retention.run_once()
+
+        # alice wrote 4 checkpoints per message, bob 4 in all
+        assert report.threads == 2
+        assert report.checkpoints == 4 * 5 - 3 + 4 - 3
+        assert report.bytes_reclaimed > 0
+        assert await count_rows(conn, "checkpoints", "alice") == 3
+        # the writes of the deleted checkpoints are gone
+        async with conn.execute(
+            "SELECT count(*) FROM writes w WHERE NOT EXISTS (SELECT 1 FROM checkpoints c"
+            " WHERE c.thread_id = w.thread_id AND c.checkpoint_id = w.checkpoint_id)"
+        ) as cursor:
+            assert (await cursor.fetchone())[0] == 0
+
+        # the state and the next runs are unaffected
+        config = {"configurable": {"thread_id": "alice"}}
+        assert (await graph.aget_state(config)).values["count"] == 10
+        await graph.ainvoke({"count": 0}, config)
+        assert (await graph.aget_state(config)).values["count"] == 12
+
+        assert (await retention.run_once()).checkpoints == 4
+        assert retention.stats()["total"]["checkpoints"] == report.checkpoints + 4
+        await conn.close()
+
+    asyncio.run(run())
+
+
+COUNT_ROWS = "SELECT count(*) AS count FROM {table} WHERE thread_id = %(thread_id)s"
+
+COUNT_BLOBS = "SELECT count(*) AS count FROM checkpoint_blobs"
+
+UNREACHABLE_BLOBS = """
+SELECT count(*) AS count FROM checkpoint_blobs b
+WHERE thread_id = %(thread_id)s AND NOT EXISTS (
+    SELECT 1 FROM checkpoints c
+    WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+    AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+)
+"""
+
+
+@pytest.mark.skipif(not POSTGRES_DB_URI, reason="POSTGRES_DB_URI is not set")
+def test_postgres_retention_deletes_the_unreachable_blobs():
+    schema = f"retention_test_{uuid.uuid4().hex[:8]}"
+
+    async def pg_count(pool, query, thread_id):
+        async with pool.connection() as conn:
+            cursor = await conn.execute(query, {"thread_id": thread_id})
+            return (await cursor.fetchone())["count"]
+
+    async def run():
+        async with await psycopg.AsyncConnection.connect(POSTGRES_DB_URI, autocommit=True) as conn:
+            await conn.execute(f"CREATE SCHEMA {schema}")
+        pool = AsyncConnectionPool(
+            POSTGRES_DB_URI,
+            max_size=4,
+            kwargs={
+                "autocommit": True,
+                "prepare_threshold": 0,
+                "row_factory": dict_row,
+                "options": f"-c search_path={schema}",
+            },
+            open=False,
+        )
+        await pool.open()
+        try:
+            checkpointer = PostgresSaverCustom(pool)
+            await checkpointer.setup()
+            graph = build_graph(checkpointer, ItemsState, {"items": ["item"]})
+            for thread_id, messages in (("alice", 5), ("bob", 1)):
+                config = {"configurable": {"thread_id": thread_id}}
+                for _ in range(messages):
+                    await graph.ainvoke({"items": []}, config)
+            blobs = await pg_count(pool, COUNT_BLOBS, None)
+
+            retention = CheckpointRetention(checkpointer, keep=3, batch_threads=1, pause_seconds=0)
+            report = await retention.run_once()
+
+            assert report.threads == 2
+            assert report.checkpoints == 4 * 5 - 3 + 4 - 3
+            assert report.bytes_reclaimed > 0
+            # only the blobs of the deleted checkpoints are gone
+            kept_blobs = await pg_count(pool, COUNT_BLOBS, None)
+            assert 0 < kept_blobs < blobs and report.blobs == blobs - kept_blobs
+            for thread_id in ("alice", "bob"):
+                assert await pg_count(pool, UNREACHABLE_BLOBS, thread_id) == 0
+            assert await pg_count(pool, COUNT_ROWS.format(table="checkpoints"), "alice") == 3
+
+            # the latest checkpoint loads with its channel values
+            config = {"configurable": {"thread_id": "alice"}}
+            assert (await graph.aget_state(config)).values["items"] == ["item"] * 10
+            await graph.ainvoke({"items": []}, config)
+            assert (await graph.aget_state(config)).values["items"] == ["item"] * 12
+        finally:
+            await pool.close()
+            async with await psycopg.AsyncConnection.connect(POSTGRES_DB_URI, autocommit=True) as conn:
+                await conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+    asyncio.run(run())
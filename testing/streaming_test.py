@@ -0,0 +1,94 @@
+import asyncio
+from typing import Annotated
+
+from langchain_core.callbacks import adispatch_custom_event
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import START, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from agent_workflow.streaming import ProgressiveReply, split_message, stream_graph_answer
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.contents = [content]
+
+    async def edit(self, content):
+        self.contents.append(content)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content):
+        self.messages.append(FakeMessage(content))
+        return self.messages[-1]
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def build_graph(answer):
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content=answer)]))
+
+    async def orchestrator(state: State):
+        await adispatch_custom_event("status", {"status": "Checking the calendars"})
+        await asyncio.sleep(0.05)
+        return {}
+
+    async def orchestrator_output(state: State):
+        return {"messages": [await llm.ainvoke(state["messages"])]}
+
+    builder = StateGraph(State)
+    builder.add_node("orchestrator", orchestrator)
+    builder.add_node("orchestrator_output", orchestrator_output)
+    builder.add_edge(START, "orchestrator")
+    builder.add_edge("orchestrator", "orchestrator_output")
+    return builder.compile()
+
+
+def test_split_message():
+    assert split_message("short") == ["short"]
+    assert split_message("a" * 5 + "\n" + "b" * 5, limit=8) == ["aaaaa", "bbbbb"]
+    assert split_message("a" * 10, limit=4) == ["aaaa", "aaaa", "aa"]
+
+
+def test_stream_graph_answer_edits_the_placeholder():
+    channel = FakeChannel()
+    answer = "Your calendar is free tomorrow afternoon."
+
+    async def main():
+        reply = ProgressiveReply(channel, min_edit_interval=0.01)
+        await reply.start()
+        state = await stream_graph_answer(
+            build_graph(answer), {"messages": [("user", "hi")]}, {}, reply
+        )
+        await reply.finish(state["messages"][-1].content)
+        return reply
+
+    reply = asyncio.run(main())
+
+    [message] = channel.messages
+    assert message.contents[0] == "⏳ *Thinking…*"
+    assert message.contents[-1] == answer
+    assert reply.text == answer
+    assert reply.time_to_first_token is not None
+    assert "⏳ *Checking the calendars…*" in message.contents
+
+
+def test_finish_splits_long_answers():
+    channel = FakeChannel()
+
+    async def main():
+        reply = ProgressiveReply(channel, min_edit_interval=10)
+        await reply.start()
+        await reply.finish("line\n" * 500)
+
+    asyncio.run(main())
+
+    assert len(channel.messages) == 2
+    assert all(len(m.contents[-1]) <= 2000 for m in channel.messages)
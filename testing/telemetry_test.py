@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+from langgraph.graph import START, StateGraph
+from typing_extensions import TypedDict
+
+from agent_workflow.telemetry import (
+    JsonlSpanSink,
+    TelemetryCallbackHandler,
+    instrument_tool,
+    load_spans,
+    summarize,
+)
+
+
+class State(TypedDict):
+    answer: str
+
+
+def lookup(query: str) -> str:
+    """Look something up."""
+    time.sleep(0.02)
+    return "found " * 10
+
+
+def build_graph():
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="Hello there")]))
+    tool = instrument_tool(StructuredTool.from_function(func=lookup))
+
+    async def worker(state: State):
+        await tool.ainvoke({"query": "calendar"})
+        return {}
+
+    async def orchestrator_output(state: State):
+        return {"answer": (await llm.ainvoke("hi")).content}
+
+    worker_graph = StateGraph(State)
+    worker_graph.add_node("worker_tools", worker)
+    worker_graph.add_edge(START, "worker_tools")
+    worker_graph = worker_graph.compile()
+
+    async def manage(state: State):
+        await worker_graph.ainvoke(
+            state, config={"run_name": "personal", "metadata": {"worker": "personal"}}
+        )
+        return {}
+
+    builder = StateGraph(State)
+    builder.add_node("manage", manage)
+    builder.add_node("orchestrator_output", orchestrator_output)
+    builder.add_edge(START, "manage")
+    builder.add_edge("manage", "orchestrator_output")
+    return builder.compile()
+
+
+def test_spans_cover_nodes_workers_llm_and_tools(tmp_path):
+    sink = JsonlSpanSink(str(tmp_path / "spans.jsonl"))
+    handler = TelemetryCallbackHandler(sink)
+
+    asyncio.run(build_graph().ainvoke({"answer": ""}, {"callbacks": [handler]}))
+    sink.close()
+
+    spans = load_spans(sink.path)
+    by_name = {(span.kind, span.name): span for span in spans}
+    assert set(by_name) == {
+        ("request", "LangGraph"),
+        ("node", "manage"),
+        ("worker", "personal"),
+        ("react_step", "worker_tools"),
+        ("tool", "lookup"),
+        ("node", "orchestrator_output"),
+        ("llm", "GenericFakeChatModel"),
+    }
+    assert len({span.trace_id for span in spans}) == 1
+    tool_span = by_name[("tool", "lookup")]
+    assert tool_span.parent_id == by_name[("react_step", "worker_tools")].span_id
+    assert tool_span.duration_ms >= 20
+    assert tool_span.queue_wait_ms is not None
+    assert tool_span.attributes["output_bytes"] > 0
+    assert by_name[("node", "orchestrator_output")].queue_wait_ms is not None
+    assert "slowest request" in summarize(spans)
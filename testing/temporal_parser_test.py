@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+import pytz
+
+from agent_workflow.temporal_parser import parse_date_range
+
+TZ = pytz.timezone("Asia/Karachi")
+# a Wednesday afternoon
+NOW = TZ.localize(datetime(2025, 10, 15, 14, 37))
+
+
+@pytest.mark.parametrize(
+    "expression, start, end",
+    [
+        ("tomorrow", "2025-10-16T00:00:00+05:00", "2025-10-16T23:59:00+05:00"),
+        ("in 3 days", "2025-10-18T00:00:00+05:00", "2025-10-18T23:59:00+05:00"),
+        ("6 days ago", "2025-10-09T00:00:00+05:00", "2025-10-09T23:59:00+05:00"),
+        ("next week", "2025-10-20T00:00:00+05:00", "2025-10-26T23:59:00+05:00"),
+        ("last month", "2025-09-01T00:00:00+05:00", "2025-09-30T23:59:00+05:00"),
+        ("next Friday", "2025-10-17T00:00:00+05:00", "2025-10-17T23:59:00+05:00"),
+        ("last Monday", "2025-10-13T00:00:00+05:00", "2025-10-13T23:59:00+05:00"),
+        ("this weekend", "2025-10-18T00:00:00+05:00", "2025-10-19T23:59:00+05:00"),
+        ("tomorrow night", "2025-10-16T20:00:00+05:00", "2025-10-16T23:59:00+05:00"),
+        ("at 9 AM", "2025-10-15T09:00:00+05:00", "2025-10-15T10:00:00+05:00"),
+        ("in 30 minutes", "2025-10-15T15:07:00+05:00", "2025-10-15T16:07:00+05:00"),
+        ("the next 4 days", "2025-10-15T00:00:00+05:00", "2025-10-19T23:59:00+05:00"),
+        ("March 23, 2024", "2024-03-23T00:00:00+05:00", "2024-03-23T23:59:00+05:00"),
+        ("last January 3rd", "2025-01-03T00:00:00+05:00", "2025-01-03T23:59:00+05:00"),
+        (
+            "from Monday to Friday",
+            "2025-10-20T00:00:00+05:00",
+            "2025-10-24T23:59:00+05:00",
+        ),
+        (
+            "Thursday from 5 to 9 PM",
+            "2025-10-16T17:00:00+05:00",
+            "2025-10-16T21:00:00+05:00",
+        ),
+        (
+            "from 12 PM to 3 PM next Saturday",
+            "2025-10-18T12:00:00+05:00",
+            "2025-10-18T15:00:00+05:00",
+        ),
+        (
+            "tomorrow from 11 PM to 1 AM",
+            "2025-10-16T23:00:00+05:00",
+            "2025-10-17T01:00:00+05:00",
+        ),
+        (
+            "Schedule a meeting with John tomorrow at 3 PM",
+            "2025-10-16T15:00:00+05:00",
+            "2025-10-16T16:00:00+05:00",
+        ),
+    ],
+)
+def test_common_expressions(expression, start, end):
+    parsed = parse_date_range(expression, NOW)
+
+    assert parsed.confidence == 1.0
+    assert parsed.start_datetime.isoformat() == start
+    assert parsed.end_datetime.isoformat() == end
+
+
+@pytest.mark.parametrize("expression", ["February 31", "the 32nd"])
+def test_invalid_expressions_are_errors(expression):
+    parsed = parse_date_range(expression, NOW)
+
+    assert parsed.confidence == 1.0
+    assert parsed.description.startswith("Error:")
+
+
+def test_day_of_month_rolls_to_a_month_that_has_it():
+    # November has no 31st
+    parsed = parse_date_range("on the 31st", TZ.localize(datetime(2025, 11, 10, 9, 0)))
+
+    assert parsed.confidence == 1.0
+    assert parsed.start_datetime.isoformat() == "2025-12-31T00:00:00+05:00"
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "the first week of September",
+        "the first days of October",
+        "Monday or Friday",
+        "at 5",
+    ],
+)
+def test_partial_expressions_have_low_confidence(expression):
+    assert parse_date_range(expression, NOW).confidence < 0.8
+
+
+@pytest.mark.parametrize("expression", ["this Christmas", "Hello there!"])
+def test_unknown_expressions_are_not_parsed(expression):
+    assert parse_date_range(expression, NOW) is None
@@ -0,0 +1,59 @@
+from langchain_core.messages import AIMessage
+
+from agent_workflow.thread_summaries import ThreadSummaryCache, thread_version
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return AIMessage(content=f"- Summary {len(self.prompts)}")
+
+
+def test_summaries_are_reused_until_the_thread_changes(tmp_path):
+    messages = [
+        {"messageId": f"m{i}", "sender": "client@example.com", "messageText": "Long text. " * 200}
+        for i in range(3)
+    ]
+
+    def fetch_thread(thread_id):
+        return {"data": {"messages": list(messages)}, "error": None, "successful": True}
+
+    llm = FakeLLM()
+    cache = ThreadSummaryCache(str(tmp_path / "summaries.db"))
+    tool = cache.summary_tool("work", fetch_thread, llm)
+
+    first = tool.invoke({"thread_id": "t1"})["data"]
+    assert first == {"thread_id": "t1", "summary": "- Summary 1", "cached": False}
+    assert tool.invoke({"thread_id": "t1"})["data"]["cached"]
+    assert len(llm.prompts) == 1
+
+    # another process reads the same file
+    cache.close()
+    cache = ThreadSummaryCache(str(tmp_path / "summaries.db"))
+    tool = cache.summary_tool("work", fetch_thread, llm)
+    assert tool.invoke({"thread_id": "t1"})["data"]["summary"] == "- Summary 1"
+    # the summaries are per entity
+    assert not cache.summary_tool("personal", fetch_thread, llm).invoke({"thread_id": "t1"})["data"]["cached"]
+
+    # a new message makes the summary stale
+    messages.append({"messageId": "m3", "messageText": "Any update?"})
+    assert tool.invoke({"thread_id": "t1"})["data"] == {
+        "thread_id": "t1",
+        "summary": "- Summary 3",
+        "cached": False,
+    }
+    assert "Any update?" in llm.prompts[-1]
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
+    assert stats["hit_rate"] == 1 / 3
+    assert stats["tokens_saved"] > 0
+
+
+def test_thread_version_uses_history_ids():
+    messages = [{"id": "m1", "historyId": "100"}, {"id": "m2", "historyId": "120"}]
+    assert thread_version(messages) == "120:2:m2"
+    assert thread_version([{"messageId": "m1"}]) == ":1:m1"
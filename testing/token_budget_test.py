@@ -0,0 +1,85 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from agent_workflow import token_budget
+from agent_workflow.token_budget import TokenBudgeter, get_encoder
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_fit_keeps_the_latest_interactions():
+    budgeter = TokenBudgeter(words, {"orchestrator_input": 60})
+    history = []
+    for i in range(10):
+        history += [HumanMessage(f"question {i} " * 5), AIMessage(f"answer {i} " * 5)]
+    history.append(HumanMessage("last question"))
+
+    messages, config = budgeter.fit(
+        "orchestrator_input", [SystemMessage("route the request")] + history
+    )
+
+    assert messages[0].content == "route the request"
+    assert messages[-1].content == "last question"
+    assert messages[1].type == "human"
+    assert 1 < len(messages) < len(history)
+    assert budgeter.count_messages(messages) <= 60
+    assert config["metadata"]["token_budget"] == 60
+    assert budgeter.stats()["orchestrator_input"]["dropped"] > 0
+
+
+def test_fit_without_dropping_truncates_tool_results():
+    budgeter = TokenBudgeter(words, {"worker": 100})
+    call = AIMessage("", tool_calls=[{"name": "GMAIL_FETCH_EMAILS", "args": {}, "id": "1"}])
+    messages = [
+        SystemMessage("you read emails"),
+        HumanMessage("summarize my inbox"),
+        call,
+        ToolMessage("email " * 500, tool_call_id="1"),
+    ]
+
+    fitted, config = budgeter.fit("worker", messages, drop_history=False)
+
+    assert [m.type for m in fitted] == [m.type for m in messages]
+    assert fitted[1].content == "summarize my inbox"
+    assert "truncated" in fitted[3].content
+    assert budgeter.count_messages(fitted) <= 100
+    assert config["metadata"]["estimated_prompt_tokens"] == budgeter.count_messages(fitted)
+
+
+def test_record_usage_against_budget():
+    budgeter = TokenBudgeter(words, {"manager": 10})
+    response = AIMessage(
+        "done", usage_metadata={"input_tokens": 12, "output_tokens": 1, "total_tokens": 13}
+    )
+
+    assert budgeter.record_usage("manager", response) == 12
+    assert budgeter.record_usage("manager", AIMessage("no usage")) is None
+    assert budgeter.stats()["manager"] == {"budget": 10, "max_actual": 12, "over_budget": 1}
+
+
+def test_encoder_is_cached():
+    assert get_encoder("openai/gpt-4o") is get_encoder("openai/gpt-4o")
+    assert get_encoder("openai/gpt-4o")("hello world") > 0
+
+
+def test_encoding_is_loaded_on_the_first_count(monkeypatch):
+    loaded = []
+
+    def load_encoder(model):
+        loaded.append(model)
+        return len
+
+    monkeypatch.setattr(token_budget, "_load_encoder", load_encoder)
+    encoder = get_encoder("openai/lazy-model")
+    assert loaded == []
+    assert encoder("hello") == encoder("world") == 5
+    assert loaded == ["openai/lazy-model"]
+
+    # warming up loads it ahead of the first count
+    TokenBudgeter(get_encoder("openai/warm-model"), budgets={}).warm()
+    assert loaded == ["openai/lazy-model", "openai/warm-model"]
+    # the estimate needs no encoding
+    TokenBudgeter(get_encoder("openai/warm-model", "estimate"), budgets={}).warm()
+    assert get_encoder("openai/warm-model", "estimate")("12345678") == 2
+    assert len(loaded) == 2
@@ -0,0 +1,73 @@
+from langchain_core.tools import StructuredTool
+
+from agent_workflow.tool_cache import ToolResultCache
+
+
+def make_tool(name, calls):
+    def func(**kwargs):
+        calls.append((name, kwargs))
+        return {"data": {"calls": len(calls)}, "error": None, "successful": True}
+
+    return StructuredTool.from_function(func=func, name=name, description=name)
+
+
+def test_reads_are_cached_per_entity_and_arguments():
+    calls = []
+    cache = ToolResultCache(ttl_seconds=60)
+    personal = make_tool("GOOGLECALENDAR_FIND_EVENT", calls)
+    work = make_tool("GOOGLECALENDAR_FIND_EVENT", calls)
+    cache.wrap_tool(personal, "personal")
+    cache.wrap_tool(work, "work")
+
+    first = personal.func(query="standup", timeMin=None)
+    second = personal.func(query="standup")
+    work.func(query="standup")
+
+    assert first == second
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+    cache.clear()
+    personal.func(query="standup")
+    assert len(calls) == 3
+
+
+def test_successful_writes_invalidate_the_entity_reads():
+    calls = []
+    cache = ToolResultCache(ttl_seconds=60)
+    find, create, fetch_emails = cache.wrap_tools(
+        [
+            make_tool("GOOGLECALENDAR_FIND_EVENT", calls),
+            make_tool("GOOGLECALENDAR_CREATE_EVENT", calls),
+            make_tool("GMAIL_FETCH_EMAILS", calls),
+        ],
+        "personal",
+    )
+
+    find.func(query="standup")
+    fetch_emails.func(max_results=10)
+    create.func(summary="standup")
+    find.func(query="standup")
+    fetch_emails.func(max_results=10)
+
+    assert [name for name, _ in calls].count("GOOGLECALENDAR_FIND_EVENT") == 2
+    assert [name for name, _ in calls].count("GMAIL_FETCH_EMAILS") == 1
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_failed_reads_are_not_cached():
+    calls = []
+    cache = ToolResultCache(ttl_seconds=60)
+
+    def func(**kwargs):
+        calls.append(kwargs)
+        return {"data": {}, "error": "rate limited", "successful": False}
+
+    tool = StructuredTool.from_function(
+        func=func, name="GMAIL_LIST_THREADS", description="list threads"
+    )
+    cache.wrap_tool(tool, "work")
+    tool.func(query="invoice")
+    tool.func(query="invoice")
+
+    assert len(calls) == 2
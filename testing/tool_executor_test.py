@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+from langgraph.prebuilt import ToolNode
+
+from agent_workflow.tool_executor import ToolExecutor
+
+
+def sleeping_tool(name: str, seconds: float) -> StructuredTool:
+    def sleep(query: str) -> dict:
+        time.sleep(seconds)
+        return {"successful": True, "data": {"query": query}, "error": None}
+
+    return StructuredTool.from_function(func=sleep, name=name, description="Sleep.")
+
+
+def tool_step(*names):
+    return {
+        "messages": [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": name, "args": {"query": "q"}, "id": f"call-{i}"}
+                    for i, name in enumerate(names)
+                ],
+            )
+        ]
+    }
+
+
+def test_tool_calls_of_a_step_run_concurrently_and_bounded():
+    executor = ToolExecutor(max_workers=3, timeout_seconds=5)
+    node = ToolNode(executor.wrap_tools([sleeping_tool("SLEEP", 0.2)]))
+
+    init_time = time.perf_counter()
+    result = asyncio.run(node.ainvoke(tool_step(*["SLEEP"] * 6)))
+    duration = time.perf_counter() - init_time
+
+    # 6 calls on 3 threads: two rounds, not six
+    assert 0.4 <= duration < 0.8
+    assert len(result["messages"]) == 6
+    assert executor.stats()["max_in_flight"] == 3
+    assert executor.stats()["calls"] == 6
+
+
+def test_slow_tool_call_times_out_with_an_error():
+    executor = ToolExecutor(max_workers=2, timeout_seconds=0.1)
+    tools = executor.wrap_tools([sleeping_tool("SLOW", 0.5), sleeping_tool("FAST", 0)])
+    node = ToolNode(tools)
+
+    init_time = time.perf_counter()
+    result = asyncio.run(node.ainvoke(tool_step("SLOW", "FAST")))
+
+    assert time.perf_counter() - init_time < 0.4
+    slow, fast = result["messages"]
+    assert "timed out" in slow.content
+    assert '"successful": true' in fast.content
+    assert executor.stats()["timeouts"] == 1
+    # the sync path is left alone
+    assert tools[1].invoke({"query": "q"})["successful"]
+    executor.shutdown()
+
+
+def test_write_actions_are_not_timed_out():
+    executor = ToolExecutor(max_workers=2, timeout_seconds=0.05)
+    node = ToolNode(executor.wrap_tools([sleeping_tool("GMAIL_SEND_EMAIL", 0.2)]))
+
+    result = asyncio.run(node.ainvoke(tool_step("GMAIL_SEND_EMAIL")))
+
+    assert '"successful": true' in result["messages"][0].content
+    assert executor.stats()["timeouts"] == 0
+    executor.shutdown()
@@ -0,0 +1,54 @@
+import json
+
+from agent_workflow.tool_schemas import ToolSchemaCache
+from benchmarks.fake_composio import FakeComposioBackend, FakeComposioToolSet
+
+ACTIONS = ["GOOGLECALENDAR_FIND_EVENT", "GOOGLECALENDAR_CREATE_EVENT"]
+
+
+def test_schemas_are_loaded_from_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(FakeComposioToolSet, "backend", FakeComposioBackend(latency=0))
+    backend = FakeComposioToolSet.backend
+
+    cache = ToolSchemaCache(str(tmp_path), FakeComposioToolSet, background_refresh=False)
+    tools = cache.get_tools(ACTIONS, "work")
+    assert [tool.name for tool in tools] == ACTIONS
+    assert backend.calls["action_schemas"] == 1
+
+    # a new process: no Composio round trip, even to create the toolset
+    cache = ToolSchemaCache(str(tmp_path), FakeComposioToolSet, background_refresh=False)
+    backend.calls.clear()
+    tools = cache.get_tools(list(reversed(ACTIONS)), "work")
+    assert backend.calls == {}
+    assert cache.stats() == {"hits": 1, "misses": 0, "refreshes": 0}
+
+    # the tools still execute the actions
+    find_event = next(tool for tool in tools if tool.name == "GOOGLECALENDAR_FIND_EVENT")
+    result = find_event.invoke({"timeMin": "2025,03,03,00,00,00"})
+    assert result["successful"]
+    assert backend.calls["GOOGLECALENDAR_FIND_EVENT"] == 1
+    # invalid arguments answer an error, as the Composio tools do
+    invalid = find_event.invoke({"max_results": "many"})
+    assert invalid["successful"] is False and "max_results" in invalid["error"]
+
+    # another entity has its own entry
+    assert cache.load(ACTIONS, "personal") is None
+
+
+def test_stale_versions_and_refresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(FakeComposioToolSet, "backend", FakeComposioBackend(latency=0))
+    cache = ToolSchemaCache(str(tmp_path), FakeComposioToolSet, background_refresh=False)
+    cache.get_tools(ACTIONS, "work")
+
+    path = cache.path(ACTIONS, "work")
+    with open(path) as file:
+        cached = json.load(file)
+    cached["composio"] = "0.0.1"
+    cached["schemas"] = []
+    with open(path, "w") as file:
+        json.dump(cached, file)
+    assert cache.load(ACTIONS, "work") is None
+
+    assert cache.refresh(ACTIONS, "work")
+    assert not cache.refresh(ACTIONS, "work")
+    assert len(cache.load(ACTIONS, "work")) == 2
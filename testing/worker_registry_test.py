@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+
+from agent_workflow.worker_registry import WorkerRegistry
+
+
+def test_workers_are_built_once_on_first_use():
+    builds = []
+
+    def builder(name):
+        def build():
+            time.sleep(0.05)
+            builds.append((name, threading.get_ident()))
+            return f"compiled {name}"
+
+        return build
+
+    registry = WorkerRegistry({"personal": builder("personal"), "work": builder("work")})
+    assert list(registry.keys()) == ["personal", "work"]
+    assert builds == []
+
+    async def main():
+        # concurrent first uses share one build
+        return await asyncio.gather(
+            registry.aget("personal"), registry.aget("personal"), registry.aget("work")
+        )
+
+    assert asyncio.run(main()) == ["compiled personal", "compiled personal", "compiled work"]
+    assert sorted(name for name, _ in builds) == ["personal", "work"]
+    # built off the event loop thread
+    assert all(thread != threading.get_ident() for _, thread in builds)
+    assert registry["work"] == "compiled work"
+    assert registry.stats()["work"]["built"]
+
+
+def test_prewarm_survives_failing_workers():
+    def broken():
+        raise ConnectionError("Composio is down")
+
+    registry = WorkerRegistry({"broken": broken, "work": lambda: "compiled work"})
+
+    async def main():
+        await registry.prewarm()
+
+    asyncio.run(main())
+    assert not registry.is_built("broken")
+    assert registry.is_built("work")